@@ -1,40 +1,384 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, status
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, CursorType, DeleteOne, IndexModel, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, OperationFailure
+from pymongo.monitoring import CommandListener
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict
+from pydantic import BaseModel, Field, EmailStr, ValidationError
+from typing import Any, Awaitable, Callable, List, Optional, Dict, NamedTuple, Tuple
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import base64
+import binascii
+import bisect
+import bson
+import hashlib
+import hmac
+import secrets
+import socket
+import threading
+import time
 import uuid
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
+import httpx
 import jwt
 import bcrypt
+import orjson
+import numpy as np
+import sys
+from abc import ABC, abstractmethod
 from enum import Enum
+from functools import lru_cache
+from sortedcontainers import SortedList
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Metrics
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests served", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"]
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served", ["method"]
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds", "Time spent in bcrypt", ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total", "bcrypt calls rejected because the hashing queue was full"
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency", ["collection", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+MONGO_COMMANDS = Counter(
+    "mongodb_commands_total", "MongoDB commands run", ["collection", "command", "outcome"]
+)
+EVENT_STREAMS = Gauge("event_streams_open", "Open /api/events connections")
+WRITE_BEHIND_PENDING = Gauge("write_behind_pending_documents", "Documents with buffered writes", ["collection"])
+WRITE_BEHIND_FLUSHED = Counter(
+    "write_behind_flushed_documents_total", "Buffered documents written out", ["collection", "outcome"]
+)
+
+class MongoCommandMetrics(CommandListener):
+    """PyMongo command monitoring listener feeding the mongodb_command_* metrics.
+
+    Callbacks run on whichever thread drives the command, so they only touch
+    thread-safe metric objects and a dict keyed by (connection, request id).
+    """
+
+    IGNORED_COMMANDS = frozenset({"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions"})
+
+    def __init__(self):
+        self._collections: Dict[tuple, str] = {}
+
+    @staticmethod
+    def _key(event) -> tuple:
+        return event.connection_id, event.request_id
+
+    def started(self, event):
+        if event.command_name in self.IGNORED_COMMANDS:
+            return
+        # getMore names its cursor in the command value and the collection separately
+        target = event.command.get("collection") if event.command_name == "getMore" else event.command.get(event.command_name)
+        self._collections[self._key(event)] = target if isinstance(target, str) else event.database_name
+
+    def _finish(self, event, outcome: str):
+        collection = self._collections.pop(self._key(event), None)
+        if collection is None:
+            return
+        MONGO_COMMAND_DURATION.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_COMMANDS.labels(collection, event.command_name, outcome).inc()
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+# The ASGI scope of the request being served; Motor copies the context into its
+# worker threads, so command listeners can tell which route issued a command
+request_scope: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+
+def route_label(scope: dict) -> str:
+    # The router records the matched route in the scope; unmatched paths share one label
+    return getattr(scope.get("route"), "path", "unmatched")
+
+class PrometheusMiddleware:
+    """ASGI middleware timing every HTTP request by its route template (``/api/tasks/{task_id}``)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        scope_token = request_scope.set(scope)
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route_path = route_label(scope)
+            HTTP_REQUEST_DURATION.labels(method, route_path).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, route_path, status_code).inc()
+            in_progress.dec()
+            request_scope.reset(scope_token)
+
+# Slow query log settings (off unless a threshold is set)
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 0))
+SLOW_QUERY_LOG_PATH = os.environ.get('SLOW_QUERY_LOG_PATH')  # JSONL, one line per slow command
+SLOW_QUERY_LOG_SIZE = int(os.environ.get('SLOW_QUERY_LOG_SIZE', 500))
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+def query_shape(value):
+    """``value`` with every literal replaced by "?", keeping field names and operators"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [query_shape(item) for item in value]
+        return shapes if any(isinstance(item, (dict, list)) for item in shapes) else "?"
+    return "?"
+
+class SlowQueryRecorder(CommandListener):
+    """Records Mongo commands slower than SLOW_QUERY_THRESHOLD_MS with the route that issued them.
+
+    Each distinct query shape (collection, command and filter with literals
+    stripped) is explained once, in the background, with queryPlanner
+    verbosity. Only shapes are kept or written, never the literal values.
+    """
+
+    COMMANDS = frozenset({"find", "aggregate", "count", "update", "findAndModify", "delete"})
+    # Parts of a command that determine its plan; everything else (lsid, $db, ...) is dropped
+    PLANNED_FIELDS = ("filter", "query", "sort", "pipeline", "updates", "deletes", "hint")
+
+    def __init__(self, threshold_ms: float, log_path: Optional[str], size: int):
+        self.threshold_ms = threshold_ms
+        self.log_path = log_path
+        self.recent = deque(maxlen=size)
+        self.shapes: Dict[str, dict] = {}
+        self._started: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Explains run on ``loop``; without it slow commands are still recorded"""
+        self._loop = loop
+
+    def started(self, event):
+        if not self.enabled or event.command_name not in self.COMMANDS:
+            return
+        scope = request_scope.get()
+        route = route_label(scope) if scope is not None else "background"
+        self._started[(event.connection_id, event.request_id)] = (event.command, event.database_name, route)
+
+    def succeeded(self, event):
+        started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is not None and event.duration_micros >= self.threshold_ms * 1000:
+            self._record(event, *started)
+
+    def failed(self, event):
+        self._started.pop((event.connection_id, event.request_id), None)
+
+    def _record(self, event, command: dict, database_name: str, route: str):
+        collection = command.get(event.command_name)
+        planned = {field: command[field] for field in self.PLANNED_FIELDS if field in command}
+        # Bulk writes are explained through their first statement
+        for field in ("updates", "deletes"):
+            if planned.get(field):
+                planned[field] = planned[field][:1]
+        shape = query_shape(planned)
+        shape_key = orjson.dumps([collection, event.command_name, shape], option=orjson.OPT_SORT_KEYS).decode()
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "route": route,
+            "collection": collection,
+            "command": event.command_name,
+            "duration_ms": round(event.duration_micros / 1000, 2),
+            "shape": shape,
+        }
+        with self._lock:
+            self.recent.append(entry)
+            known = self.shapes.get(shape_key)
+            if known is None:
+                known = self.shapes[shape_key] = {
+                    "collection": collection,
+                    "command": event.command_name,
+                    "shape": shape,
+                    "routes": [],
+                    "count": 0,
+                    "max_ms": 0.0,
+                    "plan": None,
+                }
+                if self._loop is not None:
+                    explain = {event.command_name: collection, **planned}
+                    asyncio.run_coroutine_threadsafe(self._explain(known, database_name, explain), self._loop)
+            known["count"] += 1
+            known["max_ms"] = max(known["max_ms"], entry["duration_ms"])
+            if route not in known["routes"]:
+                known["routes"].append(route)
+            if self.log_path:
+                with open(self.log_path, "ab") as log_file:
+                    log_file.write(orjson.dumps(entry) + b"\n")
+
+    async def _explain(self, known: dict, database_name: str, command: dict):
+        try:
+            explain = await client[database_name].command({"explain": command, "verbosity": "queryPlanner"})
+        except Exception as error:  # Explain is best effort; never let it disturb the app
+            known["plan"] = {"error": str(error)}
+            return
+        planner = explain.get("queryPlanner")
+        if planner is None and explain.get("stages"):
+            planner = explain["stages"][0].get("$cursor", {}).get("queryPlanner")
+        if planner is None:
+            known["plan"] = {"error": "no queryPlanner in explain output"}
+            return
+        winning_plan = planner["winningPlan"]
+        winning_plan = winning_plan.get("queryPlan", winning_plan)  # Slot-based engine output
+        stages = [stage for stage in _plan_stages(winning_plan) if stage]
+        known["plan"] = {"stages": stages, "collscan": "COLLSCAN" in stages}
+        if "COLLSCAN" in stages:
+            logger.warning(f"Slow {known['command']} on {known['collection']} from {known['routes']} is a COLLSCAN")
+        if self.log_path:
+            with self._lock, open(self.log_path, "ab") as log_file:
+                log_file.write(orjson.dumps({"explain": {key: known[key] for key in ("collection", "command", "shape", "plan")}}) + b"\n")
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "threshold_ms": self.threshold_ms,
+                "recent": list(self.recent),
+                "shapes": sorted(self.shapes.values(), key=lambda known: known["max_ms"], reverse=True),
+            }
+
+# Storage engine: 'mongo', or 'memory' for CI, benchmarks and single nodes; the memory engine
+# snapshots to MEMORY_SNAPSHOT_PATH (if set) every MEMORY_SNAPSHOT_SECONDS and on shutdown, so a
+# crash loses at most that interval of writes
+STORAGE_ENGINE = os.environ.get('STORAGE_ENGINE', 'mongo')
+MEMORY_SNAPSHOT_PATH = os.environ.get('MEMORY_SNAPSHOT_PATH')
+MEMORY_SNAPSHOT_SECONDS = float(os.environ.get('MEMORY_SNAPSHOT_SECONDS', 30))
+# Write-behind (mongo engine): completions merge in memory per user and reach Mongo in bulk
+# every WRITE_BEHIND_FLUSH_SECONDS, or sooner once WRITE_BEHIND_MAX_PENDING documents are waiting
+WRITE_BEHIND_ENABLED = os.environ.get('WRITE_BEHIND_ENABLED', 'false').lower() == 'true'
+WRITE_BEHIND_FLUSH_SECONDS = float(os.environ.get('WRITE_BEHIND_FLUSH_SECONDS', 0.5))
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get('WRITE_BEHIND_MAX_PENDING', 1000))
+WRITE_BEHIND_SHUTDOWN_ATTEMPTS = 3
+
 # MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+mongo_command_metrics = MongoCommandMetrics()
+slow_query_recorder = SlowQueryRecorder(SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_LOG_PATH, SLOW_QUERY_LOG_SIZE)
+if STORAGE_ENGINE == 'mongo':
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], event_listeners=[mongo_command_metrics, slow_query_recorder])
+    db = client[os.environ['DB_NAME']]
+else:
+    client = db = None  # Nothing talks to Mongo
 
 # JWT settings
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRY_HOURS = 24 * 7  # 1 week
 
-# Create the main app without a prefix
-app = FastAPI()
+# Password hashing settings
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 64))
+
+# Auth cache settings; the TTL bounds how long a write made by another worker can go unseen (see AuthCache)
+AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', 10000))
+AUTH_CACHE_TTL_SECONDS = float(os.environ.get('AUTH_CACHE_TTL_SECONDS', 5))
+
+# Point deduction job settings
+DEDUCTION_SCHEDULER_ENABLED = os.environ.get('DEDUCTION_SCHEDULER_ENABLED', 'true').lower() == 'true'
+DEDUCTION_CHECK_INTERVAL_SECONDS = float(os.environ.get('DEDUCTION_CHECK_INTERVAL_SECONDS', 600))
+DEDUCTION_BATCH_SIZE = int(os.environ.get('DEDUCTION_BATCH_SIZE', 1000))
+DEDUCTION_WINDOW_DAYS = 7  # Don't check more than a week back
+DEDUCTION_MISSED_DAYS = 2  # Consecutive days without a streak day that cost points and the streak
+JOB_LOCK_LEASE_MINUTES = 60
+
+# daily_progress compaction: whole months older than the retention window are folded into
+# progress_archives and deleted (the window never reaches into what deductions read)
+PROGRESS_COMPACTION_ENABLED = os.environ.get('PROGRESS_COMPACTION_ENABLED', 'true').lower() == 'true'
+PROGRESS_COMPACTION_CHECK_INTERVAL_SECONDS = float(os.environ.get('PROGRESS_COMPACTION_CHECK_INTERVAL_SECONDS', 3600))
+DAILY_PROGRESS_RETENTION_DAYS = max(int(os.environ.get('DAILY_PROGRESS_RETENTION_DAYS', 90)), DEDUCTION_WINDOW_DAYS + 1)
+PROGRESS_COMPACTION_BATCH_SIZE = 1000  # Users per archive write
+RECOMPUTE_CHUNK_SIZE = 10000  # Users per completion matrix; a year of them is ~18 MB
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Leaderboard settings
+LEADERBOARD_SIZE = 100
+LEADERBOARD_RECONCILE_SECONDS = float(os.environ.get('LEADERBOARD_RECONCILE_SECONDS', 300))
+# Roughly 300 bytes per user (~300 MB at 1M); above this the leaderboard is served from Mongo
+LEADERBOARD_MEMORY_MAX_USERS = int(os.environ.get('LEADERBOARD_MEMORY_MAX_USERS', 2_000_000))
+# Served from Mongo, ranks are counted (one index key per user ahead) this deep and estimated
+# below it from a sample of scores, refreshed with the totals every LEADERBOARD_RECONCILE_SECONDS
+LEADERBOARD_EXACT_RANKS = 10000
+LEADERBOARD_SCORE_SAMPLE_SIZE = 10000
+
+# Read coalescing: leaderboard pages are fresh for the TTL, then served stale while one refresh runs
+READ_CACHE_SIZE = int(os.environ.get('READ_CACHE_SIZE', 1000))
+READ_CACHE_TTL_SECONDS = float(os.environ.get('READ_CACHE_TTL_SECONDS', 1))
+READ_CACHE_STALE_SECONDS = float(os.environ.get('READ_CACHE_STALE_SECONDS', 4))
+
+# Progress history: periods a chart gets by default, and at most
+HISTORY_DEFAULT_PERIODS = {"week": 52, "month": 12}
+HISTORY_MAX_PERIODS = 156
+
+# Pagination
+PAGE_SIZE = 100
+PAGE_MAX_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+
+# Quote catalog settings: an http(s) URL (Quotable-compatible) or a JSON file path
+BUNDLED_QUOTES_PATH = ROOT_DIR / 'quotes.json'
+QUOTES_UPSTREAM = os.environ.get('QUOTES_UPSTREAM', str(BUNDLED_QUOTES_PATH))
+QUOTES_REFRESH_SECONDS = float(os.environ.get('QUOTES_REFRESH_SECONDS', 6 * 3600))
+QUOTES_UPSTREAM_TIMEOUT_SECONDS = float(os.environ.get('QUOTES_UPSTREAM_TIMEOUT_SECONDS', 5))
+QUOTES_UPSTREAM_MAX_PAGES = 20
+QUOTES_DAILY_COUNT = 5
+QUOTES_MAX_AGE_SECONDS = 3600
+FAVORITE_STATUS_MAX_HASHES = 50
+
+# Event stream settings; EVENT_BACKEND "mongo" fans out across workers through a capped collection
+EVENT_BACKEND = os.environ.get('EVENT_BACKEND', 'local')
+EVENT_MAX_CONNECTIONS = int(os.environ.get('EVENT_MAX_CONNECTIONS', 1000))
+EVENT_MAX_CONNECTIONS_PER_USER = 5
+EVENT_QUEUE_SIZE = 100
+EVENT_HEARTBEAT_SECONDS = 15
+EVENT_COLLECTION_BYTES = 16 * 1024 * 1024
+EVENT_TICKET_SECONDS = 30  # Lifetime of the single-use tickets EventSource opens the stream with
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 # Security
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 # Enums
 class TaskCategory(str, Enum):
@@ -67,6 +411,10 @@ class Language(str, Enum):
     TURKMEN = "tk"
     AZERBAIJANI = "az"
 
+class HistoryGranularity(str, Enum):
+    WEEK = "week"  # ISO weeks, Monday to Sunday
+    MONTH = "month"
+
 # Models
 class UserRegister(BaseModel):
     username: str = Field(..., min_length=3, max_length=20)
@@ -96,6 +444,7 @@ class User(BaseModel):
         "Discipline": 0.0,
         "Determination": 0.0
     })
+    overall_score: float = 0.0  # Materialized from total_points for the leaderboard index
     badges: List[str] = Field(default_factory=list)
     last_task_completion: Optional[datetime] = None
     last_point_deduction: Optional[datetime] = None
@@ -109,7 +458,9 @@ class Task(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     is_completed: bool = False
     completed_at: Optional[datetime] = None
-    completion_dates: List[datetime] = Field(default_factory=list)  # Track daily completions
+    completion_count: int = 0
+    # "YYYY-MM" -> bitmask of the days completed that month (bit 0 = day 1)
+    completion_months: Dict[str, int] = Field(default_factory=dict)
 
 class TaskCreate(BaseModel):
     category: TaskCategory
@@ -134,142 +485,2613 @@ class DailyProgress(BaseModel):
     })
     streak_day: bool = False
 
-class QuoteFavorite(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    user_id: str
-    quote: str
-    author: str
-    saved_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+class QuoteFavorite(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str
+    quote: str
+    author: str
+    hash: str  # quote_hash(quote, author), unique per user
+    saved_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class CatalogQuote(BaseModel):
+    id: str  # quote_hash(content, author)
+    content: str
+    author: str
+    language: Language = Language.ENGLISH
+    tags: List[str] = Field(default_factory=list)
+
+class DailyQuotes(BaseModel):
+    date: str  # YYYY-MM-DD (UTC)
+    language: Language
+    quotes: List[CatalogQuote]
+
+class LeaderboardEntry(BaseModel):
+    username: str
+    overall_score: float
+    league: LeagueLevel
+    current_streak: int
+    rank: int
+
+class LeaderboardPosition(BaseModel):
+    rank: int
+    approximate: bool = False  # Ranks past LEADERBOARD_EXACT_RANKS when not served from memory
+    total: int
+    percentile: float  # Share of ranked users below you
+    entry: LeaderboardEntry
+    above: List[LeaderboardEntry]
+    below: List[LeaderboardEntry]
+
+class AuthResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    user: User
+
+class StreamTicket(BaseModel):
+    ticket: str
+    expires_in: int
+
+class DashboardResponse(BaseModel):
+    user: Optional[User] = None
+    tasks: Optional[List[Task]] = None
+    radar: Optional[Dict] = None
+    today: Optional[DailyProgress] = None
+
+class HistoryPeriod(BaseModel):
+    period: str  # 2025-W07 or 2025-02
+    start: str
+    end: str
+    points_earned: Dict[str, float]
+    total_points: float
+    category_days: int  # Days a category was completed on, summed over categories
+    streak_days: int
+    completion_rate: float  # category_days out of every category on every day so far
+
+# Projections: every read names the fields it needs, so wire bytes, BSON decoding
+# and memory scale with what the route uses (and the password hash stays in Mongo)
+def fields_projection(*fields: str) -> dict:
+    return {"_id": 0, **{field: 1 for field in fields}}
+
+USER_FIELDS = tuple(User.model_fields)
+TASK_FIELDS = tuple(Task.model_fields)
+DAILY_PROGRESS_FIELDS = tuple(DailyProgress.model_fields)
+QUOTE_FAVORITE_FIELDS = tuple(QuoteFavorite.model_fields)
+
+USER_PROJECTION = fields_projection(*USER_FIELDS)
+LOGIN_PROJECTION = fields_projection(*USER_FIELDS, "password")  # Only login may load the hash
+REGISTRATION_CHECK_PROJECTION = fields_projection("username")
+# Fields a users document needs for RankedLeaderboard.upsert
+LEADERBOARD_PROJECTION = fields_projection("username", "language", "overall_score", "league", "current_streak")
+DEDUCTION_SCAN_PROJECTION = fields_projection("id", "league", "last_point_deduction")
+TASK_PROJECTION = fields_projection(*TASK_FIELDS)
+DAILY_PROGRESS_PROJECTION = fields_projection(*DAILY_PROGRESS_FIELDS)
+QUOTE_FAVORITE_PROJECTION = fields_projection(*QUOTE_FAVORITE_FIELDS)
+CATALOG_QUOTE_PROJECTION = fields_projection(*CatalogQuote.model_fields)
+FAVORITE_HASH_PROJECTION = fields_projection("hash")
+# What complete_task needs back from the users pipeline: leaderboard fields plus event deltas
+COMPLETION_RESULT_PROJECTION = {
+    **LEADERBOARD_PROJECTION, "progress_categories": 1, "total_points": 1, "best_streak": 1, "badges": 1
+}
+PROGRESS_ROLLUP_PROJECTION = fields_projection("start", "points_earned", "category_days", "streak_days")
+# What the write-behind engine buffers of a user: everything apply_user_completion reads or writes
+WRITE_BEHIND_USER_PROJECTION = {
+    **COMPLETION_RESULT_PROJECTION, "id": 1, "progress_date": 1, "last_task_completion": 1
+}
+
+# Trusted serialization: documents we wrote ourselves skip Pydantic re-validation
+@lru_cache(maxsize=None)
+def model_defaults(model: type) -> dict:
+    return {name: field.get_default(call_default_factory=True) for name, field in model.model_fields.items()}
+
+def encode_document(model: type, doc: dict, fields: Optional[tuple] = None) -> dict:
+    """JSON-ready dict of a stored document, limited to ``fields`` (all model fields by default).
+
+    Values are passed through as stored, so only use this for documents that
+    were validated on the way in; fields missing from older documents get the
+    model default.
+    """
+    defaults = model_defaults(model)
+    return {name: doc.get(name, defaults[name]) for name in fields or model.model_fields}
+
+def encode_documents(model: type, docs: List[dict], fields: Optional[tuple] = None) -> List[dict]:
+    defaults = model_defaults(model)
+    names = tuple(fields or model.model_fields)
+    return [{name: doc.get(name, defaults[name]) for name in names} for doc in docs]
+
+# Keyset pagination: an ``after`` cursor is the sort key of the last item served,
+# so every page is an index seek no matter how deep it is
+TASK_SORT = [("created_at", ASCENDING), ("id", ASCENDING)]
+QUOTE_FAVORITE_SORT = [("saved_at", DESCENDING), ("id", DESCENDING)]
+LEADERBOARD_SORT = [("overall_score", DESCENDING), ("username", ASCENDING)]
+
+def encode_cursor(*values) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps(values)).decode().rstrip("=")
+
+def decode_cursor(token: str, *types) -> tuple:
+    """Parse an ``after`` token back into its sort key, converting each value with ``types``"""
+    try:
+        values = orjson.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("cursor has the wrong shape")
+        return tuple(convert(value) for convert, value in zip(types, values))
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+def keyset_filter(sort: list, values: tuple) -> dict:
+    """Filter for the documents strictly after ``values`` in ``sort`` order"""
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {previous: value for (previous, _), value in zip(sort[:i], values)}
+        clause[field] = {"$gt" if direction == ASCENDING else "$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+async def fetch_page(collection, query: dict, projection: dict, sort: list, after: Optional[tuple], limit: int):
+    """One page of ``collection`` in ``sort`` order, plus whether more documents follow"""
+    if after is not None:
+        query = {**query, **keyset_filter(sort, after)}
+    docs = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list(limit + 1)
+    return docs[:limit], len(docs) > limit
+
+def page_response(items, next_cursor: Optional[str]) -> Response:
+    """JSON array of one page (a list, or an already encoded body); the next page's cursor goes in X-Next-Cursor"""
+    if isinstance(items, bytes):
+        response = Response(items, media_type="application/json")
+    else:
+        response = ORJSONResponse(items)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+def ndjson_response(items) -> StreamingResponse:
+    """Stream an async iterable of JSON-ready dicts as newline-delimited JSON"""
+    async def lines():
+        async for item in items:
+            yield orjson.dumps(item, option=orjson.OPT_NON_STR_KEYS) + b"\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+async def stream_documents(collection, query: dict, projection: dict, sort: list,
+                           after: Optional[tuple], limit: Optional[int]):
+    """Yield documents straight off the Motor cursor, batch by batch"""
+    if after is not None:
+        query = {**query, **keyset_filter(sort, after)}
+    cursor = collection.find(query, projection).sort(sort).batch_size(STREAM_BATCH_SIZE)
+    if limit:
+        cursor = cursor.limit(limit)
+    async for doc in cursor:
+        yield doc
+
+async def encode_each(docs, encode):
+    async for doc in docs:
+        yield encode(doc)
+
+# Helper functions
+def hash_password(password: str) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+def verify_password(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool so it never blocks the event loop.
+
+    bcrypt releases the GIL while hashing, so threads give real parallelism.
+    At most ``max_workers`` hashes run at once and at most ``max_queue`` more
+    may wait; anything beyond that is rejected with 503 instead of piling up.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._max_pending = max_workers + max_queue
+        self._pending = 0
+
+    @staticmethod
+    def _timed(operation: str, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            PASSWORD_HASH_DURATION.labels(operation).observe(time.perf_counter() - started)
+
+    async def _run(self, operation: str, func, *args):
+        if self._pending >= self._max_pending:
+            PASSWORD_HASH_REJECTED.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again",
+                headers={"Retry-After": "1"}
+            )
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._timed, operation, func, *args
+            )
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", hash_password, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run("verify", verify_password, password, hashed)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
+class AuthCache:
+    """Bounded LRU+TTL cache of decoded tokens and user records for get_current_user.
+
+    Each user has a version counter that writers bump through ``invalidate``.
+    A record is only served if it was stored under the current version, so a
+    lookup that raced with a points or league change can never be served.
+
+    The cache is per worker. Completions reach the other workers through the
+    event bus when EVENT_BACKEND is "mongo", and invalidate their records as
+    they arrive. Otherwise, and for the daily deductions, a change made by
+    another worker is served stale for at most AUTH_CACHE_TTL_SECONDS.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._tokens: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._users: "OrderedDict[str, tuple[float, int, User]]" = OrderedDict()
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+
+    @staticmethod
+    def _evict(entries: OrderedDict, max_size: int):
+        while len(entries) > max_size:
+            entries.popitem(last=False)
+
+    def get_token(self, token: str) -> Optional[str]:
+        entry = self._tokens.get(token)
+        if entry is None:
+            return None
+        expires_at, user_id = entry
+        if expires_at <= time.monotonic():
+            del self._tokens[token]
+            return None
+        self._tokens.move_to_end(token)
+        return user_id
+
+    def set_token(self, token: str, user_id: str, token_expiry: Optional[float] = None):
+        ttl = self.ttl_seconds
+        if token_expiry is not None:
+            ttl = min(ttl, token_expiry - time.time())
+        if ttl <= 0:
+            return
+        self._tokens[token] = (time.monotonic() + ttl, user_id)
+        self._tokens.move_to_end(token)
+        self._evict(self._tokens, self.max_size)
+
+    def version(self, user_id: str) -> int:
+        return self._versions.get(user_id, 0)
+
+    def get_user(self, user_id: str) -> Optional["User"]:
+        entry = self._users.get(user_id)
+        if entry is None:
+            return None
+        expires_at, version, user = entry
+        if expires_at <= time.monotonic() or version != self.version(user_id):
+            del self._users[user_id]
+            return None
+        self._users.move_to_end(user_id)
+        return user
+
+    def set_user(self, user: "User", version: int):
+        if version != self.version(user.id):
+            return  # Invalidated while the record was being loaded
+        self._users[user.id] = (time.monotonic() + self.ttl_seconds, version, user)
+        self._users.move_to_end(user.id)
+        self._evict(self._users, self.max_size)
+
+    def invalidate(self, user_id: str):
+        self._versions[user_id] = self.version(user_id) + 1
+        self._versions.move_to_end(user_id)
+        # Versions outlive records so that in-flight loads still see the bump
+        self._evict(self._versions, self.max_size * 4)
+        self._users.pop(user_id, None)
+
+auth_cache = AuthCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS)
+
+class SingleFlight:
+    """Concurrent calls with the same key share one in-flight load and its result or error"""
+
+    def __init__(self):
+        self._calls: Dict[object, asyncio.Task] = {}
+
+    def in_flight(self, key) -> bool:
+        return key in self._calls
+
+    def start(self, key, load) -> asyncio.Task:
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = asyncio.ensure_future(load())
+            call.add_done_callback(lambda _: self._calls.pop(key, None))
+        return call
+
+    async def do(self, key, load):
+        # Shielded so one caller disconnecting doesn't cancel the load for everyone else
+        return await asyncio.shield(self.start(key, load))
+
+class ReadCache:
+    """Bounded LRU cache with stale-while-revalidate on top of SingleFlight.
+
+    A value is fresh for ``ttl_seconds``. For ``stale_seconds`` after that it is
+    still served, while a single background load replaces it. Failed loads are
+    never cached. Values are shared between requests, so store immutable ones
+    (encoded bodies), not dicts a route might mutate.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, stale_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._entries: "OrderedDict[object, tuple[float, object]]" = OrderedDict()
+        self._flights = SingleFlight()
+
+    async def get(self, key, load):
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl_seconds + self.stale_seconds:
+                self._entries.move_to_end(key)
+                if age >= self.ttl_seconds and not self._flights.in_flight(key):
+                    self._flights.start(key, lambda: self._load(key, load)).add_done_callback(self._log_failure)
+                return entry[1]
+        return await self._flights.do(key, lambda: self._load(key, load))
+
+    async def _load(self, key, load):
+        value = await load()
+        if self.ttl_seconds > 0:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    @staticmethod
+    def _log_failure(refresh: asyncio.Task):
+        if not refresh.cancelled() and refresh.exception() is not None:
+            logger.warning("Background cache refresh failed: %s", refresh.exception())
+
+    def clear(self):
+        self._entries.clear()
+
+read_cache = ReadCache(READ_CACHE_SIZE, READ_CACHE_TTL_SECONDS, READ_CACHE_STALE_SECONDS)
+user_loads = SingleFlight()
+
+def completion_month_bit(day: date) -> tuple[str, int]:
+    """Key and bit of a day in Task.completion_months"""
+    return day.strftime("%Y-%m"), 1 << (day.day - 1)
+
+class LeaderboardRecord(NamedTuple):
+    sort_key: tuple  # (-overall_score, username); also the entry in the sorted views
+    language: str
+    league: str
+    current_streak: int
+
+class RankedLeaderboard:
+    """In-process leaderboard over every user, with one sorted view per language.
+
+    Updates are O(log N) and top-K reads never touch Mongo. Each worker only
+    sees its own writes, so ``reload`` periodically rebuilds from the database;
+    writes that land while a reload is streaming are replayed onto the result.
+    Until the first load finishes (or if there are more users than
+    LEADERBOARD_MEMORY_MAX_USERS) ``ready`` is False and callers use Mongo.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._records: Dict[str, LeaderboardRecord] = {}
+        self._all = SortedList()
+        self._by_language: Dict[str, SortedList] = {}
+        self._replay: Optional[Dict[str, dict]] = None
+
+    def __len__(self):
+        return len(self._records)
+
+    @staticmethod
+    def _record(user: dict) -> LeaderboardRecord:
+        return LeaderboardRecord(
+            sort_key=(-user.get("overall_score", 0.0), user["username"]),
+            language=sys.intern(Language(user["language"]).value),
+            league=sys.intern(LeagueLevel(user["league"]).value),
+            current_streak=user["current_streak"]
+        )
+
+    def _add(self, user: dict):
+        record = self._record(user)
+        username = user["username"]
+        previous = self._records.get(username)
+        if previous is not None:
+            self._all.remove(previous.sort_key)
+            self._by_language[previous.language].remove(previous.sort_key)
+        self._records[username] = record
+        self._all.add(record.sort_key)
+        self._by_language.setdefault(record.language, SortedList()).add(record.sort_key)
+
+    def upsert(self, user: dict):
+        """Insert or move a user; ``user`` carries the LEADERBOARD_PROJECTION fields"""
+        if self._replay is not None:
+            self._replay[user["username"]] = user
+        if self.ready:
+            self._add(user)
+
+    def _entry(self, sort_key: tuple, rank: int) -> dict:
+        record = self._records[sort_key[1]]
+        return {
+            "username": sort_key[1],
+            "overall_score": -sort_key[0],
+            "league": record.league,
+            "current_streak": record.current_streak,
+            "rank": rank
+        }
+
+    def top(self, language: Optional[str] = None, limit: int = LEADERBOARD_SIZE,
+            after: Optional[tuple] = None) -> List[dict]:
+        """Up to ``limit`` entries, starting just past the ``after`` sort key if given"""
+        ranked = self._all if language is None else self._by_language.get(language)
+        if not ranked:
+            return []
+        start = 0 if after is None else ranked.bisect_right(after)
+        return [
+            self._entry(sort_key, rank)
+            for rank, sort_key in enumerate(ranked.islice(start, start + limit), start=start + 1)
+        ]
+
+    def rank(self, username: str) -> Optional[int]:
+        record = self._records.get(username) if self.ready else None
+        return None if record is None else self._all.index(record.sort_key) + 1
+
+    def position(self, username: str, language: Optional[str] = None, neighbours: int = 1) -> Optional[dict]:
+        """Rank of a user plus the entries just above and below, in O(log N)"""
+        record = self._records.get(username)
+        if record is None or (language is not None and record.language != language):
+            return None
+        ranked = self._all if language is None else self._by_language[language]
+        index = ranked.index(record.sort_key)
+        return {
+            "rank": index + 1,
+            "approximate": False,
+            "total": len(ranked),
+            "entry": self._entry(record.sort_key, index + 1),
+            "above": [self._entry(ranked[i], i + 1) for i in range(max(0, index - neighbours), index)],
+            "below": [
+                self._entry(ranked[i], i + 1)
+                for i in range(index + 1, min(len(ranked), index + 1 + neighbours))
+            ]
+        }
+
+    async def reload(self, storage: "Storage") -> bool:
+        """Rebuild from storage and swap in; returns whether the leaderboard is usable"""
+        await storage.flush()
+        if await storage.count_users() > LEADERBOARD_MEMORY_MAX_USERS:
+            self.ready = False
+            return False
+        self._replay = {}
+        try:
+            records: Dict[str, LeaderboardRecord] = {}
+            async for user in storage.iter_leaderboard_users():
+                records[user["username"]] = self._record(user)
+            by_language: Dict[str, list] = {}
+            for record in records.values():
+                by_language.setdefault(record.language, []).append(record.sort_key)
+            # Bulk construction sorts once instead of N inserts
+            self._records = records
+            self._all = SortedList(record.sort_key for record in records.values())
+            self._by_language = {language: SortedList(keys) for language, keys in by_language.items()}
+            self.ready = True
+            for user in self._replay.values():
+                self._add(user)
+        finally:
+            self._replay = None
+        return True
+
+leaderboard = RankedLeaderboard()
+
+def quote_hash(content: str, author: str) -> str:
+    """Stable id of a quote; whitespace and letter case don't make a different quote"""
+    normalized = f"{' '.join(content.split()).casefold()}\n{' '.join(author.split()).casefold()}"
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:32]
+
+def parse_upstream_quote(raw) -> Optional[dict]:
+    """A catalog document from an upstream record ({content|quote, author, tags, language}), or None"""
+    if not isinstance(raw, dict):
+        return None
+    content = " ".join(str(raw.get("content") or raw.get("quote") or "").split())
+    author = " ".join(str(raw.get("author") or "Unknown").split())
+    if not content:
+        return None
+    try:
+        quote = CatalogQuote(
+            id=quote_hash(content, author),
+            content=content,
+            author=author,
+            language=raw.get("language") or Language.ENGLISH,
+            tags=raw.get("tags") or []
+        )
+    except ValidationError:
+        return None
+    return quote.model_dump(mode="json")
+
+class FileQuoteSource:
+    """Quotes from a local JSON file holding a list of quote records"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    async def fetch(self) -> list:
+        return orjson.loads(await asyncio.to_thread(self.path.read_bytes))
+
+class HttpQuoteSource:
+    """Quotes from an HTTP endpoint returning a JSON list or Quotable-style pages of {"results", "totalPages"}"""
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url
+        self.timeout = timeout
+
+    async def fetch(self) -> list:
+        quotes = []
+        async with httpx.AsyncClient(timeout=self.timeout) as http:
+            for page in range(1, QUOTES_UPSTREAM_MAX_PAGES + 1):
+                response = await http.get(self.url, params={"page": page} if page > 1 else None)
+                response.raise_for_status()
+                body = response.json()
+                if isinstance(body, list):
+                    return body
+                quotes.extend(body.get("results", []))
+                if page >= body.get("totalPages", 1):
+                    break
+        return quotes
+
+def quote_source(upstream: str):
+    if upstream.startswith(("http://", "https://")):
+        return HttpQuoteSource(upstream, QUOTES_UPSTREAM_TIMEOUT_SECONDS)
+    return FileQuoteSource(upstream.removeprefix("file://"))
+
+class QuoteCatalog:
+    """In-memory quote catalog serving a deterministic quote-of-the-day per language.
+
+    Encoded daily responses and their ETags are cached until the catalog is
+    reloaded or the UTC day changes, so a hit costs a dict lookup.
+    """
+
+    def __init__(self):
+        self._by_language: Dict[str, List[dict]] = {}
+        self._daily: Dict[tuple, tuple] = {}
+        self._day: Optional[str] = None
+
+    def __len__(self):
+        return sum(len(quotes) for quotes in self._by_language.values())
+
+    def load(self, quotes: List[dict]):
+        by_language: Dict[str, List[dict]] = {}
+        for quote in sorted(quotes, key=lambda quote: quote["id"]):
+            by_language.setdefault(quote["language"], []).append(quote)
+        self._by_language = by_language
+        self._daily = {}
+
+    def daily(self, day: str, language: str, count: int, offset: int) -> tuple[bytes, str]:
+        """(JSON body, ETag) of the ``offset``-th set of ``count`` quotes for ``day``"""
+        if day != self._day:
+            self._day, self._daily = day, {}
+        key = (language, count, offset)
+        cached = self._daily.get(key)
+        if cached is None:
+            # Languages without quotes of their own get the English ones
+            quotes = self._by_language.get(language) or self._by_language.get(Language.ENGLISH.value, [])
+            selected = []
+            if quotes:
+                start = int.from_bytes(hashlib.sha256(f"{day}:{language}".encode()).digest()[:8], "big")
+                selected = [quotes[(start + offset * count + i) % len(quotes)] for i in range(min(count, len(quotes)))]
+            body = orjson.dumps({"date": day, "language": language, "quotes": selected})
+            cached = self._daily[key] = (body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+        return cached
+
+quote_catalog = QuoteCatalog()
+
+class LocalEventBackend:
+    """Delivers published events straight to this worker's subscribers"""
+
+    def __init__(self):
+        self._deliver = lambda user_id, events: None  # Nobody can be subscribed before start
+
+    async def start(self, deliver):
+        self._deliver = deliver
+
+    async def publish(self, user_id: str, events: List[dict]):
+        self._deliver(user_id, events)
+
+    async def stop(self):
+        pass
+
+class MongoEventBackend:
+    """Cross-worker fan-out: events go into a capped collection that every worker tails"""
+
+    def __init__(self, collection_name: str = "events", size_bytes: int = EVENT_COLLECTION_BYTES):
+        self.collection_name = collection_name
+        self.size_bytes = size_bytes
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver):
+        try:
+            await db.create_collection(self.collection_name, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass  # Another worker created it
+        self._task = asyncio.create_task(self._tail(deliver))
+
+    async def publish(self, user_id: str, events: List[dict]):
+        await db[self.collection_name].insert_one({"user_id": user_id, "events": events})
+
+    async def _tail(self, deliver):
+        collection = db[self.collection_name]
+        # Only events published from now on; history is not replayed
+        newest = await collection.find_one({}, {"_id": 1}, sort=[("$natural", DESCENDING)])
+        last_id = newest["_id"] if newest else None
+        while True:
+            try:
+                # ObjectIds from different workers don't sort in insertion order, but a capped
+                # collection's natural order is it: resume by skipping up to the last event seen
+                # (unless it has been overwritten, and so has everything before it)
+                skipping = last_id is not None and await collection.find_one({"_id": last_id}, {"_id": 1}) is not None
+                cursor = collection.find(
+                    {}, {"_id": 1, "user_id": 1, "events": 1}, cursor_type=CursorType.TAILABLE_AWAIT
+                )
+                async for doc in cursor:
+                    if skipping:
+                        skipping = doc["_id"] != last_id
+                        continue
+                    last_id = doc["_id"]
+                    deliver(doc["user_id"], doc["events"])
+            except Exception:
+                logger.exception("Event stream tailing failed")
+            # Tailable cursors die on an empty collection or a lost connection; reopen
+            await asyncio.sleep(1)
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+
+class EventBus:
+    """Per-user pub/sub for the /api/events stream.
+
+    Each connection owns a bounded queue. A subscriber that falls
+    EVENT_QUEUE_SIZE events behind has its backlog replaced by a single
+    "resync" event, telling the client to refetch instead of letting memory grow.
+    """
+
+    def __init__(self, backend, max_connections: int, max_per_user: int, queue_size: int):
+        self.backend = backend
+        self.max_connections = max_connections
+        self.max_per_user = max_per_user
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, set] = {}
+        self._connections = 0
+
+    @property
+    def connections(self) -> int:
+        return self._connections
+
+    async def start(self):
+        await self.backend.start(self.deliver)
+
+    async def stop(self):
+        await self.backend.stop()
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queues = self._subscribers.get(user_id, set())
+        if self._connections >= self.max_connections or len(queues) >= self.max_per_user:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many event streams, please try again later",
+                headers={"Retry-After": "5"}
+            )
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        self._connections += 1
+        EVENT_STREAMS.inc()
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is None or queue not in queues:
+            return
+        queues.discard(queue)
+        self._connections -= 1
+        EVENT_STREAMS.dec()
+        if not queues:
+            del self._subscribers[user_id]
+
+    def deliver(self, user_id: str, events: List[dict]):
+        # Events follow a change to the user, possibly made on another worker
+        auth_cache.invalidate(user_id)
+        for queue in self._subscribers.get(user_id, ()):
+            for event in events:
+                if queue.full():
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait({"type": "resync"})
+                    break
+                queue.put_nowait(event)
+
+    async def publish(self, user_id: str, events: List[dict]):
+        """Best effort: a failing backend never fails the request that published"""
+        if not events:
+            return
+        try:
+            await self.backend.publish(user_id, events)
+        except Exception:
+            logger.exception("Publishing events failed")
+
+event_bus = EventBus(
+    MongoEventBackend() if EVENT_BACKEND == "mongo" else LocalEventBackend(),
+    EVENT_MAX_CONNECTIONS, EVENT_MAX_CONNECTIONS_PER_USER, EVENT_QUEUE_SIZE
+)
+
+def create_access_token(data: dict):
+    to_encode = data.copy()
+    expire = datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRY_HOURS)
+    to_encode.update({"exp": expire})
+    return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def get_storage(request: Request) -> "Storage":
+    """The storage engine of the app serving ``request`` (see create_app)"""
+    return request.app.state.storage
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    storage: "Storage" = Depends(get_storage)
+):
+    return await authenticate_token(storage, credentials.credentials)
+
+async def authenticate_token(storage: "Storage", token: str) -> User:
+    user_id = auth_cache.get_token(token)
+    if user_id is None:
+        try:
+            payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+            user_id = payload.get("sub")
+            if user_id is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid authentication credentials"
+                )
+        except jwt.PyJWTError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid authentication credentials"
+            )
+        auth_cache.set_token(token, user_id, payload.get("exp"))
+    return await load_current_user(storage, user_id)
+
+async def load_current_user(storage: "Storage", user_id: str) -> User:
+    cached_user = auth_cache.get_user(user_id)
+    if cached_user is not None:
+        return cached_user
+    
+    version = auth_cache.version(user_id)
+    # Keyed by version too: a load that started before an invalidation is never joined after it
+    user = await user_loads.do(
+        (user_id, version), lambda: storage.get_user(user_id)
+    )
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    current_user = User.model_construct(**user)
+    auth_cache.set_user(current_user, version)
+    return current_user
+
+def leaderboard_entry(user: dict, rank: int) -> dict:
+    return {
+        "username": user["username"],
+        "overall_score": user.get("overall_score", 0.0),
+        "league": user["league"],
+        "current_streak": user["current_streak"],
+        "rank": rank
+    }
+
+def calculate_overall_score(points: Dict[str, float]) -> float:
+    total = sum(points.values())
+    return round(total / 5, 2)
+
+def build_radar_stats(points: Dict[str, float]) -> dict:
+    return {
+        "categories": [
+            {"category": "Intelligence", "points": points["Intelligence"]},
+            {"category": "Physical", "points": points["Physical"]},
+            {"category": "Social", "points": points["Social"]},
+            {"category": "Discipline", "points": points["Discipline"]},
+            {"category": "Determination", "points": points["Determination"]}
+        ],
+        "overall_score": calculate_overall_score(points)
+    }
+
+def get_league_multipliers(league: LeagueLevel) -> tuple[float, float]:
+    """Returns (points_multiplier, deduction_multiplier)"""
+    multipliers = {
+        LeagueLevel.NORMAL: (2.0, 4.0),
+        LeagueLevel.NOVICE: (1.5, 4.0),
+        LeagueLevel.ADVANCED: (1.0, 4.0),
+        LeagueLevel.MASTER: (1.0, 3.0),
+        LeagueLevel.LEGENDARY: (0.5, 1.5),
+        LeagueLevel.DISCIPLINE_STAR: (0.1, 0.4)
+    }
+    return multipliers.get(league, (2.0, 4.0))
+
+# calculate_overall_score as an aggregation expression, for update pipelines
+OVERALL_SCORE_EXPRESSION = {"$round": [
+    {"$divide": [{"$add": [f"$total_points.{c.value}" for c in TaskCategory]}, len(TaskCategory)]},
+    2
+]}
+
+# (streak, from league, to league, trophy) promotions awarded on reaching a streak
+LEAGUE_PROMOTIONS = [
+    (25, LeagueLevel.NORMAL, LeagueLevel.NOVICE, "Bronze Trophy"),
+    (50, LeagueLevel.NOVICE, LeagueLevel.ADVANCED, "Silver Trophy"),
+    (100, LeagueLevel.ADVANCED, LeagueLevel.MASTER, "Golden Trophy"),
+    (250, LeagueLevel.MASTER, LeagueLevel.LEGENDARY, "Diamond Trophy"),
+    (500, LeagueLevel.LEGENDARY, LeagueLevel.DISCIPLINE_STAR, "Black Trophy"),
+]
+
+# Every league in promotion order
+LEAGUE_ORDER = [LeagueLevel.NORMAL] + [to_league for _, _, to_league, _ in LEAGUE_PROMOTIONS]
+
+# (streak, badge) awarded once on reaching a streak
+STREAK_BADGES = [
+    (3, "Beginner"),
+    (7, "Disciplined"),
+    (30, "Master"),
+]
+
+def build_user_completion_pipeline(category: TaskCategory, points_earned: float, today_str: str, now: datetime) -> list:
+    """Update pipeline applying one task completion to a user document atomically.
+
+    The user keeps a mirror of today's completed categories (progress_date,
+    progress_categories) so the streak day can be detected in the same
+    update: it happens exactly when this completion adds the fifth category.
+    """
+    return [
+        {"$set": {
+            "_previous_categories": {"$cond": [
+                {"$eq": ["$progress_date", today_str]},
+                {"$ifNull": ["$progress_categories", []]},
+                []
+            ]},
+        }},
+        {"$set": {
+            "progress_date": today_str,
+            "progress_categories": {"$setUnion": ["$_previous_categories", [category.value]]},
+            f"total_points.{category.value}": {"$add": [f"$total_points.{category.value}", points_earned]},
+            "last_task_completion": now,
+        }},
+        {"$set": {
+            "_streak_day": {"$and": [
+                {"$eq": [{"$size": "$progress_categories"}, len(TaskCategory)]},
+                {"$lt": [{"$size": "$_previous_categories"}, len(TaskCategory)]},
+            ]},
+            "overall_score": OVERALL_SCORE_EXPRESSION,
+        }},
+        {"$set": {
+            "current_streak": {"$add": ["$current_streak", {"$cond": ["$_streak_day", 1, 0]}]},
+        }},
+        {"$set": {
+            "best_streak": {"$max": ["$best_streak", "$current_streak"]},
+            "_promotion": {"$switch": {
+                "branches": [
+                    {
+                        "case": {"$and": [
+                            "$_streak_day",
+                            {"$eq": ["$current_streak", streak]},
+                            {"$eq": ["$league", from_league.value]},
+                        ]},
+                        "then": {"league": to_league.value, "badges": [trophy]},
+                    }
+                    for streak, from_league, to_league, trophy in LEAGUE_PROMOTIONS
+                ],
+                "default": None,
+            }},
+            "_streak_badges": {"$switch": {
+                "branches": [
+                    {
+                        "case": {"$and": [
+                            "$_streak_day",
+                            {"$eq": ["$current_streak", streak]},
+                            {"$not": [{"$in": [badge, "$badges"]}]},
+                        ]},
+                        "then": [badge],
+                    }
+                    for streak, badge in STREAK_BADGES
+                ],
+                "default": [],
+            }},
+        }},
+        {"$set": {
+            "league": {"$ifNull": ["$_promotion.league", "$league"]},
+            "badges": {"$concatArrays": [
+                "$badges",
+                {"$ifNull": ["$_promotion.badges", []]},
+                "$_streak_badges",
+            ]},
+        }},
+        {"$project": {"_previous_categories": 0, "_streak_day": 0, "_promotion": 0, "_streak_badges": 0}},
+    ]
+
+def build_daily_progress_pipeline(category: TaskCategory, points_earned: float) -> list:
+    """Upsert pipeline adding one task completion to a daily_progress document"""
+    empty_points = {c.value: 0.0 for c in TaskCategory}
+    return [
+        {"$set": {
+            "id": {"$ifNull": ["$id", str(uuid.uuid4())]},
+            "completed_categories": {"$setUnion": [{"$ifNull": ["$completed_categories", []]}, [category.value]]},
+            "points_earned": {"$mergeObjects": [empty_points, {"$ifNull": ["$points_earned", {}]}]},
+        }},
+        {"$set": {
+            f"points_earned.{category.value}": {"$add": [f"$points_earned.{category.value}", points_earned]},
+            "streak_day": {"$eq": [{"$size": "$completed_categories"}, len(TaskCategory)]},
+        }},
+    ]
+
+def count_missed_days(last_full_day: Optional[date], current_date: date) -> int:
+    """Consecutive days before current_date without all categories completed"""
+    if last_full_day is None:
+        return DEDUCTION_WINDOW_DAYS
+    return min(DEDUCTION_WINDOW_DAYS, (current_date - last_full_day).days - 1)
+
+def point_deduction_due(consecutive_missed_days: int, last_point_deduction: Optional[datetime], current_date: date) -> bool:
+    """Deduct after 2+ missed days, unless a deduction already covered them"""
+    if consecutive_missed_days < DEDUCTION_MISSED_DAYS:
+        return False
+    if last_point_deduction:
+        days_since_deduction = (current_date - last_point_deduction.date()).days
+        if days_since_deduction < consecutive_missed_days:
+            return False  # Already applied deduction recently
+    return True
+
+def build_deduction_pipeline(deduction: float, now: datetime) -> list:
+    """Update pipeline deducting points from every category and resetting the streak"""
+    return [
+        {"$set": {
+            **{
+                f"total_points.{c.value}": {"$max": [0.0, {"$subtract": [f"$total_points.{c.value}", deduction]}]}
+                for c in TaskCategory
+            },
+            "current_streak": 0,
+            "last_point_deduction": now,
+        }},
+        {"$set": {"overall_score": OVERALL_SCORE_EXPRESSION}},
+    ]
+
+# Python twins of the update pipelines above, for engines that apply them in process
+def apply_user_completion(user: dict, category: TaskCategory, points_earned: float, today_str: str, now: datetime):
+    """build_user_completion_pipeline applied to ``user`` in place"""
+    previous = list(user.get("progress_categories") or []) if user.get("progress_date") == today_str else []
+    categories = previous if category.value in previous else previous + [category.value]
+    user["progress_date"] = today_str
+    user["progress_categories"] = categories
+    user["total_points"][category.value] += points_earned
+    user["last_task_completion"] = now
+    streak_day = len(categories) == len(TaskCategory) and len(previous) < len(TaskCategory)
+    user["overall_score"] = calculate_overall_score(user["total_points"])
+    if streak_day:
+        user["current_streak"] += 1
+    user["best_streak"] = max(user["best_streak"], user["current_streak"])
+    if not streak_day:
+        return
+    for streak, from_league, to_league, trophy in LEAGUE_PROMOTIONS:
+        if user["current_streak"] == streak and user["league"] == from_league.value:
+            user["league"] = to_league.value
+            user["badges"].append(trophy)
+            break
+    for streak, badge in STREAK_BADGES:
+        if user["current_streak"] == streak and badge not in user["badges"]:
+            user["badges"].append(badge)
+            break
+
+def apply_daily_completion(progress: dict, category: TaskCategory, points_earned: float):
+    """build_daily_progress_pipeline applied to ``progress`` in place"""
+    progress.setdefault("id", str(uuid.uuid4()))
+    completed = progress.setdefault("completed_categories", [])
+    if category.value not in completed:
+        completed.append(category.value)
+    progress["points_earned"] = {**{c.value: 0.0 for c in TaskCategory}, **progress.get("points_earned", {})}
+    progress["points_earned"][category.value] += points_earned
+    progress["streak_day"] = len(completed) == len(TaskCategory)
+
+def apply_deduction(user: dict, deduction: float, now: datetime):
+    """build_deduction_pipeline applied to ``user`` in place"""
+    user["total_points"] = {c.value: max(0.0, user["total_points"][c.value] - deduction) for c in TaskCategory}
+    user["current_streak"] = 0
+    user["last_point_deduction"] = now
+    user["overall_score"] = calculate_overall_score(user["total_points"])
+
+# Progress rollups: per-user weekly and monthly totals of daily_progress, kept
+# up to date by complete_task so history reads one document per period
+def rollup_start(granularity: HistoryGranularity, day: date) -> date:
+    if granularity == HistoryGranularity.WEEK:
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+def previous_rollup_start(granularity: HistoryGranularity, start: date) -> date:
+    if granularity == HistoryGranularity.WEEK:
+        return start - timedelta(days=7)
+    return (start - timedelta(days=1)).replace(day=1)
+
+def next_month(start: date) -> date:
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def rollup_days(granularity: HistoryGranularity, start: date) -> int:
+    if granularity == HistoryGranularity.WEEK:
+        return 7
+    return (next_month(start) - start).days
+
+def rollup_keys(day: date) -> List[tuple]:
+    """(granularity, start) of every rollup ``day`` counts towards"""
+    return [(granularity.value, rollup_start(granularity, day).isoformat()) for granularity in HistoryGranularity]
+
+def rollup_increments(previous: Optional[dict], category: TaskCategory, points_earned: float) -> Dict[str, float]:
+    """What one completion adds to its rollups, given the day's progress before it"""
+    completed = set(previous.get("completed_categories", [])) if previous else set()
+    increments = {f"points_earned.{category.value}": points_earned}
+    if category.value not in completed:
+        increments["category_days"] = 1
+        if len(completed) == len(TaskCategory) - 1:
+            increments["streak_days"] = 1
+    return increments
+
+def build_rollup_pipeline(day: str, category: TaskCategory, points_earned: float) -> list:
+    """Upsert pipeline adding one completion on ``day`` to a rollup, which keeps each
+    day's categories to tell whether it adds a category day or a streak day"""
+    completed = {"$ifNull": [f"$day_categories.{day}", []]}
+    adds_category = {"$not": [{"$in": [category.value, completed]}]}
+    completes_day = {"$and": [adds_category, {"$eq": [{"$size": completed}, len(TaskCategory) - 1]}]}
+    return [{"$set": {
+        f"points_earned.{category.value}": {"$add": [{"$ifNull": [f"$points_earned.{category.value}", 0]}, points_earned]},
+        "category_days": {"$add": [{"$ifNull": ["$category_days", 0]}, {"$cond": [adds_category, 1, 0]}]},
+        "streak_days": {"$add": [{"$ifNull": ["$streak_days", 0]}, {"$cond": [completes_day, 1, 0]}]},
+        f"day_categories.{day}": {"$setUnion": [completed, [category.value]]},
+    }}]
+
+def apply_rollup_completion(rollup: dict, day: str, category: TaskCategory, points_earned: float):
+    """build_rollup_pipeline applied to ``rollup`` in place"""
+    completed = rollup.setdefault("day_categories", {}).setdefault(day, [])
+    apply_increments(rollup, rollup_increments({"completed_categories": completed}, category, points_earned))
+    if category.value not in completed:
+        completed.append(category.value)
+
+def apply_increments(document: dict, increments: Dict[str, float]):
+    """``{"$inc": increments}`` applied to ``document`` in place (one level of dotted paths)"""
+    for path, amount in increments.items():
+        parent, _, field = path.rpartition(".")
+        target = document.setdefault(parent, {}) if parent else document
+        target[field] = target.get(field, 0) + amount
+
+def history_period(granularity: HistoryGranularity, start: date, rollup: Optional[dict], today: date) -> dict:
+    rollup = rollup or {}
+    days = rollup_days(granularity, start)
+    if granularity == HistoryGranularity.WEEK:
+        iso_year, iso_week, _ = start.isocalendar()
+        period = f"{iso_year}-W{iso_week:02d}"
+    else:
+        period = start.strftime("%Y-%m")
+    points = {c.value: rollup.get("points_earned", {}).get(c.value, 0.0) for c in TaskCategory}
+    category_days = rollup.get("category_days", 0)
+    days_so_far = max(1, min(days, (today - start).days + 1))
+    return {
+        "period": period,
+        "start": start.isoformat(),
+        "end": (start + timedelta(days=days - 1)).isoformat(),
+        "points_earned": points,
+        "total_points": round(sum(points.values()), 2),
+        "category_days": category_days,
+        "streak_days": rollup.get("streak_days", 0),
+        "completion_rate": round(category_days / (days_so_far * len(TaskCategory)), 4),
+    }
+
+# Progress archives: a month of a user's daily_progress as bitsets of days (bit 0 is
+# the 1st) per category and for streak days, plus each category's points by day of month
+def build_progress_archive(user_id: str, month: date, dailies: List[dict]) -> dict:
+    category_days = {c.value: 0 for c in TaskCategory}
+    points = {c.value: {} for c in TaskCategory}
+    streak_days = 0
+    for progress in dailies:
+        day = date.fromisoformat(progress["date"]).day
+        for category in progress.get("completed_categories", []):
+            category_days[category] |= 1 << (day - 1)
+        for category, earned in progress.get("points_earned", {}).items():
+            if earned:
+                points.setdefault(category, {})[str(day)] = earned
+        if progress.get("streak_day"):
+            streak_days |= 1 << (day - 1)
+    return {
+        "user_id": user_id,
+        "month": month.strftime("%Y-%m"),
+        "category_days": category_days,
+        "streak_days": streak_days,
+        "points_earned": points,
+    }
+
+def archived_days(archive: dict) -> Dict[str, dict]:
+    """The days of ``archive`` with anything completed, as date -> {completed_categories, points_earned, streak_day}"""
+    month = date.fromisoformat(f"{archive['month']}-01")
+    days = {}
+    for offset in range((next_month(month) - month).days):
+        day_bit = 1 << offset
+        completed = [category for category, bits in archive["category_days"].items() if bits & day_bit]
+        if completed:
+            days[(month + timedelta(days=offset)).isoformat()] = {
+                "completed_categories": completed,
+                "points_earned": {category: by_day[str(offset + 1)]
+                                  for category, by_day in archive["points_earned"].items() if str(offset + 1) in by_day},
+                "streak_day": bool(archive["streak_days"] & day_bit),
+            }
+    return days
+
+# Storage
+class Storage(ABC):
+    """Documents as plain dicts shaped like Mongo's (naive UTC datetimes, DuplicateKeyError on duplicates)"""
+
+    async def prepare(self):
+        """Called on startup, before anything else touches the storage"""
+
+    async def close(self):
+        """Called on shutdown"""
+
+    async def flush(self):
+        """Write out anything buffered; jobs that scan whole collections call this first"""
+
+    # users
+    @abstractmethod
+    async def get_user(self, user_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def find_user_by_login(self, login: str) -> Optional[dict]:
+        """The user whose username or email is ``login``, with the password hash"""
+
+    @abstractmethod
+    async def find_registered_user(self, username: str, email: str) -> Optional[dict]:
+        """A user already holding ``username`` or ``email`` (only its username)"""
+
+    @abstractmethod
+    async def insert_user(self, user: dict):
+        ...
+
+    @abstractmethod
+    async def apply_task_completion(self, user_id: str, category: TaskCategory, points_earned: float,
+                                    today_str: str, now: datetime) -> Optional[dict]:
+        """Apply one completion atomically; returns the COMPLETION_RESULT_PROJECTION fields"""
+
+    @abstractmethod
+    async def count_users(self) -> int:
+        ...
+
+    @abstractmethod
+    def iter_leaderboard_users(self, user_ids: Optional[List[str]] = None):
+        """Async iterator over the LEADERBOARD_PROJECTION fields of every user (or of ``user_ids``)"""
+
+    @abstractmethod
+    async def leaderboard_page(self, language: Optional[str], after: Optional[tuple], limit: int) -> tuple[list, bool]:
+        ...
+
+    @abstractmethod
+    def stream_leaderboard(self, language: Optional[str], after: Optional[tuple], limit: Optional[int]):
+        ...
+
+    @abstractmethod
+    async def leaderboard_position(self, user: User, language: Optional[str], neighbours: int) -> dict:
+        """Rank, total and neighbours like RankedLeaderboard.position, without needing it loaded"""
+
+    @abstractmethod
+    def iter_deduction_candidates(self):
+        """Async iterator over the DEDUCTION_SCAN_PROJECTION fields of every user"""
+
+    @abstractmethod
+    async def apply_deductions(self, deductions: List[tuple[str, float]], now: datetime) -> int:
+        """Deduct (user id, points) pairs; returns how many users changed"""
+
+    # tasks
+    @abstractmethod
+    async def task_page(self, user_id: str, after: Optional[tuple], limit: int) -> tuple[list, bool]:
+        ...
+
+    @abstractmethod
+    def stream_tasks(self, user_id: str, after: Optional[tuple], limit: Optional[int]):
+        ...
+
+    @abstractmethod
+    async def count_tasks(self, user_id: str, category: str) -> int:
+        ...
+
+    @abstractmethod
+    async def insert_task(self, task: dict):
+        ...
+
+    @abstractmethod
+    async def get_task(self, task_id: str, user_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def update_task(self, task_id: str, user_id: str, fields: dict) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def complete_task(self, task_id: str, user_id: str, now: datetime) -> Optional[dict]:
+        """Mark a task completed unless it already was today, atomically.
+
+        Returns the category, completion_count and today's completion_months
+        entry, or None if the task doesn't exist or was already completed today.
+        """
+
+    @abstractmethod
+    async def task_exists(self, task_id: str, user_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def delete_task(self, task_id: str, user_id: str) -> bool:
+        ...
+
+    # daily_progress
+    @abstractmethod
+    async def add_daily_completion(self, user_id: str, day: str, category: TaskCategory, points_earned: float):
+        """Add one completion to the user's progress for ``day`` and to the rollups it counts towards"""
+
+    @abstractmethod
+    async def get_daily_progress(self, user_id: str, day: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def last_full_days(self, window_start: date, current_date: date) -> Dict[str, date]:
+        """Most recent day in [window_start, current_date) with every category completed, per user"""
+
+    @abstractmethod
+    async def oldest_progress_date(self) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def iter_month_progress(self, start: str, end: str):
+        """Async iterator of (user_id, [daily_progress documents]) for dates in [start, end), one per user"""
+
+    @abstractmethod
+    async def delete_progress(self, user_ids: List[str], start: str, end: str) -> int:
+        """Delete the users' daily_progress for dates in [start, end); returns the documents deleted"""
+
+    # progress_archives
+    @abstractmethod
+    async def archive_progress(self, archives: List[dict]):
+        """Store archives whose (user_id, month) has none yet; existing ones are kept as they are"""
+
+    # progress_rollups
+    @abstractmethod
+    async def progress_rollups(self, user_id: str, granularity: str, since: str) -> List[dict]:
+        """The user's rollups of ``granularity`` starting on or after ``since``, oldest first"""
+
+    # quote_favorites
+    @abstractmethod
+    async def favorite_page(self, user_id: str, after: Optional[tuple], limit: int) -> tuple[list, bool]:
+        ...
+
+    @abstractmethod
+    def stream_favorites(self, user_id: str, after: Optional[tuple], limit: Optional[int]):
+        ...
+
+    @abstractmethod
+    async def saved_favorite_hashes(self, user_id: str, hashes: List[str]) -> set:
+        ...
+
+    @abstractmethod
+    async def save_favorite(self, favorite: dict) -> dict:
+        """Insert unless the user already saved this hash; returns the stored favorite either way"""
+
+    @abstractmethod
+    async def delete_favorite(self, user_id: str, favorite_id: Optional[str] = None,
+                              content_hash: Optional[str] = None) -> bool:
+        ...
+
+    # quote catalog and job locks
+    @abstractmethod
+    async def store_catalog_quotes(self, quotes: List[dict]):
+        ...
+
+    @abstractmethod
+    async def load_catalog_quotes(self) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def acquire_job_lock(self, job_name: str, run_date: str) -> bool:
+        """Claim ``run_date``'s run of a job; only one worker gets it until the lease expires"""
+
+    @abstractmethod
+    async def update_job_lock(self, job_name: str, fields: dict):
+        """Set ``fields`` on a lock this worker holds"""
+
+    # stream_tickets
+    @abstractmethod
+    async def insert_stream_ticket(self, ticket: dict):
+        """Store a {hash, user_id, expires_at} ticket for opening the event stream"""
+
+    @abstractmethod
+    async def redeem_stream_ticket(self, ticket_hash: str) -> Optional[str]:
+        """Delete the ticket and return its user_id; None if it is unknown, already used or expired"""
+
+    @abstractmethod
+    async def import_documents(self, collection_name: str, documents: List[dict]):
+        """Bulk insert raw documents, for seeding and restores"""
+
+class MongoStorage(Storage):
+    """Storage on MongoDB; every query here is covered by INDEXES (see check-indexes)"""
+
+    def __init__(self, database):
+        self.db = database
+        self._score_samples: Dict[Optional[str], tuple] = {}
+
+    async def prepare(self):
+        await ensure_indexes(self.db)
+
+    async def close(self):
+        self.db.client.close()
+
+    async def get_user(self, user_id):
+        return await self.db.users.find_one({"id": user_id}, USER_PROJECTION)
+
+    async def find_user_by_login(self, login):
+        return await self.db.users.find_one({
+            "$or": [
+                {"email": login},
+                {"username": login}
+            ]
+        }, LOGIN_PROJECTION)
+
+    async def find_registered_user(self, username, email):
+        return await self.db.users.find_one({
+            "$or": [
+                {"username": username},
+                {"email": email}
+            ]
+        }, REGISTRATION_CHECK_PROJECTION)
+
+    async def insert_user(self, user):
+        await self.db.users.insert_one(user)
+
+    async def apply_task_completion(self, user_id, category, points_earned, today_str, now):
+        return await self.db.users.find_one_and_update(
+            {"id": user_id},
+            build_user_completion_pipeline(category, points_earned, today_str, now),
+            projection=COMPLETION_RESULT_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def count_users(self):
+        return await self.db.users.estimated_document_count()
+
+    async def iter_leaderboard_users(self, user_ids=None):
+        query = {} if user_ids is None else {"id": {"$in": user_ids}}
+        async for user in self.db.users.find(query, LEADERBOARD_PROJECTION):
+            yield user
+
+    async def leaderboard_page(self, language, after, limit):
+        # Served straight from the (language, overall_score, username) indexes
+        query = {"language": language} if language else {}
+        return await fetch_page(self.db.users, query, LEADERBOARD_PROJECTION, LEADERBOARD_SORT, after, limit)
+
+    def stream_leaderboard(self, language, after, limit):
+        query = {"language": language} if language else {}
+        return stream_documents(self.db.users, query, LEADERBOARD_PROJECTION, LEADERBOARD_SORT, after, limit)
+
+    async def leaderboard_position(self, user, language, neighbours):
+        """Ranks are positions in (overall_score desc, username asc) order, counted down to
+        LEADERBOARD_EXACT_RANKS and estimated from the score sample below that"""
+        query = {"language": language} if language else {}
+        ahead = {"$or": [
+            {"overall_score": {"$gt": user.overall_score}},
+            {"overall_score": user.overall_score, "username": {"$lt": user.username}}
+        ]}
+        behind = keyset_filter(LEADERBOARD_SORT, (user.overall_score, user.username))
+        ahead_count, (total, scores), above, below = await asyncio.gather(
+            self.db.users.count_documents({**query, **ahead}, limit=LEADERBOARD_EXACT_RANKS),
+            self._score_sample(language),
+            self.db.users.find({**query, **ahead}, LEADERBOARD_PROJECTION).sort(
+                [("overall_score", ASCENDING), ("username", DESCENDING)]
+            ).limit(neighbours).to_list(neighbours),
+            self.db.users.find({**query, **behind}, LEADERBOARD_PROJECTION).sort(
+                LEADERBOARD_SORT
+            ).limit(neighbours).to_list(neighbours)
+        )
+        approximate = ahead_count == LEADERBOARD_EXACT_RANKS
+        if approximate:
+            higher = len(scores) - bisect.bisect_right(scores, user.overall_score)
+            ahead_count = max(ahead_count, min(round(higher / max(len(scores), 1) * total), total - 1))
+        rank = ahead_count + 1
+        return {
+            "rank": rank,
+            "approximate": approximate,
+            "total": max(total, rank),
+            "entry": leaderboard_entry(dict(user), rank),
+            "above": [leaderboard_entry(u, rank - i) for i, u in enumerate(above, start=1)][::-1],
+            "below": [leaderboard_entry(u, rank + i) for i, u in enumerate(below, start=1)]
+        }
+
+    async def _score_sample(self, language):
+        """(users, ascending sample of their scores) on the leaderboard, counted at most
+        once per LEADERBOARD_RECONCILE_SECONDS"""
+        sampled_at, total, scores = self._score_samples.get(language, (None, 0, []))
+        if sampled_at is None or time.monotonic() - sampled_at > LEADERBOARD_RECONCILE_SECONDS:
+            query = {"language": language} if language else {}
+            pipeline = [{"$match": query}] if query else []
+            total, sample = await asyncio.gather(
+                self.db.users.count_documents(query) if query else self.db.users.estimated_document_count(),
+                self.db.users.aggregate(pipeline + [
+                    {"$sample": {"size": LEADERBOARD_SCORE_SAMPLE_SIZE}}, {"$project": {"_id": 0, "overall_score": 1}}
+                ]).to_list(None)
+            )
+            scores = sorted(document["overall_score"] for document in sample)
+            self._score_samples[language] = (time.monotonic(), total, scores)
+        return total, scores
+
+    async def iter_deduction_candidates(self):
+        async for user in self.db.users.find({}, DEDUCTION_SCAN_PROJECTION):
+            yield user
+
+    async def apply_deductions(self, deductions, now):
+        result = await self.db.users.bulk_write([
+            UpdateOne({"id": user_id}, build_deduction_pipeline(deduction, now))
+            for user_id, deduction in deductions
+        ], ordered=False)
+        return result.modified_count
+
+    async def task_page(self, user_id, after, limit):
+        return await fetch_page(self.db.tasks, {"user_id": user_id}, TASK_PROJECTION, TASK_SORT, after, limit)
+
+    def stream_tasks(self, user_id, after, limit):
+        return stream_documents(self.db.tasks, {"user_id": user_id}, TASK_PROJECTION, TASK_SORT, after, limit)
+
+    async def count_tasks(self, user_id, category):
+        return await self.db.tasks.count_documents({"user_id": user_id, "category": category})
+
+    async def insert_task(self, task):
+        await self.db.tasks.insert_one(task)
+
+    async def get_task(self, task_id, user_id):
+        return await self.db.tasks.find_one({"id": task_id, "user_id": user_id}, TASK_PROJECTION)
+
+    async def update_task(self, task_id, user_id, fields):
+        return await self.db.tasks.find_one_and_update(
+            {"id": task_id, "user_id": user_id},
+            {"$set": fields},
+            projection=TASK_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def complete_task(self, task_id, user_id, now):
+        # The filter makes this safe against concurrent completions of the same task
+        start_of_day = datetime.combine(now.date(), datetime.min.time(), tzinfo=timezone.utc)
+        month_key, day_bit = completion_month_bit(now.date())
+        return await self.db.tasks.find_one_and_update(
+            {
+                "id": task_id,
+                "user_id": user_id,
+                "completed_at": {"$not": {"$gte": start_of_day}}
+            },
+            {
+                "$set": {"is_completed": True, "completed_at": now},
+                "$inc": {"completion_count": 1},
+                "$bit": {f"completion_months.{month_key}": {"or": day_bit}}
+            },
+            projection={"_id": 0, "category": 1, "completion_count": 1, f"completion_months.{month_key}": 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def task_exists(self, task_id, user_id):
+        return await self.db.tasks.count_documents({"id": task_id, "user_id": user_id}, limit=1) > 0
+
+    async def delete_task(self, task_id, user_id):
+        result = await self.db.tasks.delete_one({"id": task_id, "user_id": user_id})
+        return result.deleted_count > 0
+
+    async def add_daily_completion(self, user_id, day, category, points_earned):
+        # The rollups keep the day's categories themselves, so neither write waits on the other
+        await asyncio.gather(
+            self.db.daily_progress.update_one(
+                {"user_id": user_id, "date": day}, build_daily_progress_pipeline(category, points_earned), upsert=True
+            ),
+            self.db.progress_rollups.bulk_write([
+                UpdateOne({"user_id": user_id, "granularity": granularity, "start": start},
+                          build_rollup_pipeline(day, category, points_earned), upsert=True)
+                for granularity, start in rollup_keys(date.fromisoformat(day))
+            ], ordered=False)
+        )
+
+    async def get_daily_progress(self, user_id, day):
+        return await self.db.daily_progress.find_one({"user_id": user_id, "date": day}, DAILY_PROGRESS_PROJECTION)
+
+    async def last_full_days(self, window_start, current_date):
+        pipeline = [
+            {"$match": {
+                "date": {"$gte": window_start.isoformat(), "$lt": current_date.isoformat()},
+                "streak_day": True
+            }},
+            {"$group": {"_id": "$user_id", "last_full_day": {"$max": "$date"}}},
+        ]
+        return {
+            doc["_id"]: date.fromisoformat(doc["last_full_day"])
+            async for doc in self.db.daily_progress.aggregate(pipeline, allowDiskUse=True)
+        }
+
+    async def oldest_progress_date(self):
+        oldest = await self.db.daily_progress.find_one({}, {"_id": 0, "date": 1}, sort=[("date", ASCENDING)])
+        return oldest["date"] if oldest else None
+
+    async def iter_month_progress(self, start, end):
+        pipeline = [
+            {"$match": {"date": {"$gte": start, "$lt": end}}},
+            {"$group": {"_id": "$user_id", "days": {"$push": "$$ROOT"}}},
+        ]
+        async for group in self.db.daily_progress.aggregate(pipeline, allowDiskUse=True):
+            yield group["_id"], group["days"]
+
+    async def delete_progress(self, user_ids, start, end):
+        result = await self.db.daily_progress.delete_many(
+            {"user_id": {"$in": user_ids}, "date": {"$gte": start, "$lt": end}}
+        )
+        return result.deleted_count
+
+    async def archive_progress(self, archives):
+        await self.db.progress_archives.bulk_write([
+            UpdateOne(
+                {"user_id": archive["user_id"], "month": archive["month"]},
+                {"$setOnInsert": {field: value for field, value in archive.items() if field not in ("user_id", "month")}},
+                upsert=True
+            )
+            for archive in archives
+        ], ordered=False)
+
+    async def progress_rollups(self, user_id, granularity, since):
+        return await self.db.progress_rollups.find(
+            {"user_id": user_id, "granularity": granularity, "start": {"$gte": since}}, PROGRESS_ROLLUP_PROJECTION
+        ).sort("start", ASCENDING).to_list(None)
+
+    async def favorite_page(self, user_id, after, limit):
+        return await fetch_page(
+            self.db.quote_favorites, {"user_id": user_id}, QUOTE_FAVORITE_PROJECTION, QUOTE_FAVORITE_SORT, after, limit
+        )
+
+    def stream_favorites(self, user_id, after, limit):
+        return stream_documents(
+            self.db.quote_favorites, {"user_id": user_id}, QUOTE_FAVORITE_PROJECTION, QUOTE_FAVORITE_SORT, after, limit
+        )
+
+    async def saved_favorite_hashes(self, user_id, hashes):
+        saved = await self.db.quote_favorites.find(
+            {"user_id": user_id, "hash": {"$in": hashes}}, FAVORITE_HASH_PROJECTION
+        ).to_list(len(hashes))
+        return {favorite["hash"] for favorite in saved}
+
+    async def save_favorite(self, favorite):
+        key = {"user_id": favorite["user_id"], "hash": favorite["hash"]}
+        try:
+            return await self.db.quote_favorites.find_one_and_update(
+                key,
+                {"$setOnInsert": favorite},
+                projection=QUOTE_FAVORITE_PROJECTION,
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # A concurrent save of the same quote won the upsert
+            return await self.db.quote_favorites.find_one(key, QUOTE_FAVORITE_PROJECTION)
+
+    async def delete_favorite(self, user_id, favorite_id=None, content_hash=None):
+        query = {"user_id": user_id}
+        if favorite_id is not None:
+            query["id"] = favorite_id
+        else:
+            query["hash"] = content_hash
+        result = await self.db.quote_favorites.delete_one(query)
+        return result.deleted_count > 0
+
+    async def store_catalog_quotes(self, quotes):
+        await self.db.quote_catalog.bulk_write(
+            [ReplaceOne({"id": quote["id"]}, quote, upsert=True) for quote in quotes], ordered=False
+        )
+
+    async def load_catalog_quotes(self):
+        return await self.db.quote_catalog.find({}, CATALOG_QUOTE_PROJECTION).to_list(None)
+
+    async def acquire_job_lock(self, job_name, run_date):
+        now = datetime.now(timezone.utc)
+        try:
+            await self.db.job_locks.update_one(
+                {
+                    "_id": job_name,
+                    "$or": [
+                        {"run_date": {"$ne": run_date}},
+                        {"status": "running", "locked_at": {"$lt": now - timedelta(minutes=JOB_LOCK_LEASE_MINUTES)}}
+                    ]
+                },
+                {"$set": {"run_date": run_date, "status": "running", "locked_at": now, "owner": WORKER_ID}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False  # Another worker already holds or finished today's run
+        return True
+
+    async def update_job_lock(self, job_name, fields):
+        await self.db.job_locks.update_one({"_id": job_name, "owner": WORKER_ID}, {"$set": fields})
+
+    async def insert_stream_ticket(self, ticket):
+        await self.db.stream_tickets.insert_one(dict(ticket))
+
+    async def redeem_stream_ticket(self, ticket_hash):
+        ticket = await self.db.stream_tickets.find_one_and_delete(
+            {"hash": ticket_hash, "expires_at": {"$gt": datetime.now(timezone.utc)}}, fields_projection("user_id")
+        )
+        return ticket["user_id"] if ticket else None
+
+    async def import_documents(self, collection_name, documents):
+        await self.db[collection_name].insert_many(documents, ordered=False)
+
+def stored_datetime(value: datetime) -> datetime:
+    """``value`` the way Mongo hands it back: naive UTC with millisecond precision"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+def project_document(document: dict, projection: dict) -> dict:
+    """The fields of an in-memory ``document`` a Mongo ``projection`` would return, as copies"""
+    projected = {}
+    for field, included in projection.items():
+        if included and field in document:
+            value = document[field]
+            projected[field] = value.copy() if isinstance(value, (dict, list)) else value
+    return projected
+
+class MemoryStorage(Storage):
+    """Storage in process memory, for CI, benchmarks and single nodes that can lose the last snapshot interval"""
+
+    COLLECTIONS = ("users", "tasks", "daily_progress", "progress_archives", "progress_rollups", "quote_favorites",
+                   "quote_catalog", "job_locks")
+
+    def __init__(self, snapshot_path: Optional[str] = None, snapshot_seconds: float = MEMORY_SNAPSHOT_SECONDS):
+        self.snapshot_path = snapshot_path
+        self.snapshot_seconds = snapshot_seconds
+        self._snapshotter: Optional[asyncio.Task] = None
+        self._snapshot_lock = asyncio.Lock()
+        self._users: Dict[str, dict] = {}
+        self._user_ids_by_username: Dict[str, str] = {}
+        self._user_ids_by_email: Dict[str, str] = {}
+        self._ranked = RankedLeaderboard()
+        self._ranked.ready = True
+        self._tasks: Dict[str, dict] = {}
+        self._task_keys: Dict[str, SortedList] = {}  # user_id -> (created_at, id)
+        self._progress: Dict[tuple, dict] = {}  # (user_id, date) -> document
+        self._progress_user_ids: Dict[str, set] = {}  # date -> user ids
+        self._archives: Dict[tuple, dict] = {}  # (user_id, month) -> document
+        self._rollups: Dict[tuple, dict] = {}  # (user_id, granularity, start) -> document
+        self._rollup_starts: Dict[tuple, SortedList] = {}  # (user_id, granularity) -> starts
+        self._favorites: Dict[str, dict] = {}
+        self._favorite_ids: Dict[tuple, str] = {}  # (user_id, hash) -> id
+        self._favorite_keys: Dict[str, SortedList] = {}  # user_id -> (saved_at, id)
+        self._catalog: Dict[str, dict] = {}
+        self._job_locks: Dict[str, dict] = {}
+        self._stream_tickets: Dict[str, dict] = {}  # hash -> ticket; they live seconds, so never snapshotted
+        # Each collection's documents, keyed like its unique index
+        self._collections = {
+            "users": self._users, "tasks": self._tasks, "daily_progress": self._progress,
+            "progress_archives": self._archives, "progress_rollups": self._rollups, "quote_favorites": self._favorites,
+            "quote_catalog": self._catalog, "job_locks": self._job_locks,
+        }
+
+    @staticmethod
+    def _stored(document: dict) -> dict:
+        # A BSON round trip copies the document and normalizes it exactly like Mongo storage does
+        return bson.decode(bson.encode(document))
+
+    @staticmethod
+    def _duplicate(index: str):
+        return DuplicateKeyError(f"E11000 duplicate key error index: {index}", 11000)
+
+    async def prepare(self):
+        if not self.snapshot_path:
+            return
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as snapshot:
+                for record in bson.decode_file_iter(snapshot):
+                    self._insert(record["collection"], record["document"])
+            logger.info(f"Loaded {len(self._users)} users and {len(self._tasks)} tasks from {self.snapshot_path}")
+        self._snapshotter = asyncio.create_task(self._run_snapshotter())
+
+    async def close(self):
+        if self._snapshotter:
+            self._snapshotter.cancel()
+            self._snapshotter = None
+        if self.snapshot_path:
+            await self.snapshot()
+
+    async def _run_snapshotter(self):
+        while True:
+            await asyncio.sleep(self.snapshot_seconds)
+            try:
+                await asyncio.shield(self.snapshot())
+            except Exception:
+                logger.exception("Memory snapshot failed, keeping the previous one")
+
+    async def snapshot(self):
+        """Write every collection to ``snapshot_path`` atomically and durably"""
+        # Encoded without awaiting, so the snapshot is one consistent point in time
+        encoded = b"".join(
+            bson.encode({"collection": collection_name, "document": document})
+            for collection_name in self.COLLECTIONS for document in self._collections[collection_name].values()
+        )
+        async with self._snapshot_lock:
+            await asyncio.to_thread(self._write_snapshot, encoded)
+
+    def _write_snapshot(self, encoded: bytes):
+        partial_path = f"{self.snapshot_path}.partial"
+        with open(partial_path, "wb") as snapshot:
+            snapshot.write(encoded)
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(partial_path, self.snapshot_path)
+        # The rename itself is only durable once the directory entry is
+        directory = os.open(os.path.dirname(os.path.abspath(self.snapshot_path)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def _insert(self, collection_name: str, document: dict):
+        """Index an already stored document into ``collection_name``"""
+        if collection_name == "users":
+            if document["id"] in self._users:
+                raise self._duplicate("users.id_unique")
+            if document["username"] in self._user_ids_by_username:
+                raise self._duplicate("users.username_unique")
+            if document["email"] in self._user_ids_by_email:
+                raise self._duplicate("users.email_unique")
+            self._users[document["id"]] = document
+            self._user_ids_by_username[document["username"]] = document["id"]
+            self._user_ids_by_email[document["email"]] = document["id"]
+            self._ranked.upsert(document)
+        elif collection_name == "tasks":
+            if document["id"] in self._tasks:
+                raise self._duplicate("tasks.id_unique")
+            self._tasks[document["id"]] = document
+            self._task_keys.setdefault(document["user_id"], SortedList()).add((document["created_at"], document["id"]))
+        elif collection_name == "daily_progress":
+            key = (document["user_id"], document["date"])
+            if key in self._progress:
+                raise self._duplicate("daily_progress.user_id_date_unique")
+            self._progress[key] = document
+            self._progress_user_ids.setdefault(document["date"], set()).add(document["user_id"])
+        elif collection_name == "progress_archives":
+            key = (document["user_id"], document["month"])
+            if key in self._archives:
+                raise self._duplicate("progress_archives.user_id_month_unique")
+            self._archives[key] = document
+        elif collection_name == "progress_rollups":
+            key = (document["user_id"], document["granularity"], document["start"])
+            if key in self._rollups:
+                raise self._duplicate("progress_rollups.user_id_granularity_start_unique")
+            self._rollups[key] = document
+            self._rollup_starts.setdefault(key[:2], SortedList()).add(document["start"])
+        elif collection_name == "quote_favorites":
+            key = (document["user_id"], document["hash"])
+            if document["id"] in self._favorites:
+                raise self._duplicate("quote_favorites.id_unique")
+            if key in self._favorite_ids:
+                raise self._duplicate("quote_favorites.user_id_hash_unique")
+            self._favorites[document["id"]] = document
+            self._favorite_ids[key] = document["id"]
+            self._favorite_keys.setdefault(document["user_id"], SortedList()).add((document["saved_at"], document["id"]))
+        elif collection_name == "quote_catalog":
+            self._catalog[document["id"]] = document
+        elif collection_name == "job_locks":
+            self._job_locks[document["_id"]] = document
+        else:
+            raise ValueError(f"Unknown collection {collection_name}")
+
+    async def get_user(self, user_id):
+        user = self._users.get(user_id)
+        return project_document(user, USER_PROJECTION) if user else None
+
+    async def find_user_by_login(self, login):
+        user_id = self._user_ids_by_email.get(login) or self._user_ids_by_username.get(login)
+        return project_document(self._users[user_id], LOGIN_PROJECTION) if user_id else None
+
+    async def find_registered_user(self, username, email):
+        user_id = self._user_ids_by_username.get(username) or self._user_ids_by_email.get(email)
+        return project_document(self._users[user_id], REGISTRATION_CHECK_PROJECTION) if user_id else None
+
+    async def insert_user(self, user):
+        self._insert("users", self._stored(user))
+
+    async def apply_task_completion(self, user_id, category, points_earned, today_str, now):
+        user = self._users.get(user_id)
+        if user is None:
+            return None
+        apply_user_completion(user, category, points_earned, today_str, stored_datetime(now))
+        self._ranked.upsert(user)
+        return project_document(user, COMPLETION_RESULT_PROJECTION)
+
+    async def count_users(self):
+        return len(self._users)
+
+    async def iter_leaderboard_users(self, user_ids=None):
+        users = list(self._users.values()) if user_ids is None else [
+            self._users[user_id] for user_id in user_ids if user_id in self._users
+        ]
+        for i, user in enumerate(users, start=1):
+            yield project_document(user, LEADERBOARD_PROJECTION)
+            if i % STREAM_BATCH_SIZE == 0:
+                await asyncio.sleep(0)
+
+    @staticmethod
+    def _ranked_key(after: Optional[tuple]) -> Optional[tuple]:
+        return None if after is None else (-after[0], after[1])
+
+    def _leaderboard_docs(self, language, after, limit) -> List[dict]:
+        return [
+            {field: entry[field] for field in ("username", "overall_score", "league", "current_streak")}
+            for entry in self._ranked.top(language, limit, self._ranked_key(after))
+        ]
+
+    async def leaderboard_page(self, language, after, limit):
+        docs = self._leaderboard_docs(language, after, limit + 1)
+        return docs[:limit], len(docs) > limit
+
+    async def stream_leaderboard(self, language, after, limit):
+        served = 0
+        while limit is None or served < limit:
+            size = STREAM_BATCH_SIZE if limit is None else min(STREAM_BATCH_SIZE, limit - served)
+            batch = self._leaderboard_docs(language, after, size)
+            for doc in batch:
+                yield doc
+            if len(batch) < size:
+                return
+            served += len(batch)
+            after = (batch[-1]["overall_score"], batch[-1]["username"])
+            await asyncio.sleep(0)
+
+    async def leaderboard_position(self, user, language, neighbours):
+        return self._ranked.position(user.username, language, neighbours)
+
+    async def iter_deduction_candidates(self):
+        for i, user in enumerate(list(self._users.values()), start=1):
+            yield project_document(user, DEDUCTION_SCAN_PROJECTION)
+            if i % STREAM_BATCH_SIZE == 0:
+                await asyncio.sleep(0)
+
+    async def apply_deductions(self, deductions, now):
+        now = stored_datetime(now)
+        modified = 0
+        for user_id, deduction in deductions:
+            user = self._users.get(user_id)
+            if user is not None:
+                apply_deduction(user, deduction, now)
+                self._ranked.upsert(user)
+                modified += 1
+        return modified
+
+    @staticmethod
+    def _page_ascending(keys: Optional[SortedList], after: Optional[tuple], limit: int) -> list:
+        if not keys:
+            return []
+        start = 0 if after is None else keys.bisect_right(after)
+        return list(keys.islice(start, start + limit))
+
+    @staticmethod
+    def _page_descending(keys: Optional[SortedList], after: Optional[tuple], limit: int) -> list:
+        if not keys:
+            return []
+        stop = len(keys) if after is None else keys.bisect_left(after)
+        return list(keys.islice(max(0, stop - limit), stop, reverse=True))
+
+    async def task_page(self, user_id, after, limit):
+        keys = self._page_ascending(self._task_keys.get(user_id), after, limit + 1)
+        return [project_document(self._tasks[task_id], TASK_PROJECTION) for _, task_id in keys[:limit]], len(keys) > limit
+
+    async def stream_tasks(self, user_id, after, limit):
+        for _, task_id in self._page_ascending(self._task_keys.get(user_id), after, limit or len(self._tasks)):
+            yield project_document(self._tasks[task_id], TASK_PROJECTION)
+
+    def _user_task(self, task_id: str, user_id: str) -> Optional[dict]:
+        task = self._tasks.get(task_id)
+        return task if task is not None and task["user_id"] == user_id else None
+
+    async def count_tasks(self, user_id, category):
+        return sum(1 for _, task_id in self._task_keys.get(user_id, ()) if self._tasks[task_id]["category"] == category)
+
+    async def insert_task(self, task):
+        self._insert("tasks", self._stored(task))
+
+    async def get_task(self, task_id, user_id):
+        task = self._user_task(task_id, user_id)
+        return project_document(task, TASK_PROJECTION) if task else None
+
+    async def update_task(self, task_id, user_id, fields):
+        task = self._user_task(task_id, user_id)
+        if task is None:
+            return None
+        task.update(self._stored(fields))
+        return project_document(task, TASK_PROJECTION)
+
+    async def complete_task(self, task_id, user_id, now):
+        task = self._user_task(task_id, user_id)
+        now = stored_datetime(now)
+        start_of_day = datetime.combine(now.date(), datetime.min.time())
+        if task is None or (task.get("completed_at") is not None and task["completed_at"] >= start_of_day):
+            return None
+        month_key, day_bit = completion_month_bit(now.date())
+        months = task.setdefault("completion_months", {})
+        months[month_key] = months.get(month_key, 0) | day_bit
+        task["is_completed"] = True
+        task["completed_at"] = now
+        task["completion_count"] = task.get("completion_count", 0) + 1
+        return {
+            "category": task["category"],
+            "completion_count": task["completion_count"],
+            "completion_months": {month_key: months[month_key]}
+        }
+
+    async def task_exists(self, task_id, user_id):
+        return self._user_task(task_id, user_id) is not None
+
+    async def delete_task(self, task_id, user_id):
+        task = self._user_task(task_id, user_id)
+        if task is None:
+            return False
+        del self._tasks[task_id]
+        self._task_keys[user_id].remove((task["created_at"], task_id))
+        return True
+
+    async def add_daily_completion(self, user_id, day, category, points_earned):
+        progress = self._progress.get((user_id, day))
+        if progress is None:
+            progress = {"user_id": user_id, "date": day}
+            self._insert("daily_progress", progress)
+        apply_daily_completion(progress, category, points_earned)
+        for granularity, start in rollup_keys(date.fromisoformat(day)):
+            rollup = self._rollups.get((user_id, granularity, start))
+            if rollup is None:
+                rollup = {"user_id": user_id, "granularity": granularity, "start": start}
+                self._insert("progress_rollups", rollup)
+            apply_rollup_completion(rollup, day, category, points_earned)
+
+    async def get_daily_progress(self, user_id, day):
+        progress = self._progress.get((user_id, day))
+        return project_document(progress, DAILY_PROGRESS_PROJECTION) if progress else None
+
+    async def last_full_days(self, window_start, current_date):
+        last_full_days = {}
+        for offset in range((current_date - window_start).days):
+            day = window_start + timedelta(days=offset)
+            day_str = day.isoformat()
+            for user_id in self._progress_user_ids.get(day_str, ()):
+                if self._progress[(user_id, day_str)].get("streak_day"):
+                    last_full_days[user_id] = day
+        return last_full_days
+
+    async def oldest_progress_date(self):
+        return min(self._progress_user_ids, default=None)
+
+    async def iter_month_progress(self, start, end):
+        by_user: Dict[str, list] = {}
+        for day in sorted(day for day in self._progress_user_ids if start <= day < end):
+            for user_id in self._progress_user_ids[day]:
+                by_user.setdefault(user_id, []).append(project_document(self._progress[(user_id, day)], DAILY_PROGRESS_PROJECTION))
+        for user_id, dailies in by_user.items():
+            yield user_id, dailies
+
+    async def delete_progress(self, user_ids, start, end):
+        deleted = 0
+        for day in [day for day in self._progress_user_ids if start <= day < end]:
+            user_ids_on_day = self._progress_user_ids[day]
+            for user_id in user_ids:
+                if self._progress.pop((user_id, day), None) is not None:
+                    user_ids_on_day.discard(user_id)
+                    deleted += 1
+            if not user_ids_on_day:
+                del self._progress_user_ids[day]
+        return deleted
+
+    async def archive_progress(self, archives):
+        for archive in archives:
+            if (archive["user_id"], archive["month"]) not in self._archives:
+                self._insert("progress_archives", self._stored(archive))
+
+    async def progress_rollups(self, user_id, granularity, since):
+        return [
+            project_document(self._rollups[(user_id, granularity, start)], PROGRESS_ROLLUP_PROJECTION)
+            for start in self._rollup_starts.get((user_id, granularity), SortedList()).irange(minimum=since)
+        ]
+
+    async def favorite_page(self, user_id, after, limit):
+        keys = self._page_descending(self._favorite_keys.get(user_id), after, limit + 1)
+        return [
+            project_document(self._favorites[favorite_id], QUOTE_FAVORITE_PROJECTION) for _, favorite_id in keys[:limit]
+        ], len(keys) > limit
+
+    async def stream_favorites(self, user_id, after, limit):
+        for _, favorite_id in self._page_descending(self._favorite_keys.get(user_id), after, limit or len(self._favorites)):
+            yield project_document(self._favorites[favorite_id], QUOTE_FAVORITE_PROJECTION)
+
+    async def saved_favorite_hashes(self, user_id, hashes):
+        return {content_hash for content_hash in hashes if (user_id, content_hash) in self._favorite_ids}
+
+    async def save_favorite(self, favorite):
+        favorite_id = self._favorite_ids.get((favorite["user_id"], favorite["hash"]))
+        if favorite_id is None:
+            stored = self._stored(favorite)
+            self._insert("quote_favorites", stored)
+            favorite_id = stored["id"]
+        return project_document(self._favorites[favorite_id], QUOTE_FAVORITE_PROJECTION)
+
+    async def delete_favorite(self, user_id, favorite_id=None, content_hash=None):
+        if favorite_id is None:
+            favorite_id = self._favorite_ids.get((user_id, content_hash))
+        favorite = self._favorites.get(favorite_id)
+        if favorite is None or favorite["user_id"] != user_id:
+            return False
+        del self._favorites[favorite_id]
+        del self._favorite_ids[(user_id, favorite["hash"])]
+        self._favorite_keys[user_id].remove((favorite["saved_at"], favorite_id))
+        return True
+
+    async def store_catalog_quotes(self, quotes):
+        for quote in quotes:
+            self._insert("quote_catalog", self._stored(quote))
+
+    async def load_catalog_quotes(self):
+        return [project_document(quote, CATALOG_QUOTE_PROJECTION) for quote in self._catalog.values()]
+
+    async def acquire_job_lock(self, job_name, run_date):
+        now = stored_datetime(datetime.now(timezone.utc))
+        lock = self._job_locks.get(job_name)
+        if lock is not None and lock["run_date"] == run_date and not (
+            lock["status"] == "running" and lock["locked_at"] < now - timedelta(minutes=JOB_LOCK_LEASE_MINUTES)
+        ):
+            return False
+        self._job_locks[job_name] = {
+            "_id": job_name, "run_date": run_date, "status": "running", "locked_at": now, "owner": WORKER_ID
+        }
+        return True
+
+    async def update_job_lock(self, job_name, fields):
+        lock = self._job_locks.get(job_name)
+        if lock is not None and lock["owner"] == WORKER_ID:
+            lock.update(self._stored(fields))
+
+    async def insert_stream_ticket(self, ticket):
+        # Expired tickets go as new ones come in, like under the TTL index
+        now = datetime.now(timezone.utc)
+        for expired in [key for key, stored in self._stream_tickets.items() if stored["expires_at"] <= now]:
+            del self._stream_tickets[expired]
+        self._stream_tickets[ticket["hash"]] = dict(ticket)
+
+    async def redeem_stream_ticket(self, ticket_hash):
+        ticket = self._stream_tickets.pop(ticket_hash, None)
+        if ticket is None or ticket["expires_at"] <= datetime.now(timezone.utc):
+            return None
+        return ticket["user_id"]
+
+    async def import_documents(self, collection_name, documents):
+        for document in documents:
+            self._insert(collection_name, self._stored(document))
+
+class PendingWrite:
+    """Buffered writes to one document: its value as requests should now see it,
+    and the $inc/$addToSet amounts that take the stored document there"""
+
+    __slots__ = ("document", "increments", "additions")
+
+    def __init__(self, document: dict):
+        self.document = document
+        self.increments: Dict[str, float] = {}
+        self.additions: Dict[str, list] = {}
+
+    def increment(self, path: str, amount: float):
+        if amount:
+            self.increments[path] = self.increments.get(path, 0) + amount
+
+    def add(self, path: str, values: list):
+        for value in values:
+            added = self.additions.setdefault(path, [])
+            if value not in added:
+                added.append(value)
+
+    def absorb(self, newer: "PendingWrite") -> "PendingWrite":
+        """This unwritten buffer followed by ``newer``, as one"""
+        merged = PendingWrite(newer.document)
+        for pending in (self, newer):
+            for path, amount in pending.increments.items():
+                merged.increment(path, amount)
+            for path, values in pending.additions.items():
+                merged.add(path, values)
+        return merged
+
+    def changes(self) -> dict:
+        update = {}
+        if self.increments:
+            update["$inc"] = dict(self.increments)
+        if self.additions:
+            update["$addToSet"] = {path: {"$each": list(values)} for path, values in self.additions.items()}
+        return update
+
+class WriteBehindMongoStorage(MongoStorage):
+    """MongoStorage that buffers completions in memory and writes them in bulk every ``flush_seconds``"""
+
+    BUFFERED = ("users", "daily_progress", "progress_rollups")
+
+    def __init__(self, database, flush_seconds: float, max_pending: int):
+        super().__init__(database)
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        # Per collection; buffers being written out stay readable until the write lands
+        self._buffers: Dict[str, Dict[object, PendingWrite]] = {name: {} for name in self.BUFFERED}
+        self._flushing: Dict[str, Dict[object, PendingWrite]] = {name: {} for name in self.BUFFERED}
+        self._updates = {
+            "users": self._user_update, "daily_progress": self._progress_update, "progress_rollups": self._rollup_update
+        }
+        self._loads = SingleFlight()
+        self._flushes = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_due = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def prepare(self):
+        await super().prepare()
+        self._flusher = asyncio.create_task(self._run_flusher())
+
+    async def close(self):
+        await self.drain()
+        await super().close()
+
+    async def drain(self):
+        """Stop the background flusher and write out everything buffered"""
+        if self._flusher:
+            self._flusher.cancel()
+            self._flusher = None
+        for attempt in range(1, WRITE_BEHIND_SHUTDOWN_ATTEMPTS + 1):
+            try:
+                await self.flush()
+                return
+            except Exception:
+                logger.exception(f"Write-behind flush failed (attempt {attempt} of {WRITE_BEHIND_SHUTDOWN_ATTEMPTS})")
+                if attempt < WRITE_BEHIND_SHUTDOWN_ATTEMPTS:
+                    await asyncio.sleep(attempt)
+        # Last resort: log the updates so they can be replayed by hand
+        for name, buffers in self._buffers.items():
+            for key, pending in buffers.items():
+                query, update, _ = self._updates[name](key, pending)
+                logger.error(f"Unflushed {name} update: {orjson.dumps({'filter': query, 'update': update}).decode()}")
+
+    async def _run_flusher(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_due.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_due.clear()
+            try:
+                # Shielded so drain() waits for a write in progress instead of cutting it off
+                await asyncio.shield(self.flush())
+            except Exception:
+                logger.exception("Write-behind flush failed, retrying with the next one")
+
+    async def flush(self) -> int:
+        """Write out every buffer; returns the documents written"""
+        async with self._flush_lock:
+            if not any(self._buffers.values()):
+                return 0
+            self._flushing, self._buffers = self._buffers, {name: {} for name in self.BUFFERED}
+            try:
+                results = await asyncio.gather(*map(self._write, self.BUFFERED), return_exceptions=True)
+            finally:
+                self._flushing = {name: {} for name in self.BUFFERED}
+                self._flushes += 1
+                self._buffered()
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            return sum(results)
+
+    async def _write(self, name: str) -> int:
+        flushing = self._flushing[name]
+        if not flushing:
+            return 0
+        keys = list(flushing)
+        try:
+            await self.db[name].bulk_write([UpdateOne(*self._updates[name](key, flushing[key])) for key in keys],
+                                           ordered=False)
+        except BulkWriteError as error:
+            self._requeue(name, [keys[write_error["index"]] for write_error in error.details.get("writeErrors", [])])
+            raise
+        except Exception:
+            self._requeue(name, keys)
+            raise
+        WRITE_BEHIND_FLUSHED.labels(name, "written").inc(len(keys))
+        return len(keys)
+
+    def _requeue(self, name: str, keys: list):
+        # Ahead of anything buffered meanwhile, to go out with the next flush
+        buffers, flushing = self._buffers[name], self._flushing[name]
+        for key in keys:
+            buffers[key] = flushing[key].absorb(buffers[key]) if key in buffers else flushing[key]
+        WRITE_BEHIND_FLUSHED.labels(name, "requeued").inc(len(keys))
+
+    # Users and dailies are written with update pipelines that work derived fields out from the
+    # stored document, so what another process wrote since the copy was read (a deduction, a
+    # completion) is built on rather than overwritten
+    @staticmethod
+    def _user_update(user_id: str, pending: PendingWrite) -> tuple:
+        user = pending.document
+        day, categories = user["progress_date"], user["progress_categories"]
+        leagues = [league.value for league in LEAGUE_ORDER]
+        return {"id": user_id}, [
+            {"$set": {
+                **{path: {"$add": [{"$ifNull": [f"${path}", 0]}, amount]} for path, amount in pending.increments.items()},
+                "badges": {"$concatArrays": ["$badges", {"$filter": {
+                    "input": pending.additions.get("badges", []), "cond": {"$not": [{"$in": ["$$this", "$badges"]}]}
+                }}]},
+                # Leagues never demote: keep whichever of the stored and buffered ones is higher
+                "league": {"$arrayElemAt": [leagues, {"$max": [
+                    {"$indexOfArray": [leagues, "$league"]}, leagues.index(user["league"])
+                ]}]},
+                "progress_date": {"$max": ["$progress_date", day]},
+                "progress_categories": {"$switch": {"branches": [
+                    {"case": {"$gt": ["$progress_date", day]}, "then": "$progress_categories"},
+                    {"case": {"$eq": ["$progress_date", day]},
+                     "then": {"$setUnion": [{"$ifNull": ["$progress_categories", []]}, categories]}},
+                ], "default": categories}},
+                "last_task_completion": {"$max": ["$last_task_completion", user["last_task_completion"]]},
+            }},
+            {"$set": {
+                "overall_score": OVERALL_SCORE_EXPRESSION,
+                "best_streak": {"$max": ["$best_streak", "$current_streak", user["best_streak"]]},
+            }},
+        ], False
+
+    @staticmethod
+    def _progress_update(key: tuple, pending: PendingWrite) -> tuple:
+        user_id, day = key
+        return {"user_id": user_id, "date": day}, [
+            {"$set": {
+                "id": {"$ifNull": ["$id", pending.document["id"]]},
+                "completed_categories": {"$setUnion": [
+                    {"$ifNull": ["$completed_categories", []]}, pending.additions.get("completed_categories", [])
+                ]},
+                "points_earned": {"$mergeObjects": [
+                    {c.value: 0.0 for c in TaskCategory}, {"$ifNull": ["$points_earned", {}]}
+                ]},
+            }},
+            {"$set": {
+                **{path: {"$add": [f"${path}", amount]} for path, amount in pending.increments.items()},
+                "streak_day": {"$eq": [{"$size": "$completed_categories"}, len(TaskCategory)]},
+            }},
+        ], True
+
+    @staticmethod
+    def _rollup_update(key: tuple, pending: PendingWrite) -> tuple:
+        user_id, granularity, start = key
+        return {"user_id": user_id, "granularity": granularity, "start": start}, pending.changes(), True
+
+    def _buffered(self):
+        for name, buffers in self._buffers.items():
+            WRITE_BEHIND_PENDING.labels(name).set(len(buffers))
+        if sum(map(len, self._buffers.values())) >= self.max_pending:
+            self._flush_due.set()
+
+    def _pending(self, name: str, key) -> Optional[PendingWrite]:
+        buffers, flushing = self._buffers[name], self._flushing[name]
+        pending = buffers.get(key)
+        if pending is None and key in flushing:
+            # Carry on from the value being written; only new changes go in the next write
+            pending = buffers[key] = PendingWrite(bson.decode(bson.encode(flushing[key].document)))
+        return pending
+
+    async def _buffer(self, name: str, key, load) -> Optional[PendingWrite]:
+        pending = self._pending(name, key)
+        while pending is None:
+            # Nothing buffered means Mongo is current, unless a flush landed during the read: then
+            # read again. Keyed by flush count too, so a read is never joined after a flush landed
+            flushes = self._flushes
+            document = await self._loads.do((name, key, flushes), load)
+            pending = self._pending(name, key)
+            if pending is None and flushes == self._flushes:
+                if document is None:
+                    return None
+                pending = self._buffers[name][key] = PendingWrite(bson.decode(bson.encode(document)))
+        return pending
+
+    def _buffered_document(self, name: str, key) -> Optional[PendingWrite]:
+        return self._buffers[name].get(key) or self._flushing[name].get(key)
+
+    async def _load_progress(self, user_id: str, day: str) -> dict:
+        progress = await super().get_daily_progress(user_id, day)
+        return progress or DailyProgress(user_id=user_id, date=day).model_dump()
+
+    def _overlay(self, user: Optional[dict]) -> Optional[dict]:
+        pending = user and self._buffered_document("users", user["id"])
+        if not pending:
+            return user
+        return {**user, **project_document(pending.document, dict.fromkeys(user, 1))}
+
+    async def get_user(self, user_id):
+        return self._overlay(await super().get_user(user_id))
+
+    async def find_user_by_login(self, login):
+        return self._overlay(await super().find_user_by_login(login))
+
+    async def apply_task_completion(self, user_id, category, points_earned, today_str, now):
+        pending = await self._buffer("users", user_id,
+                                     lambda: self.db.users.find_one({"id": user_id}, WRITE_BEHIND_USER_PROJECTION))
+        if pending is None:
+            return None
+        user = pending.document
+        streak, badges = user["current_streak"], len(user["badges"])
+        apply_user_completion(user, category, points_earned, today_str, stored_datetime(now))
+        pending.increment(f"total_points.{category.value}", points_earned)
+        pending.increment("current_streak", user["current_streak"] - streak)
+        pending.add("badges", user["badges"][badges:])
+        self._buffered()
+        return project_document(user, COMPLETION_RESULT_PROJECTION)
+
+    async def apply_deductions(self, deductions, now):
+        modified = await super().apply_deductions(deductions, now)
+        # Completions buffered since the job flushed: the stored streak is 0 now, so theirs can't be added to it
+        for user_id, deduction in deductions:
+            pending = self._buffered_document("users", user_id)
+            if pending:
+                apply_deduction(pending.document, deduction, stored_datetime(now))
+                pending.increments.pop("current_streak", None)
+        return modified
+
+    async def add_daily_completion(self, user_id, day, category, points_earned):
+        pending = await self._buffer("daily_progress", (user_id, day), lambda: self._load_progress(user_id, day))
+        previous = project_document(pending.document, DAILY_PROGRESS_PROJECTION)
+        apply_daily_completion(pending.document, category, points_earned)
+        pending.increment(f"points_earned.{category.value}", points_earned)
+        pending.add("completed_categories", [category.value])
+        # Rollups are pure $inc: nothing to read first, reads add the pending amounts to what is stored
+        increments = rollup_increments(previous, category, points_earned)
+        for granularity, start in rollup_keys(date.fromisoformat(day)):
+            rollup = self._buffers["progress_rollups"].setdefault((user_id, granularity, start), PendingWrite({}))
+            for path, amount in increments.items():
+                rollup.increment(path, amount)
+            rollup.add(f"day_categories.{day}", [category.value])
+        self._buffered()
+
+    async def get_daily_progress(self, user_id, day):
+        pending = self._buffered_document("daily_progress", (user_id, day))
+        if pending:
+            return project_document(pending.document, DAILY_PROGRESS_PROJECTION)
+        return await super().get_daily_progress(user_id, day)
+
+    async def progress_rollups(self, user_id, granularity, since):
+        def pending_rollups(buffers):
+            return [(start, pending) for (pending_user_id, pending_granularity, start), pending in buffers.items()
+                    if pending_user_id == user_id and pending_granularity == granularity and start >= since]
+
+        # Every increment must be either in what's read or still buffered, never both: read again
+        # if a flush landed during the read, and wait out a write of this user's rollups in flight
+        while True:
+            flushes = self._flushes
+            stored = await super().progress_rollups(user_id, granularity, since)
+            if flushes != self._flushes:
+                continue
+            if not pending_rollups(self._flushing["progress_rollups"]):
+                break
+            async with self._flush_lock:
+                pass
+        rollups = {rollup["start"]: rollup for rollup in stored}
+        for start, pending in pending_rollups(self._buffers["progress_rollups"]):
+            apply_increments(rollups.setdefault(start, {"start": start}), pending.increments)
+        return [rollups[start] for start in sorted(rollups)]
+
+def storage_from_env() -> Storage:
+    if STORAGE_ENGINE == "memory":
+        return MemoryStorage(MEMORY_SNAPSHOT_PATH)
+    if WRITE_BEHIND_ENABLED:
+        return WriteBehindMongoStorage(db, WRITE_BEHIND_FLUSH_SECONDS, WRITE_BEHIND_MAX_PENDING)
+    return MongoStorage(db)
+
+storage = storage_from_env()  # The default app's, and the maintenance commands'
+
+async def apply_daily_point_deductions(storage: Storage, current_date: date) -> int:
+    """Deduct points from every user who missed 2+ consecutive days; returns users deducted"""
+    await storage.flush()
+    last_full_days = await storage.last_full_days(current_date - timedelta(days=DEDUCTION_WINDOW_DAYS), current_date)
+    now = datetime.now(timezone.utc)
+    deducted = 0
+    batch = []
+    
+    async def flush():
+        nonlocal deducted, batch
+        user_ids = [user_id for user_id, _ in batch]
+        deducted += await storage.apply_deductions(batch, now)
+        for user_id in user_ids:
+            auth_cache.invalidate(user_id)
+        batch = []
+        if leaderboard.ready:
+            async for user in storage.iter_leaderboard_users(user_ids):
+                leaderboard.upsert(user)
+    
+    async for user in storage.iter_deduction_candidates():
+        missed_days = count_missed_days(last_full_days.get(user["id"]), current_date)
+        if not point_deduction_due(missed_days, user.get("last_point_deduction"), current_date):
+            continue
+        _, deduction_multiplier = get_league_multipliers(LeagueLevel(user["league"]))
+        batch.append((user["id"], deduction_multiplier))
+        if len(batch) >= DEDUCTION_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+    return deducted
+
+async def run_daily_job(storage: Storage, job_name: str, job: Callable[[Storage, date], Awaitable],
+                        summary: Callable[[Any], dict]):
+    """Run ``job`` for today once per UTC day across all workers; None if another worker has"""
+    run_date = datetime.now(timezone.utc).date()
+    if not await storage.acquire_job_lock(job_name, run_date.isoformat()):
+        return None
+    try:
+        result = await job(storage, run_date)
+    except Exception:
+        # Release the claim so the next check retries
+        await storage.update_job_lock(job_name, {"run_date": None, "status": "failed"})
+        raise
+    await storage.update_job_lock(
+        job_name, {"status": "done", "finished_at": datetime.now(timezone.utc), **summary(result)}
+    )
+    return result
+
+async def run_daily_job_scheduler(storage: Storage, run: Callable[[Storage], Awaitable], interval_seconds: float):
+    while True:
+        try:
+            await run(storage)
+        except Exception:
+            logger.exception(f"{run.__name__} failed")
+        await asyncio.sleep(interval_seconds)
+
+async def run_daily_point_deductions(storage: Storage) -> Optional[int]:
+    deducted = await run_daily_job(
+        storage, "point_deductions", apply_daily_point_deductions, lambda deducted: {"users_deducted": deducted}
+    )
+    if deducted is not None:
+        logger.info(f"Point deductions applied to {deducted} users")
+    return deducted
+
+async def compact_daily_progress(storage: Storage, current_date: date) -> dict:
+    """Fold every whole month of daily_progress before the retention window into
+    progress_archives, then delete those dailies.
 
-class LeaderboardEntry(BaseModel):
-    username: str
-    overall_score: float
-    league: LeagueLevel
-    current_streak: int
-    rank: int
+    A month is only folded once all of it is past the window, so no completion
+    can still land in it, and its archive is only ever inserted, so a run that
+    stops between archiving and deleting is finished by the next one. Reports
+    what was folded; ``bytes_reclaimed`` is the BSON size of the deleted
+    dailies minus that of the archives (disk space follows as Mongo reuses it).
+    """
+    await storage.flush()
+    cutoff = current_date - timedelta(days=DAILY_PROGRESS_RETENTION_DAYS)
+    report = {"months": 0, "archives": 0, "dailies_deleted": 0, "bytes_reclaimed": 0}
+    oldest = await storage.oldest_progress_date()
+    if oldest is None:
+        return report
+    month = date.fromisoformat(oldest).replace(day=1)
+    while next_month(month) <= cutoff:
+        start, end = month.isoformat(), next_month(month).isoformat()
+        batch = []
 
-class AuthResponse(BaseModel):
-    access_token: str
-    token_type: str = "bearer"
-    user: User
+        async def fold():
+            await storage.archive_progress([archive for archive, _ in batch])
+            report["dailies_deleted"] += await storage.delete_progress([archive["user_id"] for archive, _ in batch], start, end)
+            report["archives"] += len(batch)
+            report["bytes_reclaimed"] += sum(folded - len(bson.encode(archive)) for archive, folded in batch)
+            batch.clear()
 
-# Helper functions
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        async for user_id, dailies in storage.iter_month_progress(start, end):
+            batch.append((build_progress_archive(user_id, month, dailies), sum(len(bson.encode(d)) for d in dailies)))
+            if len(batch) >= PROGRESS_COMPACTION_BATCH_SIZE:
+                await fold()
+        if batch:
+            await fold()
+        report["months"] += 1
+        month = next_month(month)
+    return report
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+async def run_daily_progress_compaction(storage: Storage) -> Optional[dict]:
+    report = await run_daily_job(storage, "progress_compaction", compact_daily_progress, lambda report: report)
+    if report is not None:
+        logger.info(
+            f"Compacted {report['months']} months of daily_progress: {report['dailies_deleted']} dailies into "
+            f"{report['archives']} archives, {report['bytes_reclaimed'] / 1e6:.1f} MB reclaimed"
+        )
+    return report
 
-def create_access_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRY_HOURS)
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
+async def run_leaderboard_reconciler(storage: Storage):
+    while True:
+        try:
+            if await leaderboard.reload(storage):
+                logger.info(f"Leaderboard reconciled with {len(leaderboard)} users")
+            else:
+                logger.warning("Too many users for the in-memory leaderboard, serving it from Mongo")
+        except Exception:
+            logger.exception("Leaderboard reconciliation failed")
+        await asyncio.sleep(LEADERBOARD_RECONCILE_SECONDS)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def refresh_quote_catalog(storage: Storage, source) -> int:
+    """Pull ``source`` into the quote_catalog collection, then serve whatever is stored.
+
+    An unreachable upstream only means the stored catalog is served a while
+    longer; with nothing stored yet the bundled quotes.json is used.
+    """
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials"
-            )
-    except jwt.PyJWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
+        quotes = [quote for quote in map(parse_upstream_quote, await source.fetch()) if quote]
+        if quotes:
+            await storage.store_catalog_quotes(quotes)
+    except (httpx.HTTPError, OSError, ValueError, AttributeError) as error:
+        logger.warning(f"Quote upstream unavailable, serving the stored catalog: {error!r}")
     
-    user = await db.users.find_one({"id": user_id})
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
-        )
-    return User(**user)
+    stored = await storage.load_catalog_quotes()
+    if not stored and not len(quote_catalog):
+        stored = [quote for quote in map(parse_upstream_quote, await FileQuoteSource(BUNDLED_QUOTES_PATH).fetch()) if quote]
+    if stored:
+        quote_catalog.load(stored)
+    return len(quote_catalog)
 
-def calculate_overall_score(points: Dict[str, float]) -> float:
-    total = sum(points.values())
-    return round(total / 5, 2)
+async def run_quote_catalog_refresher(storage: Storage):
+    source = quote_source(QUOTES_UPSTREAM)
+    while True:
+        try:
+            logger.info(f"Quote catalog holds {await refresh_quote_catalog(storage, source)} quotes")
+        except Exception:
+            logger.exception("Quote catalog refresh failed")
+        await asyncio.sleep(QUOTES_REFRESH_SECONDS)
 
-def get_league_multipliers(league: LeagueLevel) -> tuple[float, float]:
-    """Returns (points_multiplier, deduction_multiplier)"""
-    multipliers = {
-        LeagueLevel.NORMAL: (2.0, 4.0),
-        LeagueLevel.NOVICE: (1.5, 4.0),
-        LeagueLevel.ADVANCED: (1.0, 4.0),
-        LeagueLevel.MASTER: (1.0, 3.0),
-        LeagueLevel.LEGENDARY: (0.5, 1.5),
-        LeagueLevel.DISCIPLINE_STAR: (0.1, 0.4)
-    }
-    return multipliers.get(league, (2.0, 4.0))
+def completion_events(task_id: str, task: dict, month_key: str, category: TaskCategory, points_earned: float,
+                      before: User, after: dict, previous_rank: Optional[int], rank: Optional[int]) -> List[dict]:
+    """Deltas pushed to the user's event streams after a completion.
 
-async def check_and_apply_point_deductions(user: User):
-    """Check if user missed tasks for 2+ consecutive days and apply deductions"""
-    current_date = datetime.now(timezone.utc).date()
-    
-    # Get user's daily progress for last few days
-    recent_progress = await db.daily_progress.find({
-        "user_id": user.id,
-        "date": {"$gte": (current_date - timedelta(days=7)).isoformat()}
-    }).to_list(10)
-    
-    progress_by_date = {p["date"]: p for p in recent_progress}
-    
-    consecutive_missed_days = 0
-    check_date = current_date - timedelta(days=1)
-    
-    # Count consecutive days without completing all categories
-    while consecutive_missed_days < 7:  # Don't check more than a week back
-        date_str = check_date.isoformat()
-        progress = progress_by_date.get(date_str)
-        
-        if not progress or len(progress["completed_categories"]) < 5:
-            consecutive_missed_days += 1
-        else:
-            break
-            
-        check_date -= timedelta(days=1)
-    
-    # Apply deductions if 2+ consecutive missed days
-    if consecutive_missed_days >= 2:
-        _, deduction_multiplier = get_league_multipliers(user.league)
-        
-        # Check if we already applied deduction recently
-        if user.last_point_deduction:
-            days_since_deduction = (current_date - user.last_point_deduction.date()).days
-            if days_since_deduction < consecutive_missed_days:
-                return  # Already applied deduction recently
-        
-        # Apply deductions to all categories
-        updated_points = user.total_points.copy()
-        for category in TaskCategory:
-            updated_points[category.value] = max(0, updated_points[category.value] - deduction_multiplier)
-        
-        # Reset streak
-        await db.users.update_one(
-            {"id": user.id},
-            {
-                "$set": {
-                    "total_points": updated_points,
-                    "current_streak": 0,
-                    "last_point_deduction": datetime.now(timezone.utc)
-                }
-            }
-        )
+    ``before`` is the request's (possibly cached) user, so a change is only
+    reported when the new value differs from it, and events always carry the
+    new value rather than an increment the client would have to trust.
+    """
+    events = [
+        {
+            "type": "task_completed",
+            "task_id": task_id,
+            "completion_count": task["completion_count"],
+            "completion_months": {month_key: task["completion_months"][month_key]}
+        },
+        {
+            "type": "points",
+            "category": category.value,
+            "delta": points_earned,
+            "points": after["total_points"][category.value],
+            "overall_score": after["overall_score"]
+        }
+    ]
+    if after["current_streak"] != before.current_streak or after["best_streak"] != before.best_streak:
+        events.append({"type": "streak", "current_streak": after["current_streak"], "best_streak": after["best_streak"]})
+    if after["league"] != before.league:
+        events.append({"type": "league", "league": after["league"]})
+    new_badges = [badge for badge in after["badges"] if badge not in before.badges]
+    if new_badges:
+        events.append({"type": "badges", "added": new_badges})
+    if rank is not None and rank != previous_rank:
+        events.append({"type": "rank", "rank": rank, "previous_rank": previous_rank})
+    return events
 
 # Authentication Routes
 @api_router.post("/auth/register", response_model=AuthResponse)
-async def register(user_data: UserRegister):
+async def register(user_data: UserRegister, storage: Storage = Depends(get_storage)):
     # Check if username or email already exists
-    existing_user = await db.users.find_one({
-        "$or": [
-            {"username": user_data.username},
-            {"email": user_data.email}
-        ]
-    })
+    existing_user = await storage.find_registered_user(user_data.username, user_data.email)
     
     if existing_user:
         if existing_user["username"] == user_data.username:
@@ -284,7 +3106,7 @@ async def register(user_data: UserRegister):
             )
     
     # Create new user
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     user = User(
         username=user_data.username,
         email=user_data.email,
@@ -294,7 +3116,16 @@ async def register(user_data: UserRegister):
     user_dict = user.dict()
     user_dict["password"] = hashed_password
     
-    await db.users.insert_one(user_dict)
+    try:
+        await storage.insert_user(user_dict)
+    except DuplicateKeyError:
+        # Lost a race with a concurrent registration of the same username/email
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already registered"
+        )
+    
+    leaderboard.upsert(user.dict())
     
     # Create access token
     access_token = create_access_token(data={"sub": user.id})
@@ -302,16 +3133,11 @@ async def register(user_data: UserRegister):
     return AuthResponse(access_token=access_token, user=user)
 
 @api_router.post("/auth/login", response_model=AuthResponse)
-async def login(login_data: UserLogin):
+async def login(login_data: UserLogin, storage: Storage = Depends(get_storage)):
     # Find user by email or username
-    user_doc = await db.users.find_one({
-        "$or": [
-            {"email": login_data.login},
-            {"username": login_data.login}
-        ]
-    })
+    user_doc = await storage.find_user_by_login(login_data.login)
     
-    if not user_doc or not verify_password(login_data.password, user_doc["password"]):
+    if not user_doc or not await password_hasher.verify(login_data.password, user_doc["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email/username or password"
@@ -324,26 +3150,37 @@ async def login(login_data: UserLogin):
 
 @api_router.get("/auth/me", response_model=User)
 async def get_me(current_user: User = Depends(get_current_user)):
-    # Apply any pending point deductions
-    await check_and_apply_point_deductions(current_user)
-    
-    # Get updated user data
-    updated_user = await db.users.find_one({"id": current_user.id})
-    return User(**updated_user)
+    return ORJSONResponse(encode_document(User, dict(current_user)))
 
 # Task Management Routes
 @api_router.get("/tasks", response_model=List[Task])
-async def get_tasks(current_user: User = Depends(get_current_user)):
-    tasks = await db.tasks.find({"user_id": current_user.id}).to_list(100)
-    return [Task(**task) for task in tasks]
+async def get_tasks(
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_SIZE),
+    stream: bool = False,
+    current_user: User = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
+):
+    """Tasks oldest first; page with the X-Next-Cursor header, or ``stream`` them as NDJSON"""
+    after_key = decode_cursor(after, datetime.fromisoformat, str) if after else None
+    if stream:
+        return ndjson_response(encode_each(
+            storage.stream_tasks(current_user.id, after_key, limit),
+            lambda doc: encode_document(Task, doc, TASK_FIELDS)
+        ))
+    
+    tasks, has_more = await storage.task_page(current_user.id, after_key, limit or PAGE_SIZE)
+    next_cursor = encode_cursor(tasks[-1]["created_at"], tasks[-1]["id"]) if has_more else None
+    return page_response(encode_documents(Task, tasks, TASK_FIELDS), next_cursor)
 
 @api_router.post("/tasks", response_model=Task)
-async def create_task(task_data: TaskCreate, current_user: User = Depends(get_current_user)):
+async def create_task(
+    task_data: TaskCreate,
+    current_user: User = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
+):
     # Check if user already has 2 tasks in this category
-    existing_tasks = await db.tasks.count_documents({
-        "user_id": current_user.id,
-        "category": task_data.category.value
-    })
+    existing_tasks = await storage.count_tasks(current_user.id, task_data.category.value)
     
     if existing_tasks >= 2:
         raise HTTPException(
@@ -358,182 +3195,89 @@ async def create_task(task_data: TaskCreate, current_user: User = Depends(get_cu
         description=task_data.description
     )
     
-    await db.tasks.insert_one(task.dict())
+    await storage.insert_task(task.dict())
     return task
 
 @api_router.put("/tasks/{task_id}", response_model=Task)
 async def update_task(
     task_id: str, 
     task_update: TaskUpdate, 
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
 ):
-    task = await db.tasks.find_one({"id": task_id, "user_id": current_user.id})
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Task not found"
-        )
-    
     update_data = {k: v for k, v in task_update.dict().items() if v is not None}
     
-    await db.tasks.update_one(
-        {"id": task_id},
-        {"$set": update_data}
-    )
-    
-    updated_task = await db.tasks.find_one({"id": task_id})
-    return Task(**updated_task)
-
-@api_router.post("/tasks/{task_id}/complete")
-async def complete_task(task_id: str, current_user: User = Depends(get_current_user)):
-    task = await db.tasks.find_one({"id": task_id, "user_id": current_user.id})
-    if not task:
+    if update_data:
+        updated_task = await storage.update_task(task_id, current_user.id, update_data)
+    else:
+        updated_task = await storage.get_task(task_id, current_user.id)
+    if not updated_task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found"
         )
+    auth_cache.invalidate(current_user.id)
     
+    return ORJSONResponse(encode_document(Task, updated_task, TASK_FIELDS))
+
+@api_router.post("/tasks/{task_id}/complete")
+async def complete_task(
+    task_id: str,
+    current_user: User = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
+):
     current_date = datetime.now(timezone.utc)
     today_str = current_date.date().isoformat()
+    month_key, _ = completion_month_bit(current_date.date())
     
-    # Check if task was already completed today
-    task_obj = Task(**task)
-    today_completed = any(
-        completion.date() == current_date.date() 
-        for completion in task_obj.completion_dates
-    )
+    # Mark the task completed unless it already was today
+    task = await storage.complete_task(task_id, current_user.id, current_date)
     
-    if today_completed:
+    if not task:
+        if await storage.task_exists(task_id, current_user.id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Task already completed today"
+            )
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Task already completed today"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
         )
     
-    # Add completion date
-    completion_dates = task_obj.completion_dates + [current_date]
-    
-    # Update task
-    await db.tasks.update_one(
-        {"id": task_id},
-        {
-            "$set": {
-                "is_completed": True,
-                "completed_at": current_date,
-                "completion_dates": [d.isoformat() for d in completion_dates]
-            }
-        }
-    )
+    category = TaskCategory(task["category"])
     
     # Calculate points based on league
     points_multiplier, _ = get_league_multipliers(current_user.league)
     points_earned = points_multiplier
     
-    # Update user points
-    updated_points = current_user.total_points.copy()
-    updated_points[task_obj.category.value] += points_earned
-    
-    # Get or create daily progress
-    daily_progress = await db.daily_progress.find_one({
-        "user_id": current_user.id,
-        "date": today_str
-    })
-    
-    if not daily_progress:
-        daily_progress = DailyProgress(
-            user_id=current_user.id,
-            date=today_str
-        ).dict()
-    
-    # Update daily progress
-    if task_obj.category not in daily_progress["completed_categories"]:
-        daily_progress["completed_categories"].append(task_obj.category.value)
-    daily_progress["points_earned"][task_obj.category.value] += points_earned
-    
-    # Check if all categories completed (streak day)
-    all_categories_completed = len(daily_progress["completed_categories"]) == 5
-    daily_progress["streak_day"] = all_categories_completed
-    
-    # Update streak if all categories completed
-    new_streak = current_user.current_streak
-    new_best_streak = current_user.best_streak
-    
-    if all_categories_completed:
-        new_streak += 1
-        new_best_streak = max(new_best_streak, new_streak)
-        
-        # Check for league promotion
-        new_league = current_user.league
-        new_badges = current_user.badges.copy()
-        
-        if new_streak == 25 and current_user.league == LeagueLevel.NORMAL:
-            new_league = LeagueLevel.NOVICE
-            new_badges.append("Bronze Trophy")
-        elif new_streak == 50 and current_user.league == LeagueLevel.NOVICE:
-            new_league = LeagueLevel.ADVANCED
-            new_badges.append("Silver Trophy")
-        elif new_streak == 100 and current_user.league == LeagueLevel.ADVANCED:
-            new_league = LeagueLevel.MASTER
-            new_badges.append("Golden Trophy")
-        elif new_streak == 250 and current_user.league == LeagueLevel.MASTER:
-            new_league = LeagueLevel.LEGENDARY
-            new_badges.append("Diamond Trophy")
-        elif new_streak == 500 and current_user.league == LeagueLevel.LEGENDARY:
-            new_league = LeagueLevel.DISCIPLINE_STAR
-            new_badges.append("Black Trophy")
-        
-        # Add streak badges
-        if new_streak == 3 and "Beginner" not in new_badges:
-            new_badges.append("Beginner")
-        elif new_streak == 7 and "Disciplined" not in new_badges:
-            new_badges.append("Disciplined")
-        elif new_streak == 30 and "Master" not in new_badges:
-            new_badges.append("Master")
-        
-        # Update user
-        await db.users.update_one(
-            {"id": current_user.id},
-            {
-                "$set": {
-                    "total_points": updated_points,
-                    "current_streak": new_streak,
-                    "best_streak": new_best_streak,
-                    "league": new_league.value,
-                    "badges": new_badges,
-                    "last_task_completion": current_date
-                }
-            }
-        )
-    else:
-        # Just update points
-        await db.users.update_one(
-            {"id": current_user.id},
-            {
-                "$set": {
-                    "total_points": updated_points,
-                    "last_task_completion": current_date
-                }
-            }
-        )
-    
-    # Save daily progress
-    await db.daily_progress.update_one(
-        {"user_id": current_user.id, "date": today_str},
-        {"$set": daily_progress},
-        upsert=True
+    # Points, streak, league and badges in one atomic update, alongside today's progress and rollups
+    updated_user, _ = await asyncio.gather(
+        storage.apply_task_completion(current_user.id, category, points_earned, today_str, current_date),
+        storage.add_daily_completion(current_user.id, today_str, category, points_earned)
     )
+    auth_cache.invalidate(current_user.id)
+    previous_rank = leaderboard.rank(current_user.username)
+    leaderboard.upsert(updated_user)
+    await event_bus.publish(current_user.id, completion_events(
+        task_id, task, month_key, category, points_earned, current_user, updated_user,
+        previous_rank, leaderboard.rank(current_user.username)
+    ))
     
     return {
         "message": "Task completed successfully",
         "points_earned": points_earned,
-        "category": task_obj.category.value,
-        "streak_day": all_categories_completed,
-        "current_streak": new_streak if all_categories_completed else current_user.current_streak
+        "category": category.value,
+        "streak_day": len(updated_user["progress_categories"]) == len(TaskCategory),
+        "current_streak": updated_user["current_streak"]
     }
 
 @api_router.delete("/tasks/{task_id}")
-async def delete_task(task_id: str, current_user: User = Depends(get_current_user)):
-    result = await db.tasks.delete_one({"id": task_id, "user_id": current_user.id})
-    if result.deleted_count == 0:
+async def delete_task(
+    task_id: str,
+    current_user: User = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
+):
+    if not await storage.delete_task(task_id, current_user.id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found"
@@ -543,112 +3287,236 @@ async def delete_task(task_id: str, current_user: User = Depends(get_current_use
 # Stats and Progress Routes
 @api_router.get("/stats/radar")
 async def get_radar_stats(current_user: User = Depends(get_current_user)):
-    await check_and_apply_point_deductions(current_user)
-    updated_user = await db.users.find_one({"id": current_user.id})
-    
-    return {
-        "categories": [
-            {"category": "Intelligence", "points": updated_user["total_points"]["Intelligence"]},
-            {"category": "Physical", "points": updated_user["total_points"]["Physical"]},
-            {"category": "Social", "points": updated_user["total_points"]["Social"]},
-            {"category": "Discipline", "points": updated_user["total_points"]["Discipline"]},
-            {"category": "Determination", "points": updated_user["total_points"]["Determination"]}
-        ],
-        "overall_score": calculate_overall_score(updated_user["total_points"])
+    return build_radar_stats(current_user.total_points)
+
+@api_router.get("/stats/history", response_model=List[HistoryPeriod])
+async def get_progress_history(
+    granularity: HistoryGranularity = HistoryGranularity.WEEK,
+    periods: Optional[int] = Query(None, ge=1, le=HISTORY_MAX_PERIODS),
+    current_user: User = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
+):
+    """The last ``periods`` weeks or months (a year by default), oldest first, one rollup read per period"""
+    today = datetime.now(timezone.utc).date()
+    starts = [rollup_start(granularity, today)]
+    for _ in range((periods or HISTORY_DEFAULT_PERIODS[granularity.value]) - 1):
+        starts.append(previous_rollup_start(granularity, starts[-1]))
+    starts.reverse()
+    rollups = {
+        rollup["start"]: rollup
+        for rollup in await storage.progress_rollups(current_user.id, granularity.value, starts[0].isoformat())
     }
+    return ORJSONResponse([
+        history_period(granularity, start, rollups.get(start.isoformat()), today) for start in starts
+    ])
 
-@api_router.get("/leaderboard", response_model=List[LeaderboardEntry])
-async def get_leaderboard(language: Optional[Language] = None, current_user: User = Depends(get_current_user)):
-    query = {}
-    if language:
-        query["language"] = language.value
-    
-    users = await db.users.find(query).to_list(1000)
-    
-    leaderboard = []
-    for user in users:
-        overall_score = calculate_overall_score(user["total_points"])
-        leaderboard.append({
-            "username": user["username"],
-            "overall_score": overall_score,
-            "league": user["league"],
-            "current_streak": user["current_streak"],
-            "rank": 0  # Will be set after sorting
-        })
+DASHBOARD_SECTIONS = ("user", "tasks", "radar", "today")
+
+@api_router.get("/dashboard", response_model=DashboardResponse, response_model_exclude_unset=True)
+async def get_dashboard(
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
+):
+    """Everything the dashboard renders in one request; ``fields`` selects sections (comma-separated)"""
+    sections = set(DASHBOARD_SECTIONS)
+    if fields:
+        sections = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = sections - set(DASHBOARD_SECTIONS)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown dashboard fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(DASHBOARD_SECTIONS)}"
+            )
     
-    # Sort by overall score descending
-    leaderboard.sort(key=lambda x: x["overall_score"], reverse=True)
+    async def no_result():
+        return None
     
-    # Add ranks (show only top 100)
-    for i, entry in enumerate(leaderboard[:100]):
-        entry["rank"] = i + 1
+    today_str = datetime.now(timezone.utc).date().isoformat()
+    tasks, today = await asyncio.gather(
+        storage.task_page(current_user.id, None, PAGE_SIZE) if "tasks" in sections else no_result(),
+        storage.get_daily_progress(current_user.id, today_str) if "today" in sections else no_result()
+    )
     
-    return leaderboard[:100]
+    response = {}
+    if "user" in sections:
+        response["user"] = encode_document(User, dict(current_user))
+    if "tasks" in sections:
+        response["tasks"] = encode_documents(Task, tasks[0], TASK_FIELDS)
+    if "radar" in sections:
+        response["radar"] = build_radar_stats(current_user.total_points)
+    if "today" in sections:
+        response["today"] = encode_document(DailyProgress, today, DAILY_PROGRESS_FIELDS) if today else None
+    return ORJSONResponse(response)
 
-# Quote Management Routes
-@api_router.get("/quotes/favorites", response_model=List[QuoteFavorite])
-async def get_favorite_quotes(current_user: User = Depends(get_current_user)):
-    favorites = await db.quote_favorites.find({"user_id": current_user.id}).to_list(100)
-    return [QuoteFavorite(**fav) for fav in favorites]
+def leaderboard_cursor(entry: dict) -> str:
+    # The rank rides along so Mongo-served pages can keep counting without a count query
+    return encode_cursor(entry["overall_score"], entry["username"], entry["rank"])
 
-@api_router.post("/quotes/favorites", response_model=QuoteFavorite)
-async def save_favorite_quote(
-    quote: str, 
-    author: str, 
-    current_user: User = Depends(get_current_user)
+async def stream_leaderboard(language: Optional[str], after: Optional[tuple], limit: Optional[int]):
+    """Walk the in-memory leaderboard one keyset batch at a time, yielding to the loop in between"""
+    served = 0
+    while limit is None or served < limit:
+        size = STREAM_BATCH_SIZE if limit is None else min(STREAM_BATCH_SIZE, limit - served)
+        batch = leaderboard.top(language, size, after)
+        for entry in batch:
+            yield entry
+        if len(batch) < size:
+            return
+        served += len(batch)
+        after = (-batch[-1]["overall_score"], batch[-1]["username"])
+        await asyncio.sleep(0)
+
+async def stream_leaderboard_documents(storage: Storage, language: Optional[str], after: Optional[tuple], rank: int,
+                                       limit: Optional[int]):
+    async for user in storage.stream_leaderboard(language, after, limit):
+        rank += 1
+        yield leaderboard_entry(user, rank)
+
+@api_router.get("/leaderboard", response_model=List[LeaderboardEntry])
+async def get_leaderboard(
+    language: Optional[Language] = None,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_SIZE),
+    stream: bool = False,
+    current_user: User = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
 ):
-    favorite = QuoteFavorite(
-        user_id=current_user.id,
-        quote=quote,
-        author=author
+    """Ranked users; page with the X-Next-Cursor header, or ``stream`` the rest as NDJSON"""
+    language_value = language.value if language else None
+    after_score, after_username, after_rank = (
+        decode_cursor(after, float, str, int) if after else (None, None, 0)
     )
+    after_key = (after_score, after_username) if after else None
+    size = limit or LEADERBOARD_SIZE
     
-    await db.quote_favorites.insert_one(favorite.dict())
-    return favorite
-
-@api_router.delete("/quotes/favorites/{quote_id}")
-async def remove_favorite_quote(quote_id: str, current_user: User = Depends(get_current_user)):
-    result = await db.quote_favorites.delete_one({
-        "id": quote_id, 
-        "user_id": current_user.id
-    })
+    if stream:
+        if leaderboard.ready:
+            memory_key = (-after_score, after_username) if after else None
+            return ndjson_response(stream_leaderboard(language_value, memory_key, limit))
+        return ndjson_response(stream_leaderboard_documents(storage, language_value, after_key, after_rank, limit))
+    
+    async def load_page():
+        if leaderboard.ready:
+            memory_key = (-after_score, after_username) if after else None
+            entries = leaderboard.top(language_value, size + 1, memory_key)
+            page, has_more = entries[:size], len(entries) > size
+        else:
+            users, has_more = await storage.leaderboard_page(language_value, after_key, size)
+            page = [leaderboard_entry(user, after_rank + i) for i, user in enumerate(users, start=1)]
+        return orjson.dumps(page), leaderboard_cursor(page[-1]) if has_more else None
     
-    if result.deleted_count == 0:
+    # Identical concurrent reads share one load and its encoded body
+    body, next_cursor = await read_cache.get(("leaderboard", language_value, after, size), load_page)
+    return page_response(body, next_cursor)
+
+@api_router.get("/leaderboard/me", response_model=LeaderboardPosition)
+async def get_my_leaderboard_position(
+    language: Optional[Language] = None,
+    neighbours: int = Query(1, ge=1, le=10),
+    current_user: User = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
+):
+    if language and current_user.language != language:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Favorite quote not found"
+            detail="You are not ranked in this language leaderboard"
         )
-    return {"message": "Favorite quote removed"}
+    
+    position = None
+    if leaderboard.ready:
+        position = leaderboard.position(current_user.username, language.value if language else None, neighbours)
+    if position is None:
+        position = await storage.leaderboard_position(current_user, language.value if language else None, neighbours)
+    
+    position["percentile"] = round((position["total"] - position["rank"]) / position["total"] * 100, 2)
+    return ORJSONResponse(position)
 
 # Quote Management Routes
+def encode_favorite(doc: dict) -> dict:
+    """encode_document for a favorite; ones saved before content hashes get theirs computed"""
+    if "hash" not in doc:
+        doc = {**doc, "hash": quote_hash(doc["quote"], doc["author"])}
+    return encode_document(QuoteFavorite, doc, QUOTE_FAVORITE_FIELDS)
+
+@api_router.get("/quotes/daily", response_model=DailyQuotes)
+async def get_daily_quotes(
+    language: Language = Language.ENGLISH,
+    count: int = Query(QUOTES_DAILY_COUNT, ge=1, le=20),
+    offset: int = Query(0, ge=0, le=100),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Today's quotes for a language (the same for everyone); ``offset`` pages to further sets"""
+    now = datetime.now(timezone.utc)
+    body, etag = quote_catalog.daily(now.date().isoformat(), language.value, count, offset)
+    # Cache until the day's selection changes, but revalidate at least hourly; an empty
+    # catalog (before the first refresh) must not be cached at all
+    seconds_left = int((datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc) - now).total_seconds())
+    cache_control = f"public, max-age={min(seconds_left, QUOTES_MAX_AGE_SECONDS)}" if len(quote_catalog) else "no-store"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
 @api_router.get("/quotes/favorites", response_model=List[QuoteFavorite])
-async def get_favorite_quotes(current_user: User = Depends(get_current_user)):
-    favorites = await db.quote_favorites.find({"user_id": current_user.id}).to_list(100)
-    return [QuoteFavorite(**fav) for fav in favorites]
+async def get_favorite_quotes(
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_SIZE),
+    stream: bool = False,
+    current_user: User = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
+):
+    """Favorites newest first; page with the X-Next-Cursor header, or ``stream`` them as NDJSON"""
+    after_key = decode_cursor(after, datetime.fromisoformat, str) if after else None
+    if stream:
+        return ndjson_response(encode_each(
+            storage.stream_favorites(current_user.id, after_key, limit), encode_favorite
+        ))
+    
+    favorites, has_more = await storage.favorite_page(current_user.id, after_key, limit or PAGE_SIZE)
+    next_cursor = encode_cursor(favorites[-1]["saved_at"], favorites[-1]["id"]) if has_more else None
+    return page_response([encode_favorite(doc) for doc in favorites], next_cursor)
+
+@api_router.get("/quotes/favorites/status")
+async def get_favorite_status(
+    hashes: str,
+    current_user: User = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
+):
+    """Which of the comma-separated quote hashes the user has saved, in one indexed query"""
+    wanted = list(dict.fromkeys(h.strip() for h in hashes.split(",") if h.strip()))
+    if len(wanted) > FAVORITE_STATUS_MAX_HASHES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {FAVORITE_STATUS_MAX_HASHES} hashes per request"
+        )
+    saved_hashes = await storage.saved_favorite_hashes(current_user.id, wanted)
+    return ORJSONResponse({content_hash: content_hash in saved_hashes for content_hash in wanted})
 
 @api_router.post("/quotes/favorites", response_model=QuoteFavorite)
 async def save_favorite_quote(
     quote: str, 
     author: str, 
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
 ):
+    """Idempotent: saving a quote that is already a favorite returns the existing one"""
     favorite = QuoteFavorite(
         user_id=current_user.id,
         quote=quote,
-        author=author
+        author=author,
+        hash=quote_hash(quote, author)
     )
-    
-    await db.quote_favorites.insert_one(favorite.dict())
-    return favorite
+    saved = await storage.save_favorite(favorite.dict())
+    return ORJSONResponse(encode_favorite(saved))
 
 @api_router.delete("/quotes/favorites/{quote_id}")
-async def remove_favorite_quote(quote_id: str, current_user: User = Depends(get_current_user)):
-    result = await db.quote_favorites.delete_one({
-        "id": quote_id, 
-        "user_id": current_user.id
-    })
-    
-    if result.deleted_count == 0:
+async def remove_favorite_quote(
+    quote_id: str,
+    current_user: User = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
+):
+    if not await storage.delete_favorite(current_user.id, favorite_id=quote_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Favorite quote not found"
@@ -657,33 +3525,102 @@ async def remove_favorite_quote(quote_id: str, current_user: User = Depends(get_
 
 @api_router.delete("/quotes/favorites")
 async def remove_favorite_by_content(
-    quote: str,
-    author: str,
-    current_user: User = Depends(get_current_user)
+    quote: Optional[str] = None,
+    author: Optional[str] = None,
+    content_hash: Optional[str] = Query(None, alias="hash"),
+    current_user: User = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
 ):
-    result = await db.quote_favorites.delete_one({
-        "user_id": current_user.id,
-        "quote": quote,
-        "author": author
-    })
+    """Remove a favorite by its content hash, or by the quote and author it hashes from"""
+    if content_hash is None:
+        if quote is None or author is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Pass either hash or both quote and author"
+            )
+        content_hash = quote_hash(quote, author)
     
-    if result.deleted_count == 0:
+    if not await storage.delete_favorite(current_user.id, content_hash=content_hash):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Favorite quote not found"
         )
     return {"message": "Favorite quote removed"}
 
-# Include the router in the main app
-app.include_router(api_router)
+# Event Stream Routes
+def stream_ticket_hash(ticket: str) -> str:
+    return hashlib.sha256(ticket.encode()).hexdigest()
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@api_router.post("/events/ticket", response_model=StreamTicket)
+async def create_stream_ticket(
+    current_user: User = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
+):
+    """A single-use ticket for GET /api/events, so EventSource (which can't send headers)
+    never puts the access token in a URL"""
+    ticket = secrets.token_urlsafe(32)
+    await storage.insert_stream_ticket({
+        "hash": stream_ticket_hash(ticket),
+        "user_id": current_user.id,
+        "expires_at": datetime.now(timezone.utc) + timedelta(seconds=EVENT_TICKET_SECONDS)
+    })
+    return {"ticket": ticket, "expires_in": EVENT_TICKET_SECONDS}
+
+@api_router.get("/events")
+async def stream_events(
+    ticket: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    storage: Storage = Depends(get_storage)
+):
+    """Server-Sent Events of the user's deltas, for a bearer token or a ticket from POST /api/events/ticket"""
+    if credentials is not None:
+        current_user = await authenticate_token(storage, credentials.credentials)
+    else:
+        user_id = await storage.redeem_stream_ticket(stream_ticket_hash(ticket)) if ticket else None
+        if user_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Not authenticated"
+            )
+        current_user = await load_current_user(storage, user_id)
+    queue = event_bus.subscribe(current_user.id)
+    
+    async def events():
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield b"event: " + event["type"].encode() + b"\ndata: " + orjson.dumps(event) + b"\n\n"
+        finally:
+            event_bus.unsubscribe(current_user.id, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Admin Routes
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # Without ADMIN_TOKEN configured the admin routes don't exist
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+@api_router.get("/admin/slow-queries", dependencies=[Depends(require_admin)])
+async def get_slow_queries():
+    """Recent slow Mongo commands and every slow query shape with its explain summary"""
+    if not slow_query_recorder.enabled:
+        return {"enabled": False, "threshold_ms": 0, "recent": [], "shapes": []}
+    return {"enabled": True, **slow_query_recorder.report()}
+
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 # Configure logging
 logging.basicConfig(
@@ -692,6 +3629,626 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+# Indexes every route relies on, keyed by collection
+INDEXES = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel(
+            [("overall_score", DESCENDING), ("username", ASCENDING)],
+            name="overall_score_desc_username"
+        ),
+        IndexModel(
+            [("language", ASCENDING), ("overall_score", DESCENDING), ("username", ASCENDING)],
+            name="language_overall_score_desc_username"
+        ),
+    ],
+    "tasks": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("category", ASCENDING)], name="user_id_category"),
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)],
+            name="user_id_created_at_id"
+        ),
+    ],
+    "daily_progress": [
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], name="user_id_date_unique", unique=True),
+        IndexModel([("date", ASCENDING), ("user_id", ASCENDING)], name="date_user_id"),
+    ],
+    "progress_archives": [
+        IndexModel([("user_id", ASCENDING), ("month", ASCENDING)], name="user_id_month_unique", unique=True),
+    ],
+    "progress_rollups": [
+        IndexModel(
+            [("user_id", ASCENDING), ("granularity", ASCENDING), ("start", ASCENDING)],
+            name="user_id_granularity_start_unique", unique=True
+        ),
+    ],
+    "quote_catalog": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "quote_favorites": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("hash", ASCENDING)], name="user_id_hash_unique", unique=True),
+        IndexModel(
+            [("user_id", ASCENDING), ("saved_at", DESCENDING), ("id", DESCENDING)],
+            name="user_id_saved_at_desc_id"
+        ),
+    ],
+    "stream_tickets": [
+        IndexModel([("hash", ASCENDING)], name="hash_unique", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+INDEX_NOT_FOUND = 27  # Mongo's error code for dropping an index that doesn't exist
+
+# Indexes INDEXES no longer has and nothing queries, dropped once their replacements exist:
+# label -> replacing index
+RETIRED_INDEXES = {
+    "users.overall_score_desc": "users.overall_score_desc_username",
+    "users.language_overall_score_desc": "users.language_overall_score_desc_username",
+    "quote_favorites.user_id_quote_author": "quote_favorites.user_id_hash_unique",
+}
+
+# Unique indexes older documents would break until a migration has run over them:
+# label -> (filter matching unmigrated documents, maintenance command that migrates them)
+MIGRATION_GATED_INDEXES = {
+    "quote_favorites.user_id_hash_unique": ({"hash": {"$exists": False}}, "migrate-favorite-hashes"),
+}
+
+# Representative query shape of every route: (route, collection, filter, sort)
+ROUTE_QUERIES = [
+    ("get_current_user", "users", {"id": "x"}, None),
+    ("register/login", "users", {"$or": [{"username": "x"}, {"email": "x"}]}, None),
+    ("get_leaderboard", "users", {}, [("overall_score", DESCENDING), ("username", ASCENDING)]),
+    ("get_leaderboard?language", "users", {"language": "en"}, [("overall_score", DESCENDING), ("username", ASCENDING)]),
+    ("get_leaderboard?after", "users", {"$or": [
+        {"overall_score": {"$lt": 1.0}}, {"overall_score": 1.0, "username": {"$gt": "x"}}
+    ]}, [("overall_score", DESCENDING), ("username", ASCENDING)]),
+    ("get_my_leaderboard_position", "users", {"language": "en", "$or": [
+        {"overall_score": {"$gt": 1.0}}, {"overall_score": 1.0, "username": {"$lt": "x"}}
+    ]}, None),
+    ("get_tasks", "tasks", {"user_id": "x"}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    ("create_task", "tasks", {"user_id": "x", "category": "Social"}, None),
+    ("update/complete/delete_task", "tasks", {"id": "x", "user_id": "x"}, None),
+    ("complete_task daily_progress", "daily_progress", {"user_id": "x", "date": "2024-01-01"}, None),
+    ("get_progress_history", "progress_rollups", {"user_id": "x", "granularity": "week", "start": {"$gte": "2024-01-01"}},
+     [("start", ASCENDING)]),
+    ("progress compaction job", "daily_progress", {"date": {"$gte": "2024-01-01", "$lt": "2024-02-01"}}, None),
+    ("point deduction job", "daily_progress", {"date": {"$gte": "2024-01-01", "$lt": "2024-01-08"}, "streak_day": True}, None),
+    ("get_favorite_quotes", "quote_favorites", {"user_id": "x"}, [("saved_at", DESCENDING), ("id", DESCENDING)]),
+    ("remove_favorite_quote", "quote_favorites", {"id": "x", "user_id": "x"}, None),
+    ("save/remove_favorite_by_content", "quote_favorites", {"user_id": "x", "hash": "x"}, None),
+    ("get_favorite_status", "quote_favorites", {"user_id": "x", "hash": {"$in": ["x", "y"]}}, None),
+    ("stream_events?ticket", "stream_tickets", {"hash": "x", "expires_at": {"$gt": datetime(2024, 1, 1)}}, None),
+]
+
+def _index_signature(keys, unique) -> tuple:
+    return tuple((field, int(direction)) for field, direction in keys), bool(unique)
+
+async def ensure_indexes(database=None) -> Dict[str, List[str]]:
+    """Idempotently create INDEXES and report indexes that were missing or conflict.
+
+    An existing index with the same name but different keys or options is left
+    alone and reported; the same goes for unique indexes that cannot be built
+    because of duplicate data. MIGRATION_GATED_INDEXES wait, reported as
+    pending, until their migration has run. RETIRED_INDEXES are dropped once
+    the index replacing them is in place.
+    """
+    report = {"created": [], "conflicting": [], "pending": [], "dropped": []}
+    for collection_name, models in INDEXES.items():
+        collection = (db if database is None else database)[collection_name]
+        existing = await collection.index_information()
+        for model in models:
+            wanted = model.document
+            label = f"{collection_name}.{wanted['name']}"
+            current = existing.get(wanted["name"])
+            if current is not None:
+                current_signature = _index_signature(current["key"], current.get("unique"))
+                if current_signature != _index_signature(wanted["key"].items(), wanted.get("unique")):
+                    report["conflicting"].append(label)
+                continue
+            gate = MIGRATION_GATED_INDEXES.get(label)
+            if gate and await collection.find_one(gate[0], {"_id": 1}) is not None:
+                report["pending"].append(label)
+                continue
+            try:
+                await collection.create_indexes([model])
+                report["created"].append(label)
+            except OperationFailure as e:
+                logger.error(f"Could not create index {label}: {e}")
+                report["conflicting"].append(label)
+        for name in existing:
+            label = f"{collection_name}.{name}"
+            replacement = RETIRED_INDEXES.get(label)
+            if replacement and replacement not in report["conflicting"] + report["pending"]:
+                try:
+                    await collection.drop_index(name)
+                except OperationFailure as e:
+                    if e.code != INDEX_NOT_FOUND:
+                        logger.error(f"Could not drop retired index {label}: {e}")
+                    continue  # Not found: a worker starting alongside this one dropped it first
+                report["dropped"].append(label)
+    if report["created"]:
+        logger.info(f"Created missing indexes: {', '.join(report['created'])}")
+    if report["dropped"]:
+        logger.info(f"Dropped retired indexes: {', '.join(report['dropped'])}")
+    if report["conflicting"]:
+        logger.warning(f"Conflicting indexes left untouched: {', '.join(report['conflicting'])}")
+    for label in report["pending"]:
+        logger.warning(f"Not creating {label} until `{MIGRATION_GATED_INDEXES[label][1]}` has run")
+    return report
+
+def _plan_stages(plan: dict):
+    yield plan.get("stage")
+    if "inputStage" in plan:
+        yield from _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+async def check_route_indexes() -> List[str]:
+    """Explain every ROUTE_QUERIES shape and return the routes that fall back to COLLSCAN"""
+    unindexed = []
+    for route, collection_name, query, sort in ROUTE_QUERIES:
+        find = {"find": collection_name, "filter": query}
+        if sort:
+            find["sort"] = dict(sort)
+        explain = await db.command({"explain": find, "verbosity": "queryPlanner"})
+        winning_plan = explain["queryPlanner"]["winningPlan"]
+        winning_plan = winning_plan.get("queryPlan", winning_plan)  # Slot-based engine output
+        stages = set(_plan_stages(winning_plan))
+        if "COLLSCAN" in stages:
+            unindexed.append(route)
+            logger.error(f"{route}: COLLSCAN on {collection_name} for {query}")
+        else:
+            logger.info(f"{route}: {', '.join(sorted(s for s in stages if s))}")
+    return unindexed
+
+async def backfill_overall_scores(batch_size: int = 1000) -> int:
+    """One-time migration: materialize overall_score for users created before it existed"""
+    updated = 0
+    batch = []
+    cursor = db.users.find({}, {"_id": 0, "id": 1, "total_points": 1, "overall_score": 1})
+    async for user in cursor:
+        score = calculate_overall_score(user.get("total_points", {}))
+        if user.get("overall_score") == score:
+            continue
+        batch.append(UpdateOne({"id": user["id"]}, {"$set": {"overall_score": score}}))
+        if len(batch) >= batch_size:
+            result = await db.users.bulk_write(batch, ordered=False)
+            updated += result.modified_count
+            batch = []
+    if batch:
+        result = await db.users.bulk_write(batch, ordered=False)
+        updated += result.modified_count
+    return updated
+
+async def backfill_progress_rollups(batch_size: int = 1000) -> int:
+    """One-time migration: build progress_rollups from the daily_progress history,
+    including the months compaction has moved into progress_archives.
+
+    Each user's rollups are rebuilt whole and replace what is stored, so run it
+    before deploying the complete_task that keeps them, or while completions
+    are paused. Returns the rollups written.
+    """
+    await storage.flush()
+    written = 0
+    batch = []
+    user_id, rollups, archived_months = None, {}, set()
+
+    async def write(final=False):
+        nonlocal written, batch
+        batch.extend(
+            ReplaceOne({"user_id": user_id, "granularity": granularity, "start": start}, rollup, upsert=True)
+            for (granularity, start), rollup in rollups.items()
+        )
+        if batch and (final or len(batch) >= batch_size):
+            await db.progress_rollups.bulk_write(batch, ordered=False)
+            written += len(batch)
+            batch = []
+
+    async def history():
+        """(user_id, day, progress, archived) for every recorded day, by user, a user's archives first"""
+        archives = db.progress_archives.find({}, {"_id": 0}).sort([("user_id", ASCENDING), ("month", ASCENDING)])
+        dailies = db.daily_progress.find(
+            {}, fields_projection("user_id", "date", "completed_categories", "points_earned", "streak_day")
+        ).sort([("user_id", ASCENDING), ("date", ASCENDING)])
+        archive, progress = await anext(archives, None), await anext(dailies, None)
+        while archive or progress:
+            if archive and (progress is None or archive["user_id"] <= progress["user_id"]):
+                for day, archived in archived_days(archive).items():
+                    yield archive["user_id"], day, archived, True
+                archive = await anext(archives, None)
+            else:
+                yield progress["user_id"], progress["date"], progress, False
+                progress = await anext(dailies, None)
+
+    async for progress_user_id, day, progress, archived in history():
+        if progress_user_id != user_id:
+            await write()
+            user_id, rollups, archived_months = progress_user_id, {}, set()
+        if archived:
+            archived_months.add(day[:7])
+        elif day[:7] in archived_months:
+            # Compaction stopped between archiving this month and deleting its dailies
+            continue
+        increments = {
+            **{f"points_earned.{category}": points for category, points in progress.get("points_earned", {}).items()},
+            "category_days": len(set(progress.get("completed_categories", []))),
+            "streak_days": int(bool(progress.get("streak_day"))),
+        }
+        for granularity, start in rollup_keys(date.fromisoformat(day)):
+            rollup = rollups.setdefault((granularity, start), {
+                "user_id": user_id, "granularity": granularity, "start": start, "category_days": 0, "streak_days": 0
+            })
+            apply_increments(rollup, increments)
+            rollup.setdefault("day_categories", {})[day] = sorted(set(progress.get("completed_categories", [])))
+    await write(final=True)
+    return written
+
+# Offline recompute of streaks, leagues and streak badges from the completion history
+RECOMPUTED_FIELDS = ("current_streak", "best_streak", "league", "badges")
+CATEGORY_INDEX = {c.value: i for i, c in enumerate(TaskCategory)}
+PROMOTION_STREAKS = np.array([streak for streak, _, _, _ in LEAGUE_PROMOTIONS])
+# Every badge a streak awards, in the order a growing best streak earns them
+STREAK_AWARDS = sorted([(streak, trophy) for streak, _, _, trophy in LEAGUE_PROMOTIONS] + STREAK_BADGES)
+AWARD_STREAKS = np.array([streak for streak, _ in STREAK_AWARDS])
+
+def build_completion_matrix(user_ids: List[str], dailies: List[dict], archives: List[dict], as_of: date) -> np.ndarray:
+    """(users, days, categories) booleans of what each user completed, from their first
+    recorded day (across all of ``user_ids``) through ``as_of``"""
+    row = {user_id: index for index, user_id in enumerate(user_ids)}
+    # One (user, day, category bitmask) per daily; dates and category lists repeat, so they are parsed once each
+    ordinals, masks = {}, {}
+    users, days, day_masks = [], [], []
+    for progress in dailies:
+        day, completed = progress["date"], tuple(progress.get("completed_categories", ()))
+        if day not in ordinals:
+            ordinals[day] = date.fromisoformat(day).toordinal()
+        if completed not in masks:
+            masks[completed] = sum({1 << CATEGORY_INDEX[category] for category in completed})
+        users.append(row[progress["user_id"]])
+        days.append(ordinals[day])
+        day_masks.append(masks[completed])
+    daily_index, categories = np.nonzero((np.array(day_masks, np.int64)[:, None] >> np.arange(len(TaskCategory))) & 1)
+    users, days = np.array(users, np.int64)[daily_index], np.array(days, np.int64)[daily_index]
+    if archives:
+        # Each archive's category bitsets expanded to (archive, category, day of month) triples
+        bits = np.array([[archive["category_days"].get(c.value, 0) for c in TaskCategory] for archive in archives],
+                        np.int64)
+        archive_index, archive_categories, day_of_month = np.nonzero((bits[:, :, None] >> np.arange(31)) & 1)
+        month_ordinals = np.array([date.fromisoformat(f"{archive['month']}-01").toordinal() for archive in archives])
+        archive_users = np.array([row[archive["user_id"]] for archive in archives])
+        users = np.concatenate([users, archive_users[archive_index]])
+        days = np.concatenate([days, month_ordinals[archive_index] + day_of_month])
+        categories = np.concatenate([categories, archive_categories])
+    end = as_of.toordinal()
+    start = min(int(days.min()), end) if len(days) else end
+    completed = np.zeros((len(user_ids), end - start + 1, len(TaskCategory)), bool)
+    within = days <= end
+    completed[users[within], days[within] - start, categories[within]] = True
+    return completed
+
+def recompute_streaks(completed: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Current and best streak of every user of a completion matrix whose last day is today.
+
+    The rules complete_task and the deduction job apply a day at a time: a day
+    with every category completed extends the streak, and DEDUCTION_MISSED_DAYS
+    days in a row without one reset it.
+    """
+    full = completed.all(axis=2)
+    day_index = np.arange(full.shape[1])
+    never = -DEDUCTION_MISSED_DAYS - 1  # A full day "before" the matrix that any real one is too far from
+    last_full = np.maximum.accumulate(np.where(full, day_index, never), axis=1)
+    previous_full = np.concatenate([np.full((full.shape[0], 1), never), last_full[:, :-1]], axis=1)
+    full_days = full.cumsum(axis=1)
+    # Full days before the run each day belongs to; a streak starts on a full day too far from the last one
+    run_starts = full & (day_index - previous_full > DEDUCTION_MISSED_DAYS)
+    before_run = np.maximum.accumulate(np.where(run_starts, full_days - 1, 0), axis=1)
+    streaks = full_days - before_run
+    current = np.where(day_index[-1] - last_full[:, -1] > DEDUCTION_MISSED_DAYS, 0, streaks[:, -1])
+    return current, streaks.max(axis=1)
+
+def progress_corrections(users: List[dict], completed: np.ndarray) -> List[Tuple[dict, UpdateOne]]:
+    """(diff, update) for each user whose RECOMPUTED_FIELDS differ from ``completed``.
+
+    Promotions step up a league at a time when the streak reaches the next
+    threshold and nothing demotes, so a user's league (and every trophy and
+    streak badge) follows from the best streak alone. Badges no streak awards
+    are kept. Updates only match users still as they were read, so a
+    completion landing meanwhile is never overwritten.
+    """
+    current, best = recompute_streaks(completed)
+    leagues = np.searchsorted(PROMOTION_STREAKS, best, side="right")
+    awards = np.searchsorted(AWARD_STREAKS, best, side="right")
+    league_ranks = {league.value: rank for rank, league in enumerate(LEAGUE_ORDER)}
+    stored_awards = np.array([
+        sum(1 << index for index, (_, badge) in enumerate(STREAK_AWARDS) if badge in user.get("badges", []))
+        for user in users
+    ], np.int64)
+    differs = {
+        "current_streak": np.array([user.get("current_streak", 0) for user in users]) != current,
+        "best_streak": np.array([user.get("best_streak", 0) for user in users]) != best,
+        "league": np.array([league_ranks.get(user.get("league"), -1) for user in users]) != leagues,
+        "badges": stored_awards != (1 << awards) - 1,
+    }
+    award_badges = {badge for _, badge in STREAK_AWARDS}
+    corrections = []
+    for index in np.flatnonzero(np.logical_or.reduce(list(differs.values()))):
+        user = users[index]
+        recomputed = {
+            "current_streak": int(current[index]),
+            "best_streak": int(best[index]),
+            "league": LEAGUE_ORDER[leagues[index]].value,
+            "badges": [badge for _, badge in STREAK_AWARDS[:awards[index]]]
+            + [badge for badge in user.get("badges", []) if badge not in award_badges],
+        }
+        changed = [field for field in RECOMPUTED_FIELDS if differs[field][index]]
+        corrections.append((
+            {"user_id": user["id"], **{field: [user.get(field), recomputed[field]] for field in changed}},
+            UpdateOne(
+                {"id": user["id"], **{field: user.get(field) for field in RECOMPUTED_FIELDS}},
+                {"$set": {field: recomputed[field] for field in changed}}
+            )
+        ))
+    return corrections
+
+async def recompute_user_progress(as_of: Optional[date] = None, dry_run: bool = False,
+                                  chunk_size: int = RECOMPUTE_CHUNK_SIZE,
+                                  on_diff: Optional[Callable[[dict], None]] = None) -> dict:
+    """Recompute every user's streaks, league and streak badges from daily_progress and
+    progress_archives, and write the users that differ.
+
+    Users are read ``chunk_size`` at a time; a chunk's history is loaded while
+    the previous one is written. ``on_diff`` gets every difference found, and
+    ``dry_run`` stops there. Returns the users read, corrected and skipped
+    because a completion changed them meanwhile (a re-run picks those up), and
+    how many differed in each field. Running servers pick the corrections up
+    as their leaderboard reconciles.
+    """
+    await storage.flush()
+    as_of = as_of or datetime.now(timezone.utc).date()
+    report = {"users": 0, "corrected": 0, "conflicts": 0, **{field: 0 for field in RECOMPUTED_FIELDS}}
+
+    async def recompute(users):
+        user_ids = [user["id"] for user in users]
+        dailies = await db.daily_progress.find(
+            {"user_id": {"$in": user_ids}, "date": {"$lte": as_of.isoformat()}},
+            fields_projection("user_id", "date", "completed_categories")
+        ).to_list(None)
+        archives = await db.progress_archives.find(
+            {"user_id": {"$in": user_ids}}, fields_projection("user_id", "month", "category_days")
+        ).to_list(None)
+        corrections = progress_corrections(users, build_completion_matrix(user_ids, dailies, archives, as_of))
+        report["users"] += len(users)
+        for diff, _ in corrections:
+            for field in RECOMPUTED_FIELDS:
+                report[field] += field in diff
+            if on_diff:
+                on_diff(diff)
+        if corrections and not dry_run:
+            result = await db.users.bulk_write([update for _, update in corrections], ordered=False)
+            report["corrected"] += result.matched_count
+            report["conflicts"] += len(corrections) - result.matched_count
+
+    chunk, in_flight = [], None
+    async for user in db.users.find({}, fields_projection("id", *RECOMPUTED_FIELDS)):
+        chunk.append(user)
+        if len(chunk) >= chunk_size:
+            if in_flight:
+                await in_flight
+            in_flight, chunk = asyncio.ensure_future(recompute(chunk)), []
+    if in_flight:
+        await in_flight
+    if chunk:
+        await recompute(chunk)
+    return report
+
+def _parse_completion_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    return datetime.fromisoformat(value).date()
+
+async def migrate_completion_dates(batch_size: int = 1000) -> int:
+    """One-time migration: fold legacy completion_dates arrays into completion_months bitmasks"""
+    migrated = 0
+    batch = []
+    cursor = db.tasks.find({"completion_dates": {"$exists": True}}, {"_id": 0, "id": 1, "completion_dates": 1})
+    async for task in cursor:
+        days = {_parse_completion_date(value) for value in task["completion_dates"]}
+        completion_months: Dict[str, int] = {}
+        for day in days:
+            month_key, day_bit = completion_month_bit(day)
+            completion_months[month_key] = completion_months.get(month_key, 0) | day_bit
+        batch.append(UpdateOne(
+            {"id": task["id"]},
+            {
+                "$set": {"completion_months": completion_months, "completion_count": len(days)},
+                "$unset": {"completion_dates": ""}
+            }
+        ))
+        if len(batch) >= batch_size:
+            result = await db.tasks.bulk_write(batch, ordered=False)
+            migrated += result.modified_count
+            batch = []
+    if batch:
+        result = await db.tasks.bulk_write(batch, ordered=False)
+        migrated += result.modified_count
+    return migrated
+
+async def migrate_favorite_hashes(batch_size: int = 1000) -> int:
+    """One-time migration: hash favorites saved before content hashes, dropping repeat saves.
+
+    ensure_indexes holds the unique (user_id, hash) index back until this has
+    run. The earliest save of each quote is kept.
+    """
+    migrated = 0
+    batch = []
+    user_id, kept = None, set()
+    cursor = db.quote_favorites.find(
+        {"hash": {"$exists": False}}, {"_id": 0, "id": 1, "user_id": 1, "quote": 1, "author": 1}
+    ).sort([("user_id", ASCENDING), ("saved_at", ASCENDING)])
+    async for favorite in cursor:
+        if favorite["user_id"] != user_id:
+            user_id = favorite["user_id"]
+            hashed = await db.quote_favorites.find(
+                {"user_id": user_id, "hash": {"$exists": True}}, FAVORITE_HASH_PROJECTION
+            ).to_list(None)
+            kept = {doc["hash"] for doc in hashed}
+        content_hash = quote_hash(favorite["quote"], favorite["author"])
+        if content_hash in kept:
+            batch.append(DeleteOne({"id": favorite["id"]}))
+        else:
+            kept.add(content_hash)
+            batch.append(UpdateOne({"id": favorite["id"]}, {"$set": {"hash": content_hash}}))
+        if len(batch) >= batch_size:
+            await db.quote_favorites.bulk_write(batch, ordered=True)
+            migrated += len(batch)
+            batch = []
+    if batch:
+        await db.quote_favorites.bulk_write(batch, ordered=True)
+        migrated += len(batch)
+    return migrated
+
+async def startup_db_client(app: FastAPI):
+    storage = app.state.storage
+    slow_query_recorder.start(asyncio.get_running_loop())
+    await storage.prepare()
+    await event_bus.start()
+    app.state.background_tasks = [
+        asyncio.create_task(run_leaderboard_reconciler(storage)),
+        asyncio.create_task(run_quote_catalog_refresher(storage))
+    ]
+    if DEDUCTION_SCHEDULER_ENABLED:
+        app.state.background_tasks.append(asyncio.create_task(
+            run_daily_job_scheduler(storage, run_daily_point_deductions, DEDUCTION_CHECK_INTERVAL_SECONDS)
+        ))
+    if PROGRESS_COMPACTION_ENABLED:
+        app.state.background_tasks.append(asyncio.create_task(
+            run_daily_job_scheduler(storage, run_daily_progress_compaction, PROGRESS_COMPACTION_CHECK_INTERVAL_SECONDS)
+        ))
+
+async def shutdown_db_client(app: FastAPI):
+    for task in getattr(app.state, "background_tasks", []):
+        task.cancel()
+    await event_bus.stop()
+    password_hasher.shutdown()
+    await app.state.storage.close()
+
+def create_app(storage_engine: Optional[Storage] = None) -> FastAPI:
+    """The API on ``storage_engine`` (the process's STORAGE_ENGINE storage by default).
+
+    Routes and background jobs get the storage from app.state; the
+    leaderboard, caches and event bus it feeds are still process-wide, so
+    build one serving app per process.
+    """
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.state.storage = storage_engine or storage
+    app.include_router(api_router)
+    app.add_api_route("/metrics", metrics, include_in_schema=False)
+    
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
+    )
+    app.add_middleware(PrometheusMiddleware)
+    
+    @app.on_event("startup")
+    async def startup():
+        await startup_db_client(app)
+    
+    @app.on_event("shutdown")
+    async def shutdown():
+        await shutdown_db_client(app)
+    
+    return app
+
+app = create_app()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintenance commands for the backend database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("backfill-overall-score", help="Materialize overall_score on existing users")
+    subparsers.add_parser("ensure-indexes", help="Create missing indexes and report conflicting ones")
+    subparsers.add_parser("check-indexes", help="Fail if any route query plan uses a COLLSCAN")
+    subparsers.add_parser("apply-deductions", help="Run today's point deduction job if no worker has yet")
+    subparsers.add_parser("migrate-completion-dates", help="Convert task completion_dates arrays to bitmasks")
+    subparsers.add_parser("migrate-favorite-hashes", help="Hash legacy favorites and drop duplicates, then index")
+    subparsers.add_parser("backfill-progress-rollups", help="Rebuild weekly and monthly rollups from daily_progress")
+    subparsers.add_parser("compact-daily-progress", help="Archive and delete daily_progress past the retention window")
+    recompute_parser = subparsers.add_parser(
+        "recompute-progress", help="Recompute streaks, leagues and streak badges from the completion history"
+    )
+    recompute_parser.add_argument("--dry-run", action="store_true", help="Print the differences as JSON lines only")
+    recompute_parser.add_argument("--as-of", type=date.fromisoformat,
+                                  help="Day to recompute as of, with --dry-run (default: today)")
+    recompute_parser.add_argument("--chunk-size", type=int, default=RECOMPUTE_CHUNK_SIZE)
+    args = parser.parse_args()
+    # Everything but the jobs reads and writes Mongo directly
+    if db is None and args.command not in ("apply-deductions", "compact-daily-progress"):
+        parser.error(f"{args.command} works on the mongo engine only (STORAGE_ENGINE={STORAGE_ENGINE})")
+    if args.command == "recompute-progress" and not args.dry_run:
+        if args.as_of:
+            parser.error("--as-of only goes with --dry-run; corrections are always made as of today")
+        if WRITE_BEHIND_ENABLED:
+            # Their buffered copies of users would flush over the corrections
+            parser.error("stop the write-behind workers and rerun with WRITE_BEHIND_ENABLED=false")
+
+    async def run_job(run: Callable[[Storage], Awaitable], already_ran: str):
+        # Through the configured engine, which the memory engine loads from and saves back to its snapshot
+        await storage.prepare()
+        try:
+            if await run(storage) is None:
+                logger.info(already_ran)
+        finally:
+            await storage.close()
+
+    async def run_command() -> int:
+        if args.command == "backfill-overall-score":
+            await ensure_indexes()
+            updated = await backfill_overall_scores()
+            logger.info(f"Backfilled overall_score on {updated} users")
+        elif args.command == "ensure-indexes":
+            report = await ensure_indexes()
+            return 1 if report["conflicting"] else 0
+        elif args.command == "check-indexes":
+            unindexed = await check_route_indexes()
+            return 1 if unindexed else 0
+        elif args.command == "apply-deductions":
+            await run_job(run_daily_point_deductions, "Point deductions already ran today")
+        elif args.command == "migrate-completion-dates":
+            migrated = await migrate_completion_dates()
+            logger.info(f"Migrated completion history of {migrated} tasks")
+        elif args.command == "migrate-favorite-hashes":
+            migrated = await migrate_favorite_hashes()
+            logger.info(f"Hashed or deduplicated {migrated} favorites")
+            report = await ensure_indexes()
+            return 1 if report["conflicting"] else 0
+        elif args.command == "backfill-progress-rollups":
+            await ensure_indexes()
+            written = await backfill_progress_rollups()
+            logger.info(f"Wrote {written} progress rollups")
+        elif args.command == "compact-daily-progress":
+            await run_job(run_daily_progress_compaction, "Progress compaction already ran today")
+        elif args.command == "recompute-progress":
+            on_diff = (lambda diff: sys.stdout.buffer.write(orjson.dumps(diff) + b"\n")) if args.dry_run else None
+            report = await recompute_user_progress(args.as_of, args.dry_run, args.chunk_size, on_diff)
+            logger.info(f"Recomputed {report['users']} users: {report['corrected']} corrected, "
+                        f"{report['conflicts']} changed meanwhile; differing " +
+                        ", ".join(f"{field} {report[field]}" for field in RECOMPUTED_FIELDS))
+        return 0
+
+    try:
+        exit_code = asyncio.run(run_command())
+    finally:
+        if client is not None:
+            client.close()
+    raise SystemExit(exit_code)
@@ -0,0 +1,703 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import bson
+import httpx
+import orjson
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of latencies (seconds)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def task_document_sizes(days):
+    """BSON size of a task completed every day for `days` days, legacy array vs bitmasks"""
+    started = datetime.now(timezone.utc) - timedelta(days=days)
+    completions = [started + timedelta(days=i) for i in range(days)]
+    base = {
+        "id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "category": "Physical",
+        "title": "Morning run",
+        "description": None,
+        "created_at": started,
+        "is_completed": True,
+        "completed_at": completions[-1],
+    }
+    completion_months = {}
+    for completion in completions:
+        month_key = completion.strftime("%Y-%m")
+        completion_months[month_key] = completion_months.get(month_key, 0) | 1 << (completion.day - 1)
+    legacy = dict(base, completion_dates=[c.isoformat() for c in completions])
+    compact = dict(base, completion_count=days, completion_months=completion_months)
+    return len(bson.encode(legacy)), len(bson.encode(compact))
+
+
+def load_server():
+    """Import backend/server.py (configured from backend/.env like the real app)"""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+    import server
+    return server
+
+
+def serialization_throughput(iterations):
+    """Payloads/second for /api/tasks and /api/leaderboard: Pydantic response_model vs trusted orjson"""
+    from pydantic import TypeAdapter
+    server = load_server()
+
+    now = datetime.now().replace(tzinfo=None)  # Motor returns naive UTC datetimes
+    tasks = [{
+        "id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "category": "Physical",
+        "title": f"Task {i}",
+        "description": "Stay consistent",
+        "created_at": now,
+        "is_completed": True,
+        "completed_at": now,
+        "completion_count": 200,
+        "completion_months": {f"2025-{m:02d}": 0x7FFFFFFF for m in range(1, 13)},
+    } for i in range(100)]
+    entries = [{
+        "username": f"user_{i}",
+        "overall_score": 100.0 - i,
+        "league": "Advanced",
+        "current_streak": i,
+        "rank": i + 1,
+    } for i in range(100)]
+
+    def response_model_path(model, docs):
+        adapter = TypeAdapter(List[model])
+        value = adapter.validate_python([model(**doc) for doc in docs])
+        return json.dumps(adapter.dump_python(value, mode="json"), separators=(",", ":")).encode()
+
+    cases = [
+        ("tasks x100", "response_model", lambda: response_model_path(server.Task, tasks)),
+        ("tasks x100", "trusted orjson", lambda: orjson.dumps(server.encode_documents(server.Task, tasks))),
+        ("leaderboard x100", "response_model", lambda: response_model_path(server.LeaderboardEntry, entries)),
+        ("leaderboard x100", "trusted orjson", lambda: orjson.dumps(entries)),
+    ]
+    results = []
+    for payload, path, encode in cases:
+        encode()  # Warm up caches
+        started = time.perf_counter()
+        for _ in range(iterations):
+            encode()
+        results.append((payload, path, iterations / (time.perf_counter() - started)))
+    return results
+
+
+async def metrics_overhead(iterations):
+    """Cost of the Prometheus instrumentation in seconds: (cheapest full request, middleware per request,
+    listener per Mongo command). The middleware and listener are timed in isolation because their cost
+    is far below the run-to-run noise of a whole request."""
+    from types import SimpleNamespace
+    server = load_server()
+    # Radar needs nothing but the current user, so no database is involved
+    server.app.dependency_overrides[server.get_current_user] = lambda: server.User(
+        username="bench", email="bench@example.com", language="en"
+    )
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://benchmark") as client:
+            await client.get("/api/stats/radar")  # Warm up
+            started = time.perf_counter()
+            for _ in range(iterations):
+                await client.get("/api/stats/radar")
+            per_request = (time.perf_counter() - started) / iterations
+    finally:
+        server.app.dependency_overrides.clear()
+
+    async def empty_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        pass
+
+    async def time_app(app):
+        started = time.perf_counter()
+        for _ in range(iterations * 10):
+            await app({"type": "http", "method": "GET"}, receive, send)
+        return (time.perf_counter() - started) / (iterations * 10)
+
+    instrumented = server.PrometheusMiddleware(empty_app)
+    per_middleware = min([await time_app(instrumented) - await time_app(empty_app) for _ in range(3)])
+
+    listener = server.MongoCommandMetrics()
+    events = [SimpleNamespace(
+        command_name="find", command={"find": "tasks"}, database_name="bench",
+        connection_id=("localhost", 27017), request_id=i, duration_micros=800
+    ) for i in range(iterations * 10)]
+    started = time.perf_counter()
+    for event in events:
+        listener.started(event)
+        listener.succeeded(event)
+    per_command = (time.perf_counter() - started) / len(events)
+    return per_request, per_middleware, per_command
+
+
+class GrowthTrackerBenchmark:
+    def __init__(self, base_url="http://localhost:8001"):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.token = None
+        self.login = None
+        self.password = "BenchPass123!"
+
+    async def setup_user(self, client):
+        """Register a throwaway user whose credentials the login burst reuses"""
+        suffix = f"{int(time.time() * 1000) % 10**8}"
+        response = await client.post(f"{self.api_url}/auth/register", json={
+            "username": f"bench_{suffix}",
+            "email": f"bench_{suffix}@example.com",
+            "password": self.password,
+            "language": "en"
+        })
+        response.raise_for_status()
+        self.token = response.json()["access_token"]
+        self.login = f"bench_{suffix}"
+
+    async def read_tasks(self, client, requests_per_reader, latencies):
+        headers = {"Authorization": f"Bearer {self.token}"}
+        for _ in range(requests_per_reader):
+            started = time.perf_counter()
+            response = await client.get(f"{self.api_url}/tasks", headers=headers)
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+    async def login_burst(self, client, logins_per_worker, statuses):
+        for _ in range(logins_per_worker):
+            response = await client.post(f"{self.api_url}/auth/login", json={
+                "login": self.login,
+                "password": self.password
+            })
+            statuses.append(response.status_code)
+
+    async def run_scenario(self, client, readers, requests_per_reader, login_workers, logins_per_worker):
+        latencies = []
+        statuses = []
+        jobs = [self.read_tasks(client, requests_per_reader, latencies) for _ in range(readers)]
+        jobs += [self.login_burst(client, logins_per_worker, statuses) for _ in range(login_workers)]
+        await asyncio.gather(*jobs)
+        return latencies, statuses
+
+    def report(self, name, latencies, statuses):
+        print(f"\n📊 {name}")
+        print(f"   /api/tasks requests: {len(latencies)}")
+        print(f"   p50: {percentile(latencies, 50) * 1000:.1f} ms")
+        print(f"   p95: {percentile(latencies, 95) * 1000:.1f} ms")
+        print(f"   p99: {percentile(latencies, 99) * 1000:.1f} ms")
+        print(f"   mean: {statistics.fmean(latencies) * 1000:.1f} ms")
+        if statuses:
+            rejected = sum(1 for code in statuses if code == 503)
+            print(f"   logins: {len(statuses)} ({rejected} rejected with 503)")
+
+
+# Weighted route mixes for --load; every request picks a route by weight
+LOAD_MIXES = {
+    "browse": {"dashboard": 5, "tasks": 2, "leaderboard": 3, "leaderboard_me": 1},
+    "active": {"dashboard": 3, "complete_task": 3, "tasks": 2, "leaderboard": 2},
+    "login-burst": {"login": 6, "dashboard": 2, "tasks": 2},
+    "mixed": {"login": 1, "dashboard": 4, "complete_task": 2, "tasks": 2, "leaderboard": 3, "leaderboard_me": 1},
+}
+SEED_BATCH_SIZE = 1000
+
+
+async def seed_load_data(server, users, tasks_per_user, history_days, password):
+    """Insert synthetic users, tasks and daily_progress history straight into server.storage.
+
+    Everyone shares one bcrypt hash so seeding 10k users takes seconds, and
+    usernames carry a run tag so ``cleanup_load_data`` only removes this run.
+    Returns [(user_id, username, [task ids])].
+    """
+    rng = random.Random(users)
+    tag = uuid.uuid4().hex[:6]
+    password_hash = server.hash_password(password)
+    categories = [category.value for category in server.TaskCategory]
+    today = datetime.now(timezone.utc).date()
+    seeded, user_docs, task_docs, progress_docs = [], [], [], []
+
+    async def flush(final=False):
+        for collection, docs in (("users", user_docs), ("tasks", task_docs), ("daily_progress", progress_docs)):
+            if docs and (final or len(docs) >= SEED_BATCH_SIZE):
+                await server.storage.import_documents(collection, docs)
+                docs.clear()
+
+    for i in range(users):
+        points = {category: round(rng.uniform(0, 500), 1) for category in categories}
+        user = server.User(
+            username=f"load_{tag}_{i}",
+            email=f"load_{tag}_{i}@example.com",
+            language=rng.choice(list(server.Language)),
+            league=rng.choice(list(server.LeagueLevel)),
+            current_streak=rng.randint(0, 30),
+            total_points=points,
+            overall_score=server.calculate_overall_score(points),
+        )
+        user_doc = user.model_dump()
+        user_doc["password"] = password_hash
+        user_docs.append(user_doc)
+
+        # At most two tasks per category, like create_task enforces
+        task_ids = []
+        for n in range(min(tasks_per_user, 2 * len(categories))):
+            task = server.Task(user_id=user.id, category=categories[n % len(categories)], title=f"Task {n}")
+            task_docs.append(task.model_dump())
+            task_ids.append(task.id)
+
+        for day in range(1, history_days + 1):
+            completed = rng.sample(categories, rng.randint(0, len(categories)))
+            if completed:
+                progress_docs.append(server.DailyProgress(
+                    user_id=user.id,
+                    date=(today - timedelta(days=day)).isoformat(),
+                    completed_categories=completed,
+                    points_earned={category: (1.0 if category in completed else 0.0) for category in categories},
+                    streak_day=len(completed) == len(categories),
+                ).model_dump())
+
+        seeded.append((user.id, user.username, task_ids))
+        await flush()
+    await flush(final=True)
+    return seeded
+
+
+async def cleanup_load_data(server, seeded):
+    if not isinstance(server.storage, server.MongoStorage):
+        return  # The memory engine's data goes away with the process
+    user_ids = [user_id for user_id, _, _ in seeded]
+    for start in range(0, len(user_ids), SEED_BATCH_SIZE):
+        batch = user_ids[start:start + SEED_BATCH_SIZE]
+        await server.db.users.delete_many({"id": {"$in": batch}})
+        await server.db.tasks.delete_many({"user_id": {"$in": batch}})
+        await server.db.daily_progress.delete_many({"user_id": {"$in": batch}})
+
+
+class LoadTest:
+    """Drives a weighted mix of API routes with N concurrent virtual users"""
+
+    def __init__(self, client, api_url, server, seeded, mix, password, seed=0):
+        self.client = client
+        self.api_url = api_url
+        self.seeded = seeded
+        self.routes = list(mix)
+        self.weights = [mix[route] for route in self.routes]
+        self.password = password
+        self.rng = random.Random(seed)
+        # Mint tokens with the app's own secret instead of paying bcrypt per virtual user
+        self.headers = {
+            user_id: {"Authorization": f"Bearer {server.create_access_token(data={'sub': user_id})}"}
+            for user_id, _, _ in seeded
+        }
+
+    async def call(self, route, user):
+        user_id, username, task_ids = user
+        headers = self.headers[user_id]
+        if route == "login":
+            return await self.client.post(f"{self.api_url}/auth/login", json={
+                "login": username,
+                "password": self.password
+            })
+        if route == "dashboard":
+            return await self.client.get(f"{self.api_url}/dashboard", headers=headers)
+        if route == "tasks":
+            return await self.client.get(f"{self.api_url}/tasks", headers=headers)
+        if route == "complete_task":
+            # Repeat completions answer 400 "already completed today", which is still real work
+            task_id = self.rng.choice(task_ids)
+            return await self.client.post(f"{self.api_url}/tasks/{task_id}/complete", headers=headers)
+        if route == "leaderboard":
+            return await self.client.get(f"{self.api_url}/leaderboard", headers=headers)
+        if route == "leaderboard_me":
+            return await self.client.get(f"{self.api_url}/leaderboard/me", headers=headers)
+        raise ValueError(f"Unknown route {route}")
+
+    async def virtual_user(self, deadline, samples):
+        while time.perf_counter() < deadline:
+            route = self.rng.choices(self.routes, self.weights)[0]
+            user = self.rng.choice(self.seeded)
+            started = time.perf_counter()
+            try:
+                status = (await self.call(route, user)).status_code
+            except httpx.HTTPError:
+                status = 0
+            samples.setdefault(route, []).append((time.perf_counter() - started, status))
+
+    async def run(self, concurrency, duration):
+        samples = {}
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(self.virtual_user(deadline, samples) for _ in range(concurrency)))
+        return summarize_samples(samples, time.perf_counter() - started)
+
+
+def summarize_samples(samples, elapsed):
+    """Per-route RPS and latency percentiles (ms); status 0 means a transport error"""
+    routes = {}
+    for route, results in sorted(samples.items()):
+        latencies = [latency for latency, _ in results]
+        routes[route] = {
+            "requests": len(results),
+            "rps": round(len(results) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+            "non_2xx": sum(1 for _, status in results if not 200 <= status < 300),
+            "errors": sum(1 for _, status in results if status == 0 or status >= 500),
+        }
+    total = sum(route["requests"] for route in routes.values())
+    return {"elapsed_s": round(elapsed, 2), "requests": total, "rps": round(total / elapsed, 1), "routes": routes}
+
+
+def find_regressions(results, baseline, threshold):
+    """Routes whose p95 grew or RPS dropped by more than ``threshold`` against a baseline run"""
+    regressions = []
+    for route, current in results["routes"].items():
+        previous = baseline.get("routes", {}).get(route)
+        if not previous:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"{route}: p95 {previous['p95_ms']} ms -> {current['p95_ms']} ms")
+        if previous["rps"] and current["rps"] < previous["rps"] * (1 - threshold):
+            regressions.append(f"{route}: rps {previous['rps']} -> {current['rps']}")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{route}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def report_load(results):
+    print(f"\n🚦 {results['mix']} mix, {results['concurrency']} virtual users, {results['elapsed_s']} s")
+    print(f"   {'route':<16}{'reqs':>7}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'non-2xx':>9}{'errors':>8}")
+    for route, stats in results["routes"].items():
+        print(f"   {route:<16}{stats['requests']:>7}{stats['rps']:>9.1f}{stats['p50_ms']:>9.1f}"
+              f"{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['non_2xx']:>9}{stats['errors']:>8}")
+    print(f"   total: {results['requests']} requests, {results['rps']} req/s (latencies in ms)")
+
+
+async def run_load(args):
+    """Seed, drive the mix, report, and gate against a baseline; returns the exit code"""
+    if args.in_process:
+        # Background jobs would compete with the measured requests
+        os.environ.setdefault("DEDUCTION_SCHEDULER_ENABLED", "false")
+    if args.storage:
+        if not args.in_process:
+            print("❌ --storage only applies to --in-process runs; set STORAGE_ENGINE on the server instead")
+            return 2
+        os.environ["STORAGE_ENGINE"] = args.storage
+    server = load_server()
+    print(f"\n🌱 Seeding {args.users} users ({args.tasks_per_user} tasks, {args.history_days} days of history)")
+    seeded = await seed_load_data(server, args.users, args.tasks_per_user, args.history_days, args.password)
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency + 1)
+        if args.in_process:
+            await server.startup_db_client(server.app)
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app),
+                                       base_url="http://benchmark", timeout=60)
+            api_url = "http://benchmark/api"
+        else:
+            client = httpx.AsyncClient(timeout=60, limits=limits)
+            api_url = f"{args.base_url}/api"
+        async with client:
+            load_test = LoadTest(client, api_url, server, seeded, LOAD_MIXES[args.mix], args.password)
+            if args.warmup:
+                await load_test.run(args.concurrency, args.warmup)
+            results = await load_test.run(args.concurrency, args.duration)
+    finally:
+        if not args.keep_data:
+            await cleanup_load_data(server, seeded)
+        if args.in_process:
+            for task in getattr(server.app.state, "background_tasks", []):
+                task.cancel()
+
+    results.update({"mix": args.mix, "concurrency": args.concurrency, "users": args.users,
+                    "target": f"in-process ({server.STORAGE_ENGINE})" if args.in_process else args.base_url})
+    report_load(results)
+    if args.json_out:
+        with open(args.json_out, "wb") as out:
+            out.write(orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+        print(f"   results written to {args.json_out}")
+    if args.baseline:
+        with open(args.baseline, "rb") as baseline_file:
+            regressions = find_regressions(results, orjson.loads(baseline_file.read()), args.threshold)
+        if regressions:
+            print(f"\n❌ Regressions beyond {args.threshold:.0%} against {args.baseline}:")
+            for regression in regressions:
+                print(f"   {regression}")
+            return 1
+        print(f"\n✅ No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+class UncoalescedReads:
+    """Stand-in for server.read_cache that runs every load, for the "before" column"""
+
+    async def get(self, key, load):
+        return await load()
+
+
+def mongo_commands_run():
+    from prometheus_client import REGISTRY
+    return sum(sample.value for metric in REGISTRY.collect() if metric.name == "mongodb_commands"
+               for sample in metric.samples if sample.name == "mongodb_commands_total")
+
+
+async def run_coalescing(args):
+    """Mongo commands/s while N concurrent readers poll GET /api/leaderboard, with and without
+    read coalescing. The in-memory leaderboard is switched off so every uncoalesced read is a
+    query, and the current user is stubbed so auth lookups don't count."""
+    os.environ.setdefault("DEDUCTION_SCHEDULER_ENABLED", "false")
+    server = load_server()
+    print(f"\n🌱 Seeding {args.users} users")
+    seeded = await seed_load_data(server, args.users, 0, 0, args.password)
+    server.app.dependency_overrides[server.get_current_user] = lambda: server.User(
+        username="bench", email="bench@example.com", language="en"
+    )
+    server.leaderboard.ready = False
+    coalesced = server.read_cache
+    rows = []
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app),
+                                     base_url="http://benchmark", timeout=60) as client:
+            async def reader(deadline, latencies):
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    response = await client.get("/api/leaderboard")
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+
+            for readers in args.coalescing_readers:
+                for mode, cache in (("uncoalesced", UncoalescedReads()), ("coalesced", coalesced)):
+                    server.read_cache = cache
+                    coalesced.clear()
+                    latencies = []
+                    commands = mongo_commands_run()
+                    started = time.perf_counter()
+                    deadline = started + args.duration
+                    await asyncio.gather(*(reader(deadline, latencies) for _ in range(readers)))
+                    elapsed = time.perf_counter() - started
+                    rows.append((readers, mode, len(latencies) / elapsed,
+                                 (mongo_commands_run() - commands) / elapsed, percentile(latencies, 95)))
+    finally:
+        server.read_cache = coalesced
+        server.app.dependency_overrides.clear()
+        if not args.keep_data:
+            await cleanup_load_data(server, seeded)
+
+    print(f"\n🔀 GET /api/leaderboard from Mongo, {args.duration:g} s per row "
+          f"(cache TTL {server.READ_CACHE_TTL_SECONDS:g} s + {server.READ_CACHE_STALE_SECONDS:g} s stale)")
+    print(f"   {'readers':>7}  {'mode':<12}{'req/s':>9}{'mongo cmd/s':>13}{'p95 ms':>9}")
+    for readers, mode, rps, commands_per_second, p95 in rows:
+        print(f"   {readers:>7}  {mode:<12}{rps:>9.1f}{commands_per_second:>13.1f}{p95 * 1000:>9.1f}")
+    return 0
+
+
+async def run_write_behind(args):
+    """Completions/s and Mongo commands per completion while users complete all their tasks back
+    to back, with every completion written through and with WriteBehindMongoStorage buffering them.
+    Each run seeds its own users, since a task completes once a day."""
+    os.environ.setdefault("DEDUCTION_SCHEDULER_ENABLED", "false")
+    server = load_server()
+    engines = (
+        ("direct", lambda: server.MongoStorage(server.db)),
+        ("write-behind", lambda: server.WriteBehindMongoStorage(
+            server.db, server.WRITE_BEHIND_FLUSH_SECONDS, server.WRITE_BEHIND_MAX_PENDING
+        )),
+    )
+    tasks_per_user = 2 * len(server.TaskCategory)
+    rows = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app),
+                                 base_url="http://benchmark", timeout=60) as client:
+        for mode, engine in engines:
+            server.storage = engine()
+            await server.storage.prepare()
+            print(f"\n🌱 Seeding {args.users} users for the {mode} run")
+            seeded = await seed_load_data(server, args.users, tasks_per_user, 0, args.password)
+            try:
+                queue = asyncio.Queue()
+                for user_id, _, task_ids in seeded:
+                    queue.put_nowait((server.create_access_token(data={"sub": user_id}), task_ids))
+                latencies = []
+
+                async def worker():
+                    while not queue.empty():
+                        token, task_ids = queue.get_nowait()
+                        headers = {"Authorization": f"Bearer {token}"}
+                        for task_id in task_ids:
+                            started = time.perf_counter()
+                            response = await client.post(f"/api/tasks/{task_id}/complete", headers=headers)
+                            response.raise_for_status()
+                            latencies.append(time.perf_counter() - started)
+
+                commands = mongo_commands_run()
+                started = time.perf_counter()
+                await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+                await server.storage.flush()  # Buffered completions count once they are in Mongo
+                elapsed = time.perf_counter() - started
+                rows.append((mode, len(latencies) / elapsed, (mongo_commands_run() - commands) / len(latencies),
+                             percentile(latencies, 95)))
+            finally:
+                if isinstance(server.storage, server.WriteBehindMongoStorage):
+                    await server.storage.drain()
+                if not args.keep_data:
+                    await cleanup_load_data(server, seeded)
+
+    print(f"\n✍️  {args.users} users completing {tasks_per_user} tasks back to back, {args.concurrency} at a time "
+          f"(flush every {server.WRITE_BEHIND_FLUSH_SECONDS:g} s or {server.WRITE_BEHIND_MAX_PENDING} documents)")
+    print(f"   {'mode':<14}{'completions/s':>14}{'mongo cmd/completion':>22}{'p95 ms':>9}")
+    for mode, rate, commands_per_completion, p95 in rows:
+        print(f"   {mode:<14}{rate:>14.1f}{commands_per_completion:>22.2f}{p95 * 1000:>9.1f}")
+    return 0
+
+
+def run_recompute(args):
+    """Users/s of each offline recompute stage over synthetic histories of --recompute-days days,
+    and the time that projects to for --recompute-users. Mongo reads and writes are not included."""
+    import numpy as np
+    server = load_server()
+    rng = np.random.default_rng(0)
+    categories = [c.value for c in server.TaskCategory]
+    as_of = datetime.now(timezone.utc).date()
+    days = [(as_of - timedelta(days=offset)).isoformat() for offset in range(args.recompute_days)]
+    chunk = server.RECOMPUTE_CHUNK_SIZE
+
+    # Matrices are built from a sample of users' dailies, since a chunk of them is millions of documents
+    sample = max(1, chunk // 10)
+    user_ids = [str(uuid.uuid4()) for _ in range(sample)]
+    done = rng.random((sample, len(days), len(categories))) < 0.9
+    dailies = [
+        {"user_id": user_id, "date": day, "completed_categories": [c for c, hit in zip(categories, done[u, d]) if hit]}
+        for u, user_id in enumerate(user_ids) for d, day in enumerate(days) if done[u, d].any()
+    ]
+    started = time.perf_counter()
+    server.build_completion_matrix(user_ids, dailies, [], as_of)
+    build_rate = sample / (time.perf_counter() - started)
+
+    completed = rng.random((chunk, len(days), len(categories))) < 0.97
+    users = [{"id": str(uuid.uuid4()), "current_streak": 0, "best_streak": 0, "league": "Normal", "badges": []}
+             for _ in range(chunk)]
+    started = time.perf_counter()
+    server.recompute_streaks(completed)
+    streak_rate = chunk / (time.perf_counter() - started)
+    started = time.perf_counter()
+    corrections = server.progress_corrections(users, completed)
+    correction_rate = chunk / (time.perf_counter() - started)
+
+    print(f"\n🧮 Offline recompute, {args.recompute_days} days per user, chunks of {chunk} users "
+          f"({completed.nbytes / 1e6:.0f} MB matrix, {len(corrections)} corrections in the chunk)")
+    print(f"   {'stage':<32}{'users/s':>12}{f'{args.recompute_users} users':>16}")
+    for stage, rate in (("build matrix from dailies", build_rate), ("streaks (vectorized)", streak_rate),
+                        ("leagues, badges and updates", correction_rate)):
+        print(f"   {stage:<32}{rate:>12.0f}{args.recompute_users / rate:>14.1f} s")
+    return 0
+
+
+async def main(args):
+    if args.recompute:
+        return run_recompute(args)
+    if args.load:
+        return await run_load(args)
+    if args.coalescing:
+        return await run_coalescing(args)
+    if args.write_behind:
+        return await run_write_behind(args)
+    if args.task_size:
+        print("\n📦 Task document size (BSON bytes)")
+        for days in (30, 365, 3 * 365):
+            legacy, compact = task_document_sizes(days)
+            print(f"   {days:>5} days: completion_dates {legacy:>6}  completion_months {compact:>5}")
+        return 0
+    if args.metrics_overhead:
+        per_request, per_middleware, per_command = await metrics_overhead(args.iterations)
+        print("\n📈 Metrics instrumentation overhead")
+        print(f"   in-process GET /api/stats/radar: {per_request * 1e6:>7.1f} µs")
+        print(f"   PrometheusMiddleware per request: {per_middleware * 1e6:>7.1f} µs "
+              f"({per_middleware / per_request:.1%} of that request)")
+        print(f"   Mongo listener per command:       {per_command * 1e6:>7.1f} µs "
+              f"({per_command / 0.001:.1%} of a 1 ms command)")
+        return 0
+    if args.serialization:
+        print("\n⚡ Serialization throughput (payloads/s)")
+        for payload, path, rate in serialization_throughput(args.iterations):
+            print(f"   {payload:<18} {path:<16} {rate:>10.0f}")
+        return 0
+
+    benchmark = GrowthTrackerBenchmark(args.base_url)
+    limits = httpx.Limits(max_connections=args.readers + args.login_workers + 1)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        await benchmark.setup_user(client)
+
+        latencies, statuses = await benchmark.run_scenario(
+            client, args.readers, args.requests, 0, 0
+        )
+        benchmark.report("GET /api/tasks (idle)", latencies, statuses)
+
+        latencies, statuses = await benchmark.run_scenario(
+            client, args.readers, args.requests, args.login_workers, args.logins
+        )
+        benchmark.report(
+            f"GET /api/tasks during {args.login_workers}x{args.logins} concurrent logins",
+            latencies, statuses
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency benchmark for the Growth Tracker API")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--readers", type=int, default=10, help="Concurrent /api/tasks readers")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per reader")
+    parser.add_argument("--login-workers", type=int, default=20, help="Concurrent login workers")
+    parser.add_argument("--logins", type=int, default=5, help="Logins per worker")
+    parser.add_argument("--task-size", action="store_true", help="Only compare task document sizes")
+    parser.add_argument("--serialization", action="store_true", help="Only compare response serialization paths")
+    parser.add_argument("--metrics-overhead", action="store_true", help="Only measure Prometheus instrumentation cost")
+    parser.add_argument("--iterations", type=int, default=2000, help="Iterations per serialization/metrics case")
+    load = parser.add_argument_group("load test (--load)")
+    load.add_argument("--load", action="store_true", help="Seed synthetic data and drive a weighted route mix")
+    load.add_argument("--in-process", action="store_true", help="Serve the app through ASGI instead of --base-url")
+    load.add_argument("--storage", choices=["mongo", "memory"],
+                      help="Storage engine for --in-process runs (default: STORAGE_ENGINE)")
+    load.add_argument("--mix", choices=sorted(LOAD_MIXES), default="mixed")
+    load.add_argument("--concurrency", type=int, default=50, help="Concurrent virtual users")
+    load.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    load.add_argument("--warmup", type=float, default=3, help="Unmeasured seconds before the run")
+    load.add_argument("--users", type=int, default=1000, help="Synthetic users to seed")
+    load.add_argument("--tasks-per-user", type=int, default=5)
+    load.add_argument("--history-days", type=int, default=30, help="Days of daily_progress per user")
+    load.add_argument("--password", default="BenchPass123!", help="Password of every seeded user")
+    load.add_argument("--keep-data", action="store_true", help="Leave the seeded documents in Mongo")
+    load.add_argument("--json-out", help="Write per-route results as JSON")
+    load.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    load.add_argument("--threshold", type=float, default=0.10, help="Allowed p95/RPS regression (0.10 = 10%%)")
+    coalescing = parser.add_argument_group("read coalescing (--coalescing; also uses --duration, --users, --keep-data)")
+    coalescing.add_argument("--coalescing", action="store_true",
+                            help="Mongo commands/s as concurrent leaderboard readers grow, with and without coalescing")
+    coalescing.add_argument("--coalescing-readers", type=lambda value: [int(n) for n in value.split(",")],
+                            default=[10, 100, 1000], help="Comma-separated reader counts")
+    write_behind = parser.add_argument_group("write-behind (--write-behind; also uses --users, --concurrency, --keep-data)")
+    write_behind.add_argument("--write-behind", action="store_true",
+                              help="Compare completion throughput with and without write-behind buffering")
+    recompute = parser.add_argument_group("offline recompute (--recompute)")
+    recompute.add_argument("--recompute", action="store_true",
+                           help="Time the streak, league and badge recompute stages on synthetic histories")
+    recompute.add_argument("--recompute-users", type=int, default=1_000_000, help="Users to project the time for")
+    recompute.add_argument("--recompute-days", type=int, default=365, help="Days of history per user")
+    sys.exit(asyncio.run(main(parser.parse_args())))
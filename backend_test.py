@@ -2,6 +2,7 @@ import requests
 import sys
 import json
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import time
 
 class GrowthTrackerAPITester:
@@ -162,6 +163,47 @@ class GrowthTrackerAPITester:
         )
         return success
 
+    def test_concurrent_completion(self, task_id, category, attempts=10):
+        """Test that parallel completions of one task are counted exactly once"""
+        url = f"{self.api_url}/tasks/{task_id}/complete"
+        headers = {'Authorization': f'Bearer {self.token}'}
+        
+        self.tests_run += 1
+        print(f"\n🔍 Testing Concurrent Task Completion ({attempts} parallel requests)...")
+        print(f"   URL: {url}")
+        
+        try:
+            before = requests.get(f"{self.api_url}/stats/radar", headers=headers, timeout=10).json()
+            with ThreadPoolExecutor(max_workers=attempts) as executor:
+                responses = list(executor.map(
+                    lambda _: requests.post(url, headers=headers, timeout=10),
+                    range(attempts)
+                ))
+            after = requests.get(f"{self.api_url}/stats/radar", headers=headers, timeout=10).json()
+        except Exception as e:
+            print(f"❌ Failed - Error: {str(e)}")
+            return False
+        
+        completed = [r for r in responses if r.status_code == 200]
+        rejected = [r for r in responses if r.status_code == 400]
+        points_before = {c["category"]: c["points"] for c in before["categories"]}
+        points_after = {c["category"]: c["points"] for c in after["categories"]}
+        
+        if len(completed) != 1 or len(rejected) != attempts - 1:
+            print(f"❌ Failed - Expected 1 completion and {attempts - 1} rejections, "
+                  f"got {len(completed)} and {len(rejected)}")
+            return False
+        
+        expected_points = points_before[category] + completed[0].json()["points_earned"]
+        if abs(points_after[category] - expected_points) > 1e-9:
+            print(f"❌ Failed - {category} points went from {points_before[category]} "
+                  f"to {points_after[category]}, expected {expected_points}")
+            return False
+        
+        self.tests_passed += 1
+        print(f"✅ Passed - 1 completion, {len(rejected)} rejected, {category} points counted once")
+        return True
+
     def test_update_task(self, task_id):
         """Test updating a task"""
         update_data = {
@@ -318,6 +360,10 @@ def main():
         if not tester.test_complete_task(first_task_id):
             print("❌ Complete task failed")
     
+    if len(task_ids) > 1:
+        if not tester.test_concurrent_completion(task_ids[1], categories[1]):
+            print("❌ Concurrent task completion failed")
+    
     # Test task category limit
     if not tester.test_task_category_limit():
         print("❌ Task category limit test failed")
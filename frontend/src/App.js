@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef, useCallback } from 'react';
 import { BrowserRouter, Routes, Route, Navigate } from 'react-router-dom';
 import axios from 'axios';
 import './App.css';
@@ -15,6 +15,7 @@ import Layout from './components/Layout';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const EVENT_TYPES = ['task_completed', 'points', 'streak', 'league', 'badges', 'rank', 'resync'];
 
 // Auth Context
 const AuthContext = React.createContext();
@@ -23,6 +24,7 @@ function App() {
   const [user, setUser] = useState(null);
   const [token, setToken] = useState(localStorage.getItem('token'));
   const [loading, setLoading] = useState(true);
+  const eventListeners = useRef(new Set());
 
   useEffect(() => {
     if (token) {
@@ -33,6 +35,81 @@ function App() {
     }
   }, [token]);
 
+  // Server-pushed deltas (see GET /api/events). EventSource cannot send headers, so
+  // each connection is opened with a single-use ticket rather than the token; since
+  // a ticket can't be reused, reconnecting is done here instead of by the browser.
+  useEffect(() => {
+    if (!token) return undefined;
+    let source = null;
+    let retry = null;
+    let closed = false;
+    let opened = false;
+    const dispatch = (message) => {
+      const event = JSON.parse(message.data);
+      applyUserEvent(event);
+      eventListeners.current.forEach((listener) => listener(event));
+    };
+    const reconnect = () => {
+      if (source) source.close();
+      if (!closed) retry = setTimeout(connect, 3000);
+    };
+    const connect = async () => {
+      let ticket;
+      try {
+        ticket = (await axios.post(`${API}/events/ticket`)).data.ticket;
+      } catch (error) {
+        reconnect();
+        return;
+      }
+      if (closed) return;
+      source = new EventSource(`${API}/events?ticket=${encodeURIComponent(ticket)}`);
+      EVENT_TYPES.forEach((type) => source.addEventListener(type, dispatch));
+      // Anything pushed while disconnected is lost, so a reconnect resyncs.
+      source.addEventListener('open', () => {
+        if (opened) dispatch({ data: '{"type":"resync"}' });
+        opened = true;
+      });
+      source.addEventListener('error', reconnect);
+    };
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      if (source) source.close();
+    };
+  }, [token]);
+
+  const applyUserEvent = (event) => {
+    if (event.type === 'resync') {
+      fetchUserProfile();
+      return;
+    }
+    setUser((current) => {
+      if (!current) return current;
+      switch (event.type) {
+        case 'points':
+          return {
+            ...current,
+            total_points: { ...current.total_points, [event.category]: event.points },
+            overall_score: event.overall_score
+          };
+        case 'streak':
+          return { ...current, current_streak: event.current_streak, best_streak: event.best_streak };
+        case 'league':
+          return { ...current, league: event.league };
+        case 'badges':
+          return { ...current, badges: [...current.badges, ...event.added.filter((badge) => !current.badges.includes(badge))] };
+        default:
+          return current;
+      }
+    });
+  };
+
+  const subscribeEvents = useCallback((listener) => {
+    eventListeners.current.add(listener);
+    return () => eventListeners.current.delete(listener);
+  }, []);
+
   const fetchUserProfile = async () => {
     try {
       const response = await axios.get(`${API}/auth/me`);
@@ -72,7 +149,9 @@ function App() {
     token,
     login,
     logout,
-    refreshUser: fetchUserProfile
+    refreshUser: fetchUserProfile,
+    updateUser: setUser,
+    subscribeEvents
   };
 
   return (
@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useContext } from 'react';
 import { AuthContext } from '../App';
+import { isCompletedToday } from '../lib/utils';
 import axios from 'axios';
 import { 
   Target, 
@@ -16,7 +17,7 @@ const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
 const Dashboard = () => {
-  const { user, refreshUser } = useContext(AuthContext);
+  const { user, updateUser } = useContext(AuthContext);
   const [tasks, setTasks] = useState([]);
   const [radarData, setRadarData] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -27,14 +28,13 @@ const Dashboard = () => {
 
   const fetchDashboardData = async () => {
     try {
-      const [tasksResponse, radarResponse] = await Promise.all([
-        axios.get(`${API}/tasks`),
-        axios.get(`${API}/stats/radar`)
-      ]);
+      const response = await axios.get(`${API}/dashboard`, {
+        params: { fields: 'user,tasks,radar' }
+      });
       
-      setTasks(tasksResponse.data);
-      setRadarData(radarResponse.data);
-      await refreshUser();
+      setTasks(response.data.tasks);
+      setRadarData(response.data.radar);
+      updateUser(response.data.user);
     } catch (error) {
       console.error('Failed to fetch dashboard data:', error);
     } finally {
@@ -53,13 +53,7 @@ const Dashboard = () => {
   };
 
   const getTasksToday = () => {
-    const today = new Date().toISOString().split('T')[0];
-    return tasks.filter(task => {
-      if (!task.completion_dates) return false;
-      return task.completion_dates.some(date => 
-        new Date(date).toISOString().split('T')[0] === today
-      );
-    });
+    return tasks.filter(isCompletedToday);
   };
 
   const getTasksByCategory = () => {
@@ -227,12 +221,7 @@ const Dashboard = () => {
         <div className="grid grid-cols-1 lg:grid-cols-2 gap-6">
           {Object.entries(tasksByCategory).map(([category, categoryTasks]) => {
             const isCompleted = completedToday.includes(category);
-            const todayTasks = categoryTasks.filter(task => {
-              const today = new Date().toISOString().split('T')[0];
-              return !task.completion_dates?.some(date => 
-                new Date(date).toISOString().split('T')[0] === today
-              );
-            });
+            const todayTasks = categoryTasks.filter(task => !isCompletedToday(task));
 
             return (
               <div key={category} className={`card ${isCompleted ? 'border-green-500/30 bg-green-500/5' : ''}`}>
@@ -15,30 +15,29 @@ import {
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
-// Quotable API for free quotes
-const QUOTABLE_API = 'https://api.quotable.io';
-
 const MotivationPage = () => {
   const { user, refreshUser } = useContext(AuthContext);
   const [dailyQuotes, setDailyQuotes] = useState([]);
-  const [favorites, setFavorites] = useState([]);
+  // Loaded when the favorites tab is first opened
+  const [favorites, setFavorites] = useState(null);
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
+  const [quoteSet, setQuoteSet] = useState(0);
   const [activeTab, setActiveTab] = useState('daily');
 
   useEffect(() => {
     fetchMotivationData();
   }, []);
 
+  useEffect(() => {
+    if (activeTab === 'favorites' && favorites === null) {
+      fetchFavoriteQuotes().then(setFavorites);
+    }
+  }, [activeTab, favorites]);
+
   const fetchMotivationData = async () => {
     try {
-      const [quotesResponse, favoritesResponse] = await Promise.all([
-        fetchDailyQuotes(),
-        fetchFavoriteQuotes()
-      ]);
-      
-      setDailyQuotes(quotesResponse);
-      setFavorites(favoritesResponse);
+      setDailyQuotes(await fetchDailyQuotes());
     } catch (error) {
       console.error('Failed to fetch motivation data:', error);
     } finally {
@@ -46,63 +45,30 @@ const MotivationPage = () => {
     }
   };
 
-  const fetchDailyQuotes = async () => {
+  const fetchDailyQuotes = async (offset = 0) => {
     try {
-      // Fetch 5 quotes from Quotable API
-      const response = await axios.get(`${QUOTABLE_API}/quotes?limit=5`);
-      return response.data.results.map(quote => ({
-        id: quote._id,
+      // Today's quotes come from the backend catalog, the same for everyone per language
+      const response = await axios.get(`${API}/quotes/daily`, {
+        params: { language: user?.language || 'en', offset }
+      });
+      const quotes = response.data.quotes;
+      // Quote ids are the same content hashes favorites are keyed by
+      const status = quotes.length
+        ? (await axios.get(`${API}/quotes/favorites/status`, {
+            params: { hashes: quotes.map(quote => quote.id).join(',') }
+          })).data
+        : {};
+      return quotes.map(quote => ({
+        id: quote.id,
         content: quote.content,
         author: quote.author,
-        length: quote.length,
+        length: quote.content.length,
         tags: quote.tags,
-        isFavorite: false
+        isFavorite: Boolean(status[quote.id])
       }));
     } catch (error) {
       console.error('Failed to fetch daily quotes:', error);
-      // Fallback quotes if API fails
-      return [
-        {
-          id: 'fallback-1',
-          content: 'The only way to do great work is to love what you do.',
-          author: 'Steve Jobs',
-          length: 49,
-          tags: ['motivational'],
-          isFavorite: false
-        },
-        {
-          id: 'fallback-2',
-          content: 'Innovation distinguishes between a leader and a follower.',
-          author: 'Steve Jobs',
-          length: 56,
-          tags: ['leadership'],
-          isFavorite: false
-        },
-        {
-          id: 'fallback-3',
-          content: 'Your limitation—it\'s only your imagination.',
-          author: 'Unknown',
-          length: 43,
-          tags: ['inspiration'],
-          isFavorite: false
-        },
-        {
-          id: 'fallback-4',
-          content: 'Push yourself, because no one else is going to do it for you.',
-          author: 'Unknown',
-          length: 61,
-          tags: ['motivational'],
-          isFavorite: false
-        },
-        {
-          id: 'fallback-5',
-          content: 'Great things never come from comfort zones.',
-          author: 'Unknown',
-          length: 41,
-          tags: ['growth'],
-          isFavorite: false
-        }
-      ];
+      return [];
     }
   };
 
@@ -119,8 +85,10 @@ const MotivationPage = () => {
   const refreshDailyQuotes = async () => {
     setRefreshing(true);
     try {
-      const newQuotes = await fetchDailyQuotes();
+      const nextSet = (quoteSet + 1) % 100;
+      const newQuotes = await fetchDailyQuotes(nextSet);
       setDailyQuotes(newQuotes);
+      setQuoteSet(nextSet);
     } catch (error) {
       console.error('Failed to refresh quotes:', error);
     } finally {
@@ -130,21 +98,24 @@ const MotivationPage = () => {
 
   const toggleFavorite = async (quote) => {
     try {
-      const isFavorite = favorites.some(fav => fav.quote === quote.content);
+      const isFavorite = quote.isFavorite;
       
       if (isFavorite) {
         // Remove from favorites
         await axios.delete(`${API}/quotes/favorites`, {
-          data: { quote: quote.content, author: quote.author }
+          params: { hash: quote.id }
         });
-        setFavorites(favorites.filter(fav => fav.quote !== quote.content));
+        if (favorites !== null) {
+          setFavorites(favorites.filter(fav => fav.hash !== quote.id));
+        }
       } else {
-        // Add to favorites
-        const response = await axios.post(`${API}/quotes/favorites`, {
-          quote: quote.content,
-          author: quote.author
+        // Add to favorites (saving twice is harmless)
+        const response = await axios.post(`${API}/quotes/favorites`, null, {
+          params: { quote: quote.content, author: quote.author }
         });
-        setFavorites([...favorites, response.data]);
+        if (favorites !== null && !favorites.some(fav => fav.hash === response.data.hash)) {
+          setFavorites([response.data, ...favorites]);
+        }
       }
       
       // Update the quote's favorite status in daily quotes
@@ -159,19 +130,20 @@ const MotivationPage = () => {
     }
   };
 
-  const removeFavorite = async (favoriteId) => {
+  const removeFavorite = async (favorite) => {
     try {
-      await axios.delete(`${API}/quotes/favorites/${favoriteId}`);
-      setFavorites(favorites.filter(fav => fav.id !== favoriteId));
+      await axios.delete(`${API}/quotes/favorites/${favorite.id}`);
+      setFavorites(favorites.filter(fav => fav.id !== favorite.id));
+      setDailyQuotes(dailyQuotes.map(q =>
+        q.id === favorite.hash ? { ...q, isFavorite: false } : q
+      ));
     } catch (error) {
       console.error('Failed to remove favorite:', error);
       alert('Failed to remove favorite');
     }
   };
 
-  const isQuoteFavorite = (quote) => {
-    return favorites.some(fav => fav.quote === quote.content);
-  };
+  const isQuoteFavorite = (quote) => quote.isFavorite;
 
   if (loading) {
     return (
@@ -221,7 +193,7 @@ const MotivationPage = () => {
           }`}
         >
           <BookOpen className="w-4 h-4 inline mr-2" />
-          Saved Favorites ({favorites.length})
+          Saved Favorites{favorites !== null && ` (${favorites.length})`}
         </button>
       </div>
 
@@ -306,7 +278,11 @@ const MotivationPage = () => {
             </p>
           </div>
 
-          {favorites.length === 0 ? (
+          {favorites === null ? (
+            <div className="flex items-center justify-center h-32">
+              <div className="animate-spin rounded-full h-8 w-8 border-b-2 border-pink-400"></div>
+            </div>
+          ) : favorites.length === 0 ? (
             <div className="card text-center py-12">
               <Star className="w-16 h-16 text-slate-600 mx-auto mb-4" />
               <h3 className="text-xl font-semibold text-white mb-2">
@@ -329,7 +305,7 @@ const MotivationPage = () => {
                   <div className="flex items-start justify-between mb-4">
                     <Quote className="w-6 h-6 text-pink-400" />
                     <button
-                      onClick={() => removeFavorite(favorite.id)}
+                      onClick={() => removeFavorite(favorite)}
                       className="p-2 text-slate-400 hover:text-red-400 transition-colors opacity-0 group-hover:opacity-100"
                     >
                       <StarOff className="w-5 h-5" />
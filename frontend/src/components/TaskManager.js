@@ -1,5 +1,6 @@
-import React, { useState, useEffect, useContext } from 'react';
+import React, { useState, useEffect, useContext, useRef } from 'react';
 import { AuthContext } from '../App';
+import { isCompletedToday } from '../lib/utils';
 import axios from 'axios';
 import { 
   Plus, 
@@ -14,6 +15,8 @@ import {
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+// How long a completion waits for its event before refetching instead
+const COMPLETION_EVENT_TIMEOUT_MS = 3000;
 
 const categories = [
   { value: 'Intelligence', icon: '🧠', color: 'text-blue-400' },
@@ -24,11 +27,14 @@ const categories = [
 ];
 
 const TaskManager = () => {
-  const { refreshUser } = useContext(AuthContext);
+  const { subscribeEvents, refreshUser } = useContext(AuthContext);
   const [tasks, setTasks] = useState([]);
   const [loading, setLoading] = useState(true);
   const [showCreateModal, setShowCreateModal] = useState(false);
   const [editingTask, setEditingTask] = useState(null);
+  // Completions the stream has already reported, and refetches waiting on the stream
+  const reportedCompletions = useRef(new Set());
+  const completionFallbacks = useRef(new Map());
   const [formData, setFormData] = useState({
     category: 'Intelligence',
     title: '',
@@ -37,8 +43,31 @@ const TaskManager = () => {
 
   useEffect(() => {
     fetchTasks();
+    const fallbacks = completionFallbacks.current;
+    return () => fallbacks.forEach((timer) => clearTimeout(timer));
   }, []);
 
+  // Completions (from this tab or any other) arrive as events; the user's points
+  // and streak are patched in App, so only the task itself is updated here.
+  useEffect(() => subscribeEvents((event) => {
+    if (event.type === 'task_completed') {
+      const fallback = completionFallbacks.current.get(event.task_id);
+      if (fallback) {
+        clearTimeout(fallback);
+        completionFallbacks.current.delete(event.task_id);
+      } else {
+        reportedCompletions.current.add(event.task_id);
+      }
+      setTasks((current) => current.map((task) => (task.id === event.task_id ? {
+        ...task,
+        completion_count: event.completion_count,
+        completion_months: { ...task.completion_months, ...event.completion_months }
+      } : task)));
+    } else if (event.type === 'resync') {
+      fetchTasks();
+    }
+  }), [subscribeEvents]);
+
   const fetchTasks = async () => {
     try {
       const response = await axios.get(`${API}/tasks`);
@@ -89,10 +118,18 @@ const TaskManager = () => {
   };
 
   const completeTask = async (taskId) => {
+    reportedCompletions.current.delete(taskId);
     try {
       await axios.post(`${API}/tasks/${taskId}/complete`);
-      await fetchTasks();
-      await refreshUser();
+      // The stream normally brings the task, points and streak (maybe before this
+      // response); if it is down, buffered by a proxy or refused, refetch them.
+      if (!reportedCompletions.current.delete(taskId)) {
+        completionFallbacks.current.set(taskId, setTimeout(() => {
+          completionFallbacks.current.delete(taskId);
+          fetchTasks();
+          refreshUser();
+        }, COMPLETION_EVENT_TIMEOUT_MS));
+      }
     } catch (error) {
       alert(error.response?.data?.detail || 'Failed to complete task');
     }
@@ -123,13 +160,6 @@ const TaskManager = () => {
     return grouped;
   };
 
-  const isTaskCompletedToday = (task) => {
-    const today = new Date().toISOString().split('T')[0];
-    return task.completion_dates?.some(date => 
-      new Date(date).toISOString().split('T')[0] === today
-    );
-  };
-
   const canCreateTask = (category) => {
     const categoryTasks = tasks.filter(task => task.category === category);
     return categoryTasks.length < 2;
@@ -166,7 +196,7 @@ const TaskManager = () => {
       <div className="grid grid-cols-1 lg:grid-cols-2 xl:grid-cols-3 gap-6">
         {categories.map((category) => {
           const categoryTasks = tasksByCategory[category.value];
-          const completedToday = categoryTasks.filter(isTaskCompletedToday).length;
+          const completedToday = categoryTasks.filter(isCompletedToday).length;
           const canCreate = canCreateTask(category.value);
 
           return (
@@ -223,7 +253,7 @@ const TaskManager = () => {
                   </div>
                 ) : (
                   categoryTasks.map((task) => {
-                    const completedToday = isTaskCompletedToday(task);
+                    const completedToday = isCompletedToday(task);
                     
                     return (
                       <div
@@ -263,7 +293,7 @@ const TaskManager = () => {
                           <div className="flex items-center space-x-2 text-sm">
                             <Clock className="w-4 h-4 text-slate-400" />
                             <span className="text-slate-400">
-                              {task.completion_dates?.length || 0} completions
+                              {task.completion_count || 0} completions
                             </span>
                           </div>
                           
@@ -4,3 +4,10 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs) {
   return twMerge(clsx(inputs));
 }
+
+// task.completion_months maps "YYYY-MM" to a bitmask of the (UTC) days completed, bit 0 = day 1
+export function isCompletedToday(task) {
+  const today = new Date().toISOString().split('T')[0];
+  const mask = task.completion_months?.[today.slice(0, 7)] || 0;
+  return (mask & (1 << (Number(today.slice(8, 10)) - 1))) !== 0;
+}
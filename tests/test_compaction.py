@@ -0,0 +1,54 @@
+import asyncio
+from datetime import date, timedelta
+
+import server
+
+
+def daily(user_id, day, categories, streak_day=False):
+    return {"id": f"{user_id}-{day}", "user_id": user_id, "date": day.isoformat(), "completed_categories": categories,
+            "points_earned": {category: 1.0 for category in categories}, "streak_day": streak_day}
+
+
+def test_an_archive_expands_back_into_the_days_it_folded():
+    dailies = [daily("u1", date(2024, 2, 1), ["Social"]),
+               daily("u1", date(2024, 2, 29), [c.value for c in server.TaskCategory], streak_day=True)]
+    archive = server.build_progress_archive("u1", date(2024, 2, 1), dailies)
+    assert archive["month"] == "2024-02" and archive["streak_days"] == 1 << 28
+    assert archive["category_days"]["Social"] == 1 | 1 << 28
+    assert archive["points_earned"]["Social"] == {"1": 1.0, "29": 1.0} and archive["points_earned"]["Physical"] == {"29": 1.0}
+    assert server.archived_days(archive) == {
+        "2024-02-01": {"completed_categories": ["Social"], "points_earned": {"Social": 1.0}, "streak_day": False},
+        "2024-02-29": {"completed_categories": [c.value for c in server.TaskCategory],
+                       "points_earned": {c.value: 1.0 for c in server.TaskCategory}, "streak_day": True},
+    }
+
+
+def test_whole_months_past_the_retention_window_are_archived_and_deleted(memory_storage):
+    async def scenario():
+        today = date(2024, 6, 15)
+        cutoff = today - timedelta(days=server.DAILY_PROGRESS_RETENTION_DAYS)
+        days = [cutoff - timedelta(days=offset) for offset in range(0, 120, 3)] + [today - timedelta(days=1)]
+        await memory_storage.import_documents("daily_progress", [
+            daily(user_id, day, ["Social", "Physical"], streak_day=user_id == "u1")
+            for user_id in ("u1", "u2") for day in days
+        ])
+
+        report = await server.compact_daily_progress(memory_storage, today)
+        kept = {progress["date"] for progress in memory_storage._progress.values()}
+        assert min(kept) >= cutoff.replace(day=1).isoformat()
+        assert report["dailies_deleted"] == 2 * len(days) - len(kept) * 2 and report["bytes_reclaimed"] > 0
+        assert report["archives"] == 2 * report["months"] and len(memory_storage._archives) == report["archives"]
+        archived = {}
+        for (user_id, _), archive in memory_storage._archives.items():
+            if user_id == "u1":
+                archived.update(server.archived_days(archive))
+        assert sorted(archived) == sorted(day.isoformat() for day in days if day.isoformat() not in kept)
+        assert all(day["streak_day"] for day in archived.values())
+
+        # Deductions still see the recent days, and running again changes nothing
+        assert await memory_storage.last_full_days(today - timedelta(days=7), today) == {"u1": today - timedelta(days=1)}
+        assert await server.compact_daily_progress(memory_storage, today) == {
+            "months": 0, "archives": 0, "dailies_deleted": 0, "bytes_reclaimed": 0
+        }
+
+    asyncio.run(scenario())
@@ -0,0 +1,137 @@
+import asyncio
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import server
+
+
+def test_connections_are_bounded_per_user_and_overall():
+    bus = server.EventBus(server.LocalEventBackend(), max_connections=3, max_per_user=2, queue_size=10)
+    queues = [bus.subscribe("alice"), bus.subscribe("alice")]
+    with pytest.raises(HTTPException) as error:
+        bus.subscribe("alice")
+    assert error.value.status_code == 503 and error.value.headers["Retry-After"]
+    queues.append(bus.subscribe("bob"))
+    with pytest.raises(HTTPException):
+        bus.subscribe("carol")
+    bus.unsubscribe("alice", queues[0])
+    bus.unsubscribe("alice", queues[0])
+    assert bus.connections == 2
+    bus.subscribe("carol")
+
+
+def test_slow_subscriber_gets_a_resync_instead_of_a_backlog():
+    async def scenario():
+        bus = server.EventBus(server.LocalEventBackend(), max_connections=10, max_per_user=2, queue_size=3)
+        await bus.start()
+        slow, other = bus.subscribe("alice"), bus.subscribe("bob")
+        await bus.publish("alice", [{"type": "points", "delta": float(i)} for i in range(5)])
+        assert other.empty()
+        drained = [slow.get_nowait() for _ in range(slow.qsize())]
+        assert drained[-1] == {"type": "resync"} and len(drained) <= 3
+
+    asyncio.run(scenario())
+
+
+def test_delivered_events_drop_the_cached_user():
+    user = server.User(username="alice", email="alice@example.com", language="en")
+    bus = server.EventBus(server.LocalEventBackend(), max_connections=10, max_per_user=2, queue_size=3)
+    server.auth_cache.set_user(user, server.auth_cache.version(user.id))
+    assert server.auth_cache.get_user(user.id) is user
+    bus.deliver(user.id, [{"type": "points", "delta": 2.0}])  # As tailed from another worker's completion
+    assert server.auth_cache.get_user(user.id) is None
+
+
+def test_completion_events_only_report_what_changed():
+    before = server.User(username="alice", email="a@example.com", language="en", current_streak=2, best_streak=2)
+    after = {
+        "total_points": {**before.total_points, "Social": 2.0}, "overall_score": 0.4,
+        "current_streak": 2, "best_streak": 2, "league": before.league.value, "badges": ["first_task"]
+    }
+    task = {"completion_count": 1, "completion_months": {"2025-03": 1}}
+    events = server.completion_events("task-id", task, "2025-03", server.TaskCategory.SOCIAL, 2.0,
+                                      before, after, previous_rank=4, rank=4)
+    assert [event["type"] for event in events] == ["task_completed", "points", "badges"]
+    assert events[2]["added"] == ["first_task"]
+
+
+def test_stream_tickets_are_single_use_and_replace_the_token_parameter():
+    async def scenario():
+        storage = server.MemoryStorage()
+        app = server.create_app(storage)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            registered = (await client.post("/api/auth/register", json={
+                "username": "alice", "email": "alice@example.com", "password": "secret1"
+            })).json()
+            headers = {"Authorization": f"Bearer {registered['access_token']}"}
+            assert (await client.post("/api/events/ticket")).status_code in (401, 403)
+            issued = (await client.post("/api/events/ticket", headers=headers)).json()
+            assert issued["expires_in"] == server.EVENT_TICKET_SECONDS
+            assert (await client.get(f"/api/events?token={registered['access_token']}")).status_code == 401
+            assert (await client.get("/api/events?ticket=made-up")).status_code == 401
+
+        ticket_hash = server.stream_ticket_hash(issued["ticket"])
+        assert await storage.redeem_stream_ticket(ticket_hash) == registered["user"]["id"]
+        assert await storage.redeem_stream_ticket(ticket_hash) is None
+        await storage.insert_stream_ticket({"hash": "old", "user_id": "u", "expires_at": datetime.now(timezone.utc)})
+        assert await storage.redeem_stream_ticket("old") is None
+
+    asyncio.run(scenario())
+
+
+class TailedCollection:
+    """A capped collection whose first tailable cursor dies before its ``drop_at``th document"""
+
+    def __init__(self, documents, drop_at):
+        self.documents = list(documents)
+        self.drop_at = drop_at
+        self.cursors = 0
+
+    async def find_one(self, query, projection=None, sort=None):
+        if sort:
+            return self.documents[-1] if self.documents else None
+        return next((document for document in self.documents if document["_id"] == query["_id"]), None)
+
+    def find(self, query, projection=None, cursor_type=None):
+        self.cursors += 1
+        return self.tail(query.get("_id", {}).get("$gt"), self.cursors == 1)
+
+    async def tail(self, after_id, drops):
+        index = 0
+        while True:
+            if index < len(self.documents):
+                if drops and index == self.drop_at:
+                    raise ConnectionError("connection reset")
+                if after_id is None or self.documents[index]["_id"] > after_id:
+                    yield self.documents[index]
+                index += 1
+            else:
+                await asyncio.sleep(0)
+
+
+def test_tailing_resumes_after_the_last_event_seen_whatever_its_object_id(monkeypatch):
+    # Another worker's ObjectIds can sort before ones inserted earlier
+    history, seen, published = (
+        {"_id": ObjectId(f"{n:024x}"), "user_id": "alice", "events": [{"n": n}]} for n in (5, 9, 3)
+    )
+    events = TailedCollection([history], drop_at=2)
+    monkeypatch.setattr(server, "db", {"events": events})
+    sleep = asyncio.sleep
+    monkeypatch.setattr(server.asyncio, "sleep", lambda seconds: sleep(0))
+
+    async def scenario():
+        delivered = []
+        tailing = asyncio.create_task(server.MongoEventBackend()._tail(lambda user_id, batch: delivered.extend(batch)))
+        while not events.cursors:
+            await sleep(0)
+        events.documents += [seen, published]
+        for _ in range(100):
+            await sleep(0)
+        tailing.cancel()
+        return [event["n"] for event in delivered]
+
+    assert asyncio.run(scenario()) == [9, 3]
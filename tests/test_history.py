@@ -0,0 +1,59 @@
+import asyncio
+from datetime import date, datetime, timezone
+
+import httpx
+
+import server
+
+WEEK, MONTH = server.HistoryGranularity.WEEK, server.HistoryGranularity.MONTH
+
+
+def test_periods_follow_iso_weeks_and_calendar_months():
+    day = date(2024, 3, 1)  # A Friday in a leap year
+    assert server.rollup_keys(day) == [("week", "2024-02-26"), ("month", "2024-03-01")]
+    assert server.previous_rollup_start(MONTH, date(2024, 3, 1)) == date(2024, 2, 1)
+    assert server.rollup_days(MONTH, date(2024, 2, 1)) == 29
+    assert server.history_period(WEEK, date(2024, 12, 30), None, day)["period"] == "2025-W01"
+
+
+def test_only_a_days_first_completion_of_a_category_counts_as_a_category_day():
+    progress = {"completed_categories": ["Social", "Physical", "Intelligence", "Discipline"]}
+    assert server.rollup_increments(progress, server.TaskCategory.SOCIAL, 2.0) == {"points_earned.Social": 2.0}
+    assert server.rollup_increments(progress, server.TaskCategory.DETERMINATION, 2.0) == {
+        "points_earned.Determination": 2.0, "category_days": 1, "streak_days": 1
+    }
+    assert server.rollup_increments(None, server.TaskCategory.SOCIAL, 1.0)["category_days"] == 1
+
+
+def test_completion_rate_counts_the_days_of_the_period_so_far():
+    rollup = {"points_earned": {"Social": 3.0}, "category_days": 3, "streak_days": 0}
+    entry = server.history_period(WEEK, date(2025, 3, 3), rollup, today=date(2025, 3, 4))
+    assert entry["completion_rate"] == 0.3 and entry["total_points"] == 3.0 and entry["end"] == "2025-03-09"
+    assert server.history_period(WEEK, date(2025, 2, 24), rollup, today=date(2025, 3, 4))["completion_rate"] == 0.0857
+
+
+def test_history_is_served_from_rollups_kept_by_complete_task():
+    async def scenario():
+        app = server.create_app(server.MemoryStorage())
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/auth/register", json={
+                "username": "alice", "email": "alice@example.com", "password": "secret1"
+            })
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            for category in [*server.TaskCategory, server.TaskCategory.SOCIAL]:
+                task = await client.post("/api/tasks", json={"category": category.value, "title": "t"}, headers=headers)
+                await client.post(f"/api/tasks/{task.json()['id']}/complete", headers=headers)
+
+            weeks = (await client.get("/api/stats/history", headers=headers)).json()
+            months = (await client.get("/api/stats/history?granularity=month&periods=3", headers=headers)).json()
+            assert (await client.get("/api/stats/history?periods=1000", headers=headers)).status_code == 422
+
+        today = datetime.now(timezone.utc).date()
+        assert len(weeks) == 52 and weeks[-1]["start"] == server.rollup_start(WEEK, today).isoformat()
+        assert weeks[0]["category_days"] == 0 and weeks[0]["completion_rate"] == 0.0
+        for latest in (weeks[-1], months[-1]):
+            assert latest["category_days"] == 5 and latest["streak_days"] == 1
+            assert latest["points_earned"]["Social"] == 4.0 and latest["total_points"] == 12.0
+        assert [month["period"] for month in months][-1] == today.strftime("%Y-%m") and len(months) == 3
+
+    asyncio.run(scenario())
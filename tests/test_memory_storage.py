@@ -0,0 +1,208 @@
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+import server
+
+
+def user_document(username, **fields):
+    return {**server.User(username=username, email=f"{username}@example.com", language="en", **fields).model_dump(),
+            "password": "hash"}
+
+
+def run_api(scenario):
+    async def run():
+        app = server.create_app(server.MemoryStorage())
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            await scenario(client)
+    asyncio.run(run())
+
+
+async def register(client, username):
+    response = await client.post("/api/auth/register", json={
+        "username": username, "email": f"{username}@example.com", "password": "secret1"
+    })
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_the_api_runs_on_the_memory_engine():
+    async def scenario(client):
+        alice, bob = await register(client, "alice"), await register(client, "bob")
+        assert (await client.post("/api/auth/register", json={
+            "username": "alice", "email": "other@example.com", "password": "secret1"
+        })).status_code == 400
+        assert (await client.post("/api/auth/login", json={"login": "alice@example.com", "password": "secret1"})).status_code == 200
+
+        task_ids = []
+        for category in server.TaskCategory:
+            response = await client.post("/api/tasks", json={"category": category.value, "title": category.value}, headers=alice)
+            task_ids.append(response.json()["id"])
+        for task_id in task_ids:
+            assert (await client.post(f"/api/tasks/{task_id}/complete", headers=alice)).status_code == 200
+        again = await client.post(f"/api/tasks/{task_ids[0]}/complete", headers=alice)
+        assert again.status_code == 400
+        assert (await client.post(f"/api/tasks/{task_ids[0]}/complete", headers=bob)).status_code == 404
+
+        me = (await client.get("/api/auth/me", headers=alice)).json()
+        assert me["current_streak"] == 1 and me["overall_score"] == 2.0
+        first = await client.get("/api/tasks?limit=3", headers=alice)
+        rest = await client.get(f"/api/tasks?after={first.headers['X-Next-Cursor']}", headers=alice)
+        paged = [task["id"] for task in first.json() + rest.json()]
+        assert len(paged) == len(task_ids) and set(paged) == set(task_ids)
+        dashboard = (await client.get("/api/dashboard?fields=today", headers=alice)).json()
+        assert dashboard["today"]["streak_day"] is True
+
+        server.read_cache.clear()
+        ranked = (await client.get("/api/leaderboard", headers=bob)).json()
+        assert [(entry["username"], entry["rank"]) for entry in ranked] == [("alice", 1), ("bob", 2)]
+        position = (await client.get("/api/leaderboard/me", headers=bob)).json()
+        assert position["rank"] == 2 and not position["approximate"] and position["above"][0]["username"] == "alice"
+
+        saved = (await client.post("/api/quotes/favorites?quote=Q&author=A", headers=bob)).json()
+        assert (await client.post("/api/quotes/favorites?quote=q &author=a", headers=bob)).json()["id"] == saved["id"]
+        assert (await client.get(f"/api/quotes/favorites/status?hashes={saved['hash']}", headers=alice)).json() == {saved["hash"]: False}
+        assert (await client.delete(f"/api/quotes/favorites/{saved['id']}", headers=alice)).status_code == 404
+        assert (await client.delete(f"/api/quotes/favorites?hash={saved['hash']}", headers=bob)).status_code == 200
+        assert (await client.delete(f"/api/tasks/{task_ids[0]}", headers=alice)).status_code == 200
+        assert len((await client.get("/api/tasks", headers=alice)).json()) == len(task_ids) - 1
+
+    run_api(scenario)
+
+
+def test_each_app_serves_its_own_storage():
+    async def scenario():
+        default = server.storage
+        engines = {"alice": server.MemoryStorage(), "bob": server.MemoryStorage()}
+        for username, storage in engines.items():
+            app = server.create_app(storage)
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                await register(client, username)
+        assert await engines["alice"].find_user_by_login("alice") is not None
+        assert await engines["alice"].find_user_by_login("bob") is None
+        assert await engines["bob"].find_user_by_login("bob") is not None
+        assert server.storage is default
+
+    asyncio.run(scenario())
+
+
+def test_parallel_completions_count_once():
+    async def scenario(client):
+        alice = await register(client, "alice")
+        task_ids = [
+            (await client.post("/api/tasks", json={"category": category.value, "title": category.value},
+                               headers=alice)).json()["id"]
+            for category in server.TaskCategory
+        ]
+        first = await asyncio.gather(*(client.post(f"/api/tasks/{task_ids[0]}/complete", headers=alice)
+                                       for _ in range(10)))
+        assert sorted(response.status_code for response in first) == [200] + [400] * 9
+        rest = await asyncio.gather(*(client.post(f"/api/tasks/{task_id}/complete", headers=alice)
+                                      for task_id in task_ids for _ in range(3)))
+        assert sum(response.status_code == 200 for response in rest) == len(task_ids) - 1
+
+        points, _ = server.get_league_multipliers(server.LeagueLevel.NORMAL)
+        me = (await client.get("/api/auth/me", headers=alice)).json()
+        assert me["total_points"] == {category.value: points for category in server.TaskCategory}
+        assert me["current_streak"] == 1 and me["best_streak"] == 1
+        [week] = (await client.get("/api/stats/history?periods=1", headers=alice)).json()
+        assert week["category_days"] == len(server.TaskCategory) and week["streak_days"] == 1
+        assert week["total_points"] == points * len(server.TaskCategory)
+
+    run_api(scenario)
+
+
+def test_documents_are_stored_like_mongo_returns_them():
+    async def scenario():
+        storage = server.MemoryStorage()
+        user = user_document("alice")
+        await storage.insert_user(user)
+        with pytest.raises(DuplicateKeyError):
+            await storage.insert_user(user_document("alice"))
+        stored = await storage.get_user(user["id"])
+        assert stored["created_at"].tzinfo is None and stored["created_at"].microsecond % 1000 == 0
+        assert "password" not in stored
+        stored["total_points"]["Social"] = 99.0  # Callers get copies
+        assert (await storage.get_user(user["id"]))["total_points"]["Social"] == 0.0
+
+    asyncio.run(scenario())
+
+
+def test_deductions_and_job_locks_run_on_the_memory_engine():
+    async def scenario():
+        storage = server.MemoryStorage()
+        today = datetime.now(timezone.utc).date()
+        await storage.insert_user(user_document("idle", total_points={c.value: 10.0 for c in server.TaskCategory}))
+        active = user_document("active")
+        await storage.insert_user(active)
+        for category in server.TaskCategory:
+            await storage.add_daily_completion(active["id"], (today - timedelta(days=1)).isoformat(), category, 1.0)
+
+        assert await storage.last_full_days(today - timedelta(days=7), today) == {active["id"]: today - timedelta(days=1)}
+        assert await server.run_daily_point_deductions(storage) == 1
+        assert await server.run_daily_point_deductions(storage) is None
+        idle = await storage.find_user_by_login("idle")
+        assert idle["total_points"]["Social"] == 6.0 and idle["overall_score"] == 6.0
+
+    asyncio.run(scenario())
+
+
+def test_snapshot_survives_a_restart(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "snapshot.bson")
+        storage = server.MemoryStorage(path)
+        user = user_document("alice")
+        await storage.insert_user(user)
+        task = server.Task(user_id=user["id"], category="Social", title="Call a friend").model_dump()
+        await storage.insert_task(task)
+        await storage.complete_task(task["id"], user["id"], datetime.now(timezone.utc))
+        await storage.close()
+
+        restored = server.MemoryStorage(path)
+        await restored.prepare()
+        assert (await restored.find_user_by_login("alice"))["id"] == user["id"]
+        page, has_more = await restored.task_page(user["id"], None, 10)
+        assert page[0]["completion_count"] == 1 and not has_more
+        assert await restored.complete_task(task["id"], user["id"], datetime.now(timezone.utc)) is None
+
+    asyncio.run(scenario())
+
+
+def test_snapshots_are_taken_while_running(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "snapshot.bson")
+        storage = server.MemoryStorage(path, snapshot_seconds=0.01)
+        await storage.prepare()
+        await storage.insert_user(user_document("alice"))
+        await asyncio.sleep(0.1)
+        storage._snapshotter.cancel()  # Killed without a clean shutdown
+
+        restored = server.MemoryStorage(path)
+        await restored.prepare()
+        assert await restored.find_user_by_login("alice") is not None
+        await restored.close()
+
+    asyncio.run(scenario())
+
+
+def test_an_engine_missing_methods_cannot_be_built():
+    class HalfStorage(server.Storage):
+        async def get_user(self, user_id):
+            return None
+
+    with pytest.raises(TypeError, match="abstract"):
+        HalfStorage()
+
+
+def test_python_completion_matches_the_pipeline_rules():
+    user = user_document("alice", current_streak=24, best_streak=24)
+    today = date.today().isoformat()
+    for category in server.TaskCategory:
+        server.apply_user_completion(user, category, 2.0, today, datetime(2025, 1, 1))
+    assert user["current_streak"] == 25 and user["league"] == server.LeagueLevel.NOVICE.value
+    assert user["badges"] == ["Bronze Trophy"] and user["overall_score"] == 2.0
+    server.apply_user_completion(user, server.TaskCategory.SOCIAL, 2.0, today, datetime(2025, 1, 1))
+    assert user["current_streak"] == 25  # A sixth completion on the same day isn't another streak day
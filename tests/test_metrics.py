@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from prometheus_client import REGISTRY
+
+import server
+
+
+def command_event(command_name, command=None, request_id=1, duration_micros=1500):
+    return SimpleNamespace(
+        command_name=command_name,
+        command=command or {},
+        database_name="test_database",
+        connection_id=("localhost", 27017),
+        request_id=request_id,
+        duration_micros=duration_micros,
+    )
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_mongo_commands_are_counted_per_collection_and_command():
+    listener = server.MongoCommandMetrics()
+    before = sample("mongodb_commands_total", collection="tasks", command="find", outcome="success")
+    listener.started(command_event("find", {"find": "tasks", "filter": {}}, request_id=7))
+    listener.succeeded(command_event("find", request_id=7))
+    assert sample("mongodb_commands_total", collection="tasks", command="find", outcome="success") == before + 1
+
+
+def test_get_more_uses_the_collection_field_and_failures_are_labelled():
+    listener = server.MongoCommandMetrics()
+    before = sample("mongodb_commands_total", collection="users", command="getMore", outcome="failure")
+    listener.started(command_event("getMore", {"getMore": 12345, "collection": "users"}, request_id=8))
+    listener.failed(command_event("getMore", request_id=8))
+    assert sample("mongodb_commands_total", collection="users", command="getMore", outcome="failure") == before + 1
+
+
+def test_handshake_commands_are_ignored():
+    listener = server.MongoCommandMetrics()
+    listener.started(command_event("hello", {"hello": 1}, request_id=9))
+    listener.succeeded(command_event("hello", request_id=9))
+    assert sample("mongodb_commands_total", collection="test_database", command="hello", outcome="success") == 0.0
@@ -0,0 +1,250 @@
+import asyncio
+from datetime import datetime, timezone
+
+import httpx
+from pymongo.errors import OperationFailure
+
+import server
+
+
+def matches(document, query):
+    """Equality, $gt, $lt and $or: the operators the leaderboard queries use"""
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(document, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = document.get(field)
+            if "$gt" in condition and not value > condition["$gt"]:
+                return False
+            if "$lt" in condition and not value < condition["$lt"]:
+                return False
+        elif document.get(field) != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self.documents.sort(key=lambda document: document[field], reverse=direction == server.DESCENDING)
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length):
+        return self.documents
+
+
+class UsersCollection:
+    """Leaderboard reads over a list of users; $sample keeps every ``sample_every``th score"""
+
+    def __init__(self, scores, sample_every=1):
+        self.documents = [
+            server.User(username=f"user{i:03}", email=f"user{i:03}@example.com", language="en",
+                        overall_score=float(score)).model_dump()
+            for i, score in enumerate(scores)
+        ]
+        self.sample_every = sample_every
+        self.samples = 0
+
+    async def count_documents(self, query, limit=0):
+        count = sum(matches(document, query) for document in self.documents)
+        return min(count, limit) if limit else count
+
+    async def estimated_document_count(self):
+        return len(self.documents)
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(document) for document in self.documents if matches(document, query)])
+
+    def aggregate(self, pipeline):
+        self.samples += 1
+        ordered = sorted(self.documents, key=lambda document: document["overall_score"])
+        return FakeCursor([{"overall_score": document["overall_score"]}
+                           for document in ordered[self.sample_every // 2::self.sample_every]])
+
+
+class IndexedCollection:
+    def __init__(self, indexes=None, dropped_elsewhere=False, drop_error=None):
+        self.indexes = dict(indexes or {})
+        self.dropped_elsewhere = dropped_elsewhere
+        self.drop_error = drop_error
+
+    async def index_information(self):
+        return dict(self.indexes)
+
+    async def create_indexes(self, models):
+        for model in models:
+            self.indexes[model.document["name"]] = {"key": list(model.document["key"].items()),
+                                                    "unique": model.document.get("unique")}
+
+    async def find_one(self, query, projection=None):
+        return None
+
+    async def drop_index(self, name):
+        if self.drop_error:
+            raise self.drop_error
+        if self.dropped_elsewhere or name not in self.indexes:
+            raise OperationFailure(f"index not found with name [{name}]", code=server.INDEX_NOT_FOUND)
+        del self.indexes[name]
+
+
+class TasksCollection:
+    """complete_task's conditional update, matched and applied without yielding like Mongo's"""
+
+    def __init__(self, tasks):
+        self.documents = {task["id"]: task for task in tasks}
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None):
+        await asyncio.sleep(0)
+        task = self.documents.get(query["id"])
+        completed_at = task and task.get("completed_at")
+        if task is None or task["user_id"] != query["user_id"] or (
+            completed_at and completed_at >= query["completed_at"]["$not"]["$gte"]
+        ):
+            return None
+        task.update(update["$set"])
+        task["completion_count"] += update["$inc"]["completion_count"]
+        for path, bit in update["$bit"].items():
+            month = path.split(".", 1)[1]
+            task["completion_months"][month] = task["completion_months"].get(month, 0) | bit["or"]
+        return {"category": task["category"], "completion_count": task["completion_count"],
+                "completion_months": dict(task["completion_months"])}
+
+    async def count_documents(self, query, limit=0):
+        task = self.documents.get(query["id"])
+        return int(task is not None and task["user_id"] == query["user_id"])
+
+
+class CompletionUsersCollection:
+    """The completion pipeline for the test's one Social task, applied by its Python mirror"""
+
+    def __init__(self, user):
+        self.user = user
+        self.completions = 0
+
+    async def find_one(self, query, projection=None):
+        return dict(self.user) if query == {"id": self.user["id"]} else None
+
+    async def find_one_and_update(self, query, pipeline, projection=None, return_document=None):
+        await asyncio.sleep(0)
+        self.completions += 1
+        now = datetime.now(timezone.utc)
+        server.apply_user_completion(self.user, server.TaskCategory.SOCIAL, 2.0, now.date().isoformat(), now)
+        return dict(self.user)
+
+
+class WriteCountingCollection:
+    def __init__(self):
+        self.writes = 0
+
+    async def update_one(self, query, update, upsert=False):
+        await asyncio.sleep(0)
+        self.writes += 1
+
+    async def bulk_write(self, operations, ordered=True):
+        await asyncio.sleep(0)
+        self.writes += 1
+
+
+class FakeDatabase(dict):
+    __getattr__ = dict.__getitem__
+
+    def __missing__(self, name):
+        self[name] = IndexedCollection()
+        return self[name]
+
+
+def position(users, username, neighbours=2):
+    storage = server.MongoStorage(FakeDatabase(users=users))
+    user = server.User(**next(document for document in users.documents if document["username"] == username))
+    return storage, asyncio.run(storage.leaderboard_position(user, None, neighbours))
+
+
+def test_ranks_are_exact_down_to_the_counting_limit():
+    users = UsersCollection([50, 40, 40, 30, 20])
+    _, result = position(users, "user002")
+    assert result["rank"] == 3 and not result["approximate"] and result["total"] == 5
+    assert [entry["username"] for entry in result["above"]] == ["user000", "user001"]
+    assert [(entry["username"], entry["rank"]) for entry in result["below"]] == [("user003", 4), ("user004", 5)]
+
+
+def test_ranks_past_the_counting_limit_are_estimated_from_the_score_sample(monkeypatch):
+    monkeypatch.setattr(server, "LEADERBOARD_EXACT_RANKS", 10)
+    users = UsersCollection(range(99, -1, -1), sample_every=10)  # Samples 5, 15, ..., 95
+
+    storage, result = position(users, "user054")  # Scored 45, with 54 users ahead
+    # 5 of the 10 sampled scores are higher, so half of the 100 users are taken to be ahead
+    assert result["rank"] == 51 and result["approximate"] and result["total"] == 100
+    assert [entry["rank"] for entry in result["above"]] == [49, 50]
+
+    _, bottom = position(users, "user099")  # Below every sampled score
+    assert bottom["rank"] == 100 and bottom["total"] == 100
+
+    _, top = position(users, "user003")
+    assert top["rank"] == 4 and not top["approximate"]
+
+
+def test_the_score_sample_is_reused_until_it_is_due_again(monkeypatch):
+    users = UsersCollection([3, 2, 1])
+    storage = server.MongoStorage(FakeDatabase(users=users))
+    asyncio.run(storage._score_sample(None))
+    asyncio.run(storage._score_sample(None))
+    assert users.samples == 1
+    monkeypatch.setattr(server, "LEADERBOARD_RECONCILE_SECONDS", -1)
+    asyncio.run(storage._score_sample(None))
+    assert users.samples == 2
+
+
+def retired_users_index(**collection_options):
+    retired = next(label for label in server.RETIRED_INDEXES if label.startswith("users."))
+    name = retired.split(".", 1)[1]
+    return retired, name, IndexedCollection({name: {"key": [("overall_score", -1)]}}, **collection_options)
+
+
+def test_retired_indexes_are_dropped_once_replaced():
+    retired, name, users = retired_users_index()
+    report = asyncio.run(server.ensure_indexes(FakeDatabase(users=users)))
+    assert retired in report["dropped"] and name not in users.indexes
+    assert server.RETIRED_INDEXES[retired] in report["created"]
+    assert asyncio.run(server.ensure_indexes(FakeDatabase(users=users)))["dropped"] == []
+
+
+def test_a_retired_index_dropped_by_another_worker_does_not_fail_startup():
+    retired, _, users = retired_users_index(dropped_elsewhere=True)
+    report = asyncio.run(server.ensure_indexes(FakeDatabase(users=users)))
+    assert retired not in report["dropped"]
+    assert server.RETIRED_INDEXES[retired] in report["created"]
+
+
+def test_other_drop_failures_are_logged_and_startup_goes_on():
+    retired, name, users = retired_users_index(drop_error=OperationFailure("not authorized", code=13))
+    report = asyncio.run(server.ensure_indexes(FakeDatabase(users=users)))
+    assert retired not in report["dropped"] and name in users.indexes
+
+
+def test_parallel_completions_of_a_task_count_once_on_the_mongo_engine():
+    user = server.User(username="alice", email="alice@example.com", language="en").model_dump()
+    task = server.Task(user_id=user["id"], category="Social", title="Call a friend").model_dump()
+    database = FakeDatabase(users=CompletionUsersCollection(user), tasks=TasksCollection([task]),
+                            daily_progress=WriteCountingCollection(), progress_rollups=WriteCountingCollection())
+    headers = {"Authorization": f"Bearer {server.create_access_token({'sub': user['id']})}"}
+
+    async def scenario():
+        app = server.create_app(server.MongoStorage(database))
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await asyncio.gather(*(client.post(f"/api/tasks/{task['id']}/complete", headers=headers)
+                                          for _ in range(10)))
+
+    responses = asyncio.run(scenario())
+    assert sorted(response.status_code for response in responses) == [200] + [400] * 9
+    assert task["completion_count"] == 1
+    # One update of each of the user, the day's progress and its rollups, however many requests raced
+    assert database.users.completions == 1
+    assert database.daily_progress.writes == 1 and database.progress_rollups.writes == 1
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 3, 1, 8, 30, 15, 123000)
+    token = server.encode_cursor(created_at, "task-id")
+    assert "=" not in token
+    assert server.decode_cursor(token, datetime.fromisoformat, str) == (created_at, "task-id")
+
+
+@pytest.mark.parametrize("token", ["garbage", server.encode_cursor(1.0), server.encode_cursor("x", "y")])
+def test_invalid_cursor_is_a_bad_request(token):
+    with pytest.raises(HTTPException) as error:
+        server.decode_cursor(token, float, str)
+    assert error.value.status_code == 400
+
+
+def test_keyset_filter_seeks_past_the_cursor_in_sort_order():
+    assert server.keyset_filter(server.LEADERBOARD_SORT, (12.5, "bob")) == {"$or": [
+        {"overall_score": {"$lt": 12.5}},
+        {"overall_score": 12.5, "username": {"$gt": "bob"}},
+    ]}
+
+
+def test_in_memory_leaderboard_pages_continue_after_the_cursor():
+    ranked = server.RankedLeaderboard()
+    ranked.ready = True
+    for i in range(5):
+        ranked.upsert({"username": f"user{i}", "language": "en", "overall_score": float(i % 3),
+                       "league": "Normal", "current_streak": 0})
+    first = ranked.top(limit=2)
+    rest = ranked.top(limit=10, after=(-first[-1]["overall_score"], first[-1]["username"]))
+    assert [entry["rank"] for entry in first + rest] == [1, 2, 3, 4, 5]
+    assert [entry["username"] for entry in first + rest] == [entry["username"] for entry in ranked.top(limit=10)]
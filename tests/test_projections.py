@@ -0,0 +1,61 @@
+import ast
+from pathlib import Path
+
+import server
+
+SERVER_PATH = Path(server.__file__)
+
+READ_METHODS = {"find", "find_one", "find_one_and_update", "find_one_and_replace", "find_one_and_delete"}
+
+
+def users_reads():
+    """(enclosing function, call) for every read on db.users (or MongoStorage's self.db.users) in server.py"""
+    tree = ast.parse(SERVER_PATH.read_text())
+    reads = []
+
+    def visit(node, function_name):
+        for child in ast.iter_child_nodes(node):
+            name = child.name if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)) else function_name
+            if (
+                isinstance(child, ast.Call)
+                and isinstance(child.func, ast.Attribute)
+                and child.func.attr in READ_METHODS
+                and ast.unparse(child.func.value) in ("db.users", "self.db.users")
+            ):
+                reads.append((name, child))
+            visit(child, name)
+
+    visit(tree, None)
+    return reads
+
+
+def projection_of(call):
+    for keyword in call.keywords:
+        if keyword.arg == "projection":
+            return keyword.value
+    if call.func.attr == "find_one_and_update":
+        return None  # (filter, update) positionally, projection only by keyword
+    return call.args[1] if len(call.args) > 1 else None
+
+
+def loads_password(projection):
+    if projection.get("password") == 0:
+        return False
+    inclusion = any(value for field, value in projection.items() if field != "_id")
+    return not inclusion or bool(projection.get("password"))
+
+
+def test_every_users_read_is_projected():
+    reads = users_reads()
+    assert reads
+    for function_name, call in reads:
+        assert projection_of(call) is not None, f"{function_name}: {ast.unparse(call)[:80]} has no projection"
+
+
+def test_password_hash_is_only_loaded_by_login():
+    for function_name, call in users_reads():
+        projection = eval(compile(ast.Expression(projection_of(call)), str(SERVER_PATH), "eval"), vars(server))
+        if function_name == "find_user_by_login":
+            assert loads_password(projection)
+        else:
+            assert not loads_password(projection), f"{function_name} loads the password hash"
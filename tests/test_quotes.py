@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime
+
+import orjson
+
+import server
+
+
+def catalog(quotes):
+    loaded = server.QuoteCatalog()
+    loaded.load([server.parse_upstream_quote(quote) for quote in quotes])
+    return loaded
+
+
+def bundled_quotes():
+    return orjson.loads(server.BUNDLED_QUOTES_PATH.read_bytes())
+
+
+def test_quote_hash_ignores_case_and_whitespace():
+    assert server.quote_hash("Stay  hungry.", "Steve Jobs") == server.quote_hash("stay hungry.", " steve jobs")
+    assert server.quote_hash("Stay hungry.", "Steve Jobs") != server.quote_hash("Stay foolish.", "Steve Jobs")
+
+
+def test_daily_selection_is_deterministic_and_cached():
+    first = catalog(bundled_quotes())
+    second = catalog(list(reversed(bundled_quotes())))
+    body, etag = first.daily("2025-06-01", "en", 5, 0)
+    assert (body, etag) == second.daily("2025-06-01", "en", 5, 0)
+    assert first.daily("2025-06-01", "en", 5, 0)[0] is body
+    assert len(orjson.loads(body)["quotes"]) == 5
+    assert first.daily("2025-06-02", "en", 5, 0)[1] != etag
+    assert first.daily("2025-06-01", "en", 5, 1)[1] != etag
+
+
+def test_languages_without_quotes_fall_back_to_english():
+    loaded = catalog(bundled_quotes() + [{"content": "Hola", "author": "Anon", "language": "es"}])
+    assert [quote["content"] for quote in orjson.loads(loaded.daily("2025-06-01", "es", 5, 0)[0])["quotes"]] == ["Hola"]
+    assert len(orjson.loads(loaded.daily("2025-06-01", "tk", 5, 0)[0])["quotes"]) == 5
+
+
+def test_malformed_upstream_records_are_skipped():
+    assert server.parse_upstream_quote({"author": "No content"}) is None
+    assert server.parse_upstream_quote({"content": "Hi", "language": "xx"}) is None
+    assert server.parse_upstream_quote("not a record") is None
+
+
+def test_daily_quotes_are_not_cached_before_the_catalog_loads(monkeypatch):
+    async def daily_headers():
+        response = await server.get_daily_quotes(server.Language.ENGLISH, 5, 0, None)
+        return response.headers["Cache-Control"]
+
+    monkeypatch.setattr(server, "quote_catalog", server.QuoteCatalog())
+    assert asyncio.run(daily_headers()) == "no-store"
+    server.quote_catalog.load([server.parse_upstream_quote(quote) for quote in bundled_quotes()])
+    assert asyncio.run(daily_headers()).startswith("public, max-age=")
+
+
+def test_favorites_saved_before_content_hashes_are_served_with_one():
+    legacy = {"id": "f1", "user_id": "u1", "quote": "Stay hungry.", "author": "Steve Jobs", "saved_at": datetime(2024, 1, 1)}
+    encoded = server.encode_favorite(legacy)
+    assert encoded["hash"] == server.quote_hash("Stay hungry.", "Steve Jobs") and "hash" not in legacy
+    assert orjson.loads(orjson.dumps(encoded))["quote"] == "Stay hungry."
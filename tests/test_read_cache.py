@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import server
+
+
+class CountingLoad:
+    def __init__(self, delay=0.01, error=None):
+        self.calls = 0
+        self.delay = delay
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.calls
+
+
+def test_concurrent_misses_share_one_load():
+    async def scenario():
+        cache = server.ReadCache(10, ttl_seconds=1, stale_seconds=1)
+        load = CountingLoad()
+        results = await asyncio.gather(*[cache.get("leaderboard", load) for _ in range(100)])
+        assert load.calls == 1 and set(results) == {1}
+
+    asyncio.run(scenario())
+
+
+def test_stale_value_is_served_while_one_refresh_runs(monkeypatch):
+    async def scenario():
+        clock = [100.0]
+        monkeypatch.setattr(server, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+        cache = server.ReadCache(10, ttl_seconds=1, stale_seconds=5)
+        load = CountingLoad()
+        assert await cache.get("key", load) == 1
+        clock[0] += 2
+        assert [await cache.get("key", load) for _ in range(3)] == [1, 1, 1]
+        await asyncio.sleep(0.05)
+        assert load.calls == 2 and await cache.get("key", load) == 2
+        clock[0] += 10  # Past the stale window: callers wait for a fresh load
+        assert await cache.get("key", load) == 3
+
+    asyncio.run(scenario())
+
+
+def test_failed_loads_are_shared_but_not_cached():
+    async def scenario():
+        cache = server.ReadCache(10, ttl_seconds=1, stale_seconds=1)
+        failing = CountingLoad(error=RuntimeError("mongo down"))
+        results = await asyncio.gather(*[cache.get("key", failing) for _ in range(5)], return_exceptions=True)
+        assert failing.calls == 1 and all(isinstance(result, RuntimeError) for result in results)
+        assert await cache.get("key", CountingLoad()) == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_load():
+    async def scenario():
+        flights = server.SingleFlight()
+        load = CountingLoad(delay=0.05)
+        first = asyncio.ensure_future(flights.do("key", load))
+        second = asyncio.ensure_future(flights.do("key", load))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == 1 and load.calls == 1
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
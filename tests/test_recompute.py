@@ -0,0 +1,71 @@
+import random
+from datetime import date, datetime, time, timedelta, timezone
+
+import server
+
+START = date(2024, 1, 1)
+
+
+def simulate(full_day_chance, days, rng):
+    """A user and their dailies after ``days`` days of the incremental rules: the deduction job
+    each morning, then the day's completions through apply_user_completion"""
+    user = {**server.User(username="u", email="u@example.com", language="en").model_dump(), "progress_date": None}
+    dailies = []
+    for offset in range(days):
+        day = START + timedelta(days=offset)
+        last_full = max((date.fromisoformat(progress["date"]) for progress in dailies
+                         if progress["streak_day"] and day - timedelta(days=server.DEDUCTION_WINDOW_DAYS)
+                         <= date.fromisoformat(progress["date"]) < day), default=None)
+        if server.point_deduction_due(server.count_missed_days(last_full, day), user["last_point_deduction"], day):
+            server.apply_deduction(user, 1.0, datetime.combine(day, time(), timezone.utc))
+        categories = list(server.TaskCategory) if rng.random() < full_day_chance else rng.sample(
+            list(server.TaskCategory), rng.randrange(len(server.TaskCategory)))
+        if categories:
+            progress = {"user_id": user["id"], "date": day.isoformat()}
+            for category in categories:
+                server.apply_user_completion(user, category, 1.0, day.isoformat(), datetime.now(timezone.utc))
+                server.apply_daily_completion(progress, category, 1.0)
+            dailies.append(progress)
+    return user, dailies
+
+
+def test_recompute_matches_the_incremental_rules():
+    rng = random.Random(7)
+    users, dailies = [], []
+    for chance in (0.0, 0.4, 0.7, 0.9, 0.97, 1.0) * 3:
+        user, history = simulate(chance, 130, rng)
+        users.append(user)
+        dailies.extend(history)
+    as_of = START + timedelta(days=129)
+    completed = server.build_completion_matrix([user["id"] for user in users], dailies, [], as_of)
+    current, best = server.recompute_streaks(completed)
+    assert list(current) == [user["current_streak"] for user in users]
+    assert list(best) == [user["best_streak"] for user in users]
+    assert {user["league"] for user in users} >= {"Normal", "Novice", "Master"}
+    assert server.progress_corrections(users, completed) == []
+
+    # Drifted users get exactly the fields that differ set back, guarded by what was read
+    drifted = users[-1]
+    drifted.update(current_streak=3, league="Normal", badges=["Beginner", "Early Bird"])
+    [(diff, update)] = server.progress_corrections(users, completed)
+    assert diff == {"user_id": drifted["id"], "current_streak": [3, 130], "league": ["Normal", "Master"],
+                    "badges": [["Beginner", "Early Bird"], ["Beginner", "Disciplined", "Bronze Trophy", "Master",
+                                                            "Silver Trophy", "Golden Trophy", "Early Bird"]]}
+    assert update._filter["current_streak"] == 3 and set(update._doc["$set"]) == {"current_streak", "league", "badges"}
+
+
+def test_archived_months_count_like_the_dailies_they_replaced():
+    rng = random.Random(11)
+    users, dailies = zip(*(simulate(chance, 100, rng) for chance in (0.8, 0.95, 1.0)))
+    dailies = [progress for history in dailies for progress in history]
+    user_ids = [user["id"] for user in users]
+    as_of = START + timedelta(days=99)
+    archives = [
+        server.build_progress_archive(user_id, month, [progress for progress in dailies if progress["user_id"] == user_id
+                                                       and progress["date"].startswith(month.strftime("%Y-%m"))])
+        for user_id in user_ids for month in (date(2024, 1, 1), date(2024, 2, 1))
+    ]
+    recent = [progress for progress in dailies if progress["date"] >= "2024-03-01"]
+    from_dailies = server.build_completion_matrix(user_ids, dailies, [], as_of)
+    assert (server.build_completion_matrix(user_ids, recent, archives, as_of) == from_dailies).all()
+    assert list(server.recompute_streaks(from_dailies)[1]) == [user["best_streak"] for user in users]
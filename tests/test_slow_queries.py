@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+import orjson
+
+import server
+
+
+def command_events(command, request_id=1, duration_micros=250_000):
+    command_name = next(iter(command))
+    common = dict(command_name=command_name, database_name="test_database",
+                  connection_id=("localhost", 27017), request_id=request_id)
+    return (SimpleNamespace(command=command, **common),
+            SimpleNamespace(duration_micros=duration_micros, **common))
+
+
+def test_query_shape_keeps_fields_and_operators_only():
+    shape = server.query_shape({"$or": [{"username": "alice"}, {"email": "alice@example.com"}],
+                                "date": {"$in": ["2025-01-01", "2025-01-02"]}})
+    assert shape == {"$or": [{"username": "?"}, {"email": "?"}], "date": {"$in": "?"}}
+
+
+def test_slow_commands_are_recorded_by_shape_with_their_route(tmp_path):
+    log_path = tmp_path / "slow.jsonl"
+    recorder = server.SlowQueryRecorder(100, str(log_path), 10)
+    route = SimpleNamespace(path="/api/auth/login")
+    token = server.request_scope.set({"route": route})
+    try:
+        for request_id, login in enumerate(["alice", "bob"]):
+            started, succeeded = command_events(
+                {"find": "users", "filter": {"$or": [{"username": login}, {"email": login}]}, "lsid": {}},
+                request_id=request_id
+            )
+            recorder.started(started)
+            recorder.succeeded(succeeded)
+        fast_started, fast_succeeded = command_events({"find": "tasks", "filter": {}}, request_id=5, duration_micros=10)
+        recorder.started(fast_started)
+        recorder.succeeded(fast_succeeded)
+    finally:
+        server.request_scope.reset(token)
+
+    report = recorder.report()
+    assert [entry["route"] for entry in report["recent"]] == ["/api/auth/login"] * 2
+    [shape] = report["shapes"]
+    assert shape["count"] == 2 and shape["collection"] == "users" and shape["max_ms"] == 250.0
+    assert shape["shape"] == {"filter": {"$or": [{"username": "?"}, {"email": "?"}]}}
+    lines = [orjson.loads(line) for line in log_path.read_bytes().splitlines()]
+    assert len(lines) == 2 and b"alice" not in log_path.read_bytes()
+
+
+def test_recorder_is_off_without_a_threshold():
+    recorder = server.SlowQueryRecorder(0, None, 10)
+    started, succeeded = command_events({"find": "users", "filter": {"id": "x"}})
+    recorder.started(started)
+    recorder.succeeded(succeeded)
+    assert recorder.report()["recent"] == []
@@ -0,0 +1,135 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+
+
+class RecordingCollection:
+    """Just enough of a Motor collection: find_one by equality, bulk_write recorded"""
+
+    def __init__(self, name, documents=()):
+        self.name = name
+        self.documents = list(documents)
+        self.writes = []
+        self.fail_next_write = False
+
+    async def find_one(self, query, projection=None):
+        for document in self.documents:
+            if all(document.get(field) == value for field, value in query.items()):
+                return dict(document)
+        return None
+
+    async def bulk_write(self, operations, ordered=True):
+        await asyncio.sleep(0)
+        if self.fail_next_write:
+            self.fail_next_write = False
+            raise ConnectionError("primary stepped down")
+        self.writes.append([(op._filter, op._doc, op._upsert) for op in operations])
+
+
+class RecordingDatabase(dict):
+    __getattr__ = dict.__getitem__
+
+
+def write_behind_storage():
+    user = {**server.User(username="alice", email="alice@example.com", language="en").model_dump(), "password": "hash"}
+    database = RecordingDatabase(users=RecordingCollection("users", [user]),
+                                 daily_progress=RecordingCollection("daily_progress"),
+                                 progress_rollups=RecordingCollection("progress_rollups"))
+    return server.WriteBehindMongoStorage(database, flush_seconds=60, max_pending=100), user["id"]
+
+
+async def complete(storage, user_id, category, today):
+    await asyncio.gather(
+        storage.apply_task_completion(user_id, category, 1.0, today, datetime.now(timezone.utc)),
+        storage.add_daily_completion(user_id, today, category, 1.0)
+    )
+
+
+def test_completions_are_merged_into_one_update_per_document():
+    async def scenario():
+        storage, user_id = write_behind_storage()
+        today = datetime.now(timezone.utc).date().isoformat()
+        for category in [*server.TaskCategory, server.TaskCategory.SOCIAL]:
+            await complete(storage, user_id, category, today)
+
+        # Reads see the buffered completions before anything is written
+        user = await storage.get_user(user_id)
+        assert user["current_streak"] == 1 and user["total_points"]["Social"] == 2.0
+        assert (await storage.get_daily_progress(user_id, today))["streak_day"] is True
+        assert storage.db.users.writes == []
+
+        assert await storage.flush() == 4
+        [[(query, stages, upsert)]] = storage.db.users.writes
+        changes, derived = (stage["$set"] for stage in stages)
+        assert query == {"id": user_id} and not upsert
+        assert {path: change["$add"][1] for path, change in changes.items() if "$add" in change} == {
+            **{f"total_points.{c.value}": 1.0 for c in server.TaskCategory},
+            "total_points.Social": 2.0, "current_streak": 1
+        }
+        # Derived from the stored document, so a deduction written elsewhere meanwhile isn't undone
+        assert derived["overall_score"] == server.OVERALL_SCORE_EXPRESSION
+        assert derived["best_streak"] == {"$max": ["$best_streak", "$current_streak", 1]}
+        [[(query, stages, upsert)]] = storage.db.daily_progress.writes
+        additions, totals = (stage["$set"] for stage in stages)
+        assert query == {"user_id": user_id, "date": today} and upsert
+        assert sorted(additions["completed_categories"]["$setUnion"][1]) == sorted(c.value for c in server.TaskCategory)
+        assert totals["points_earned.Social"]["$add"][1] == 2.0 and "$size" in str(totals["streak_day"])
+        [rollup_writes] = storage.db.progress_rollups.writes
+        assert sorted(query["granularity"] for query, _, _ in rollup_writes) == ["month", "week"]
+        assert all(update["$inc"]["category_days"] == 5 and update["$inc"]["streak_days"] == 1
+                   and update["$inc"]["points_earned.Social"] == 2.0 for _, update, _ in rollup_writes)
+        assert await storage.flush() == 0
+
+    asyncio.run(scenario())
+
+
+def test_a_failed_flush_is_retried_together_with_newer_completions():
+    async def scenario():
+        storage, user_id = write_behind_storage()
+        today = datetime.now(timezone.utc).date().isoformat()
+        await complete(storage, user_id, server.TaskCategory.SOCIAL, today)
+        storage.db.users.fail_next_write = True
+        flush = asyncio.ensure_future(storage.flush())
+        await asyncio.sleep(0)
+        await complete(storage, user_id, server.TaskCategory.SOCIAL, today)  # Lands while the write is in flight
+        with pytest.raises(ConnectionError):
+            await flush
+
+        assert (await storage.get_user(user_id))["total_points"]["Social"] == 2.0
+        await storage.drain()
+        [[(_, stages, _)]] = storage.db.users.writes
+        changes = stages[0]["$set"]
+        assert changes["total_points.Social"]["$add"][1] == 2.0 and "current_streak" not in changes
+        # The daily_progress write went through the first time; only the newer completion follows it
+        assert [
+            writes[0][1][1]["$set"]["points_earned.Social"]["$add"][1] for writes in storage.db.daily_progress.writes
+        ] == [1.0, 1.0]
+
+    asyncio.run(scenario())
+
+
+def test_history_counts_each_increment_once_while_a_flush_lands(monkeypatch):
+    async def stored_rollups(self, user_id, granularity, since):
+        await asyncio.sleep(0)  # A flush can land while this reads
+        rollups = {}
+        for writes in self.db.progress_rollups.writes:
+            for query, update, _ in writes:
+                if query["user_id"] == user_id and query["granularity"] == granularity:
+                    server.apply_increments(rollups.setdefault(query["start"], {"start": query["start"]}), update["$inc"])
+        return list(rollups.values())
+
+    async def scenario():
+        storage, user_id = write_behind_storage()
+        today = datetime.now(timezone.utc).date().isoformat()
+        await complete(storage, user_id, server.TaskCategory.SOCIAL, today)
+        _, *reads = await asyncio.gather(
+            storage.flush(), *(storage.progress_rollups(user_id, "week", "2000-01-01") for _ in range(3))
+        )
+        for rollups in reads:
+            assert [rollup["points_earned"]["Social"] for rollup in rollups] == [1.0]
+
+    monkeypatch.setattr(server.MongoStorage, "progress_rollups", stored_rollups)
+    asyncio.run(scenario())